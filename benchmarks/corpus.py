@@ -0,0 +1,116 @@
+# benchmarks/corpus.py
+"""Erzeugt reproduzierbare synthetische Markdown-Korpora (Englisch/Deutsch) für die Benchmarks."""
+
+import os
+import random
+
+# Dateien pro Unterordner (wie in gewachsenen Wissensdatenbanken nicht alles in einem Ordner)
+_FILES_PER_DIR = 100
+
+_VOCABULARY = {
+    "en": {
+        "nouns": [
+            "server", "container", "cluster", "database", "index", "query", "network", "service",
+            "deployment", "pipeline", "storage", "volume", "backup", "certificate", "gateway", "proxy",
+            "cache", "queue", "worker", "scheduler", "node", "pod", "image", "registry", "secret",
+            "namespace", "policy", "endpoint", "request", "response", "latency", "throughput",
+            "metric", "alert", "dashboard", "release", "rollback", "migration", "schema", "replica",
+        ],
+        "names": ["Kubernetes", "Docker", "Helm", "Postgres", "Redis", "Nginx", "Grafana", "Prometheus"],
+        "verbs": [
+            "deploys", "configures", "monitors", "restarts", "scales", "replicates", "updates",
+            "stores", "routes", "validates", "schedules", "caches", "indexes", "exports", "rotates",
+        ],
+        "adjectives": ["stable", "fast", "internal", "external", "secure", "default", "primary", "shared"],
+        "articles": ["The", "Each", "Every", "A", "This"],
+        "links": ["the guide", "the runbook", "the reference"],
+        "see": "See",
+        "glue": "and",
+    },
+    "de": {
+        "nouns": [
+            "Server", "Container", "Cluster", "Datenbank", "Index", "Abfrage", "Netzwerk", "Dienst",
+            "Bereitstellung", "Pipeline", "Speicher", "Volume", "Sicherung", "Zertifikat", "Gateway",
+            "Proxy", "Zwischenspeicher", "Warteschlange", "Knoten", "Abbild", "Registry", "Richtlinie",
+            "Anfrage", "Antwort", "Latenz", "Durchsatz", "Metrik", "Warnung", "Übersicht", "Version",
+            "Migration", "Schema", "Replik", "Konfiguration", "Protokoll", "Benutzer", "Rechner",
+            "Verzeichnis", "Schnittstelle", "Aufgabe",
+        ],
+        "names": ["Kubernetes", "Docker", "Helm", "Postgres", "Redis", "Nginx", "Grafana", "Prometheus"],
+        "verbs": [
+            "startet", "konfiguriert", "überwacht", "skaliert", "repliziert", "aktualisiert",
+            "speichert", "leitet", "prüft", "plant", "exportiert", "sichert", "verteilt", "löscht", "erzeugt",
+        ],
+        "adjectives": ["stabile", "schnelle", "interne", "externe", "sichere", "zentrale", "neue", "gemeinsame"],
+        "articles": ["Der", "Jeder", "Ein", "Dieser", "Unser"],
+        "links": ["die Anleitung", "das Handbuch", "die Referenz"],
+        "see": "Siehe",
+        "glue": "und",
+    },
+}
+
+
+def _zipf_choice(rng: random.Random, words: list[str]) -> str:
+    """Wählt Wörter Zipf-verteilt, damit Dokumenthäufigkeiten wie in echten Texten streuen."""
+    return rng.choices(words, weights=[1 / (rank + 1) for rank in range(len(words))])[0]
+
+
+def _sentence(rng: random.Random, vocab: dict) -> str:
+    subject = rng.choice(vocab["names"]) if rng.random() < 0.3 else _zipf_choice(rng, vocab["nouns"])
+    words = [
+        rng.choice(vocab["articles"]), rng.choice(vocab["adjectives"]), subject,
+        _zipf_choice(rng, vocab["verbs"]), _zipf_choice(rng, vocab["nouns"]),
+        vocab["glue"], _zipf_choice(rng, vocab["nouns"]),
+    ]
+    return " ".join(words) + "."
+
+
+def generate_document(rng: random.Random, language: str, number: int) -> str:
+    """Erzeugt ein Dokument mit Überschriften, Absätzen, Code-Block, Link und Hervorhebung."""
+    vocab = _VOCABULARY[language]
+    lines = [f"# {rng.choice(vocab['names'])} {_zipf_choice(rng, vocab['nouns'])} {number}", ""]
+    for _ in range(rng.randint(2, 6)):
+        lines.append(f"## {rng.choice(vocab['adjectives']).capitalize()} {_zipf_choice(rng, vocab['nouns'])}")
+        lines.append("")
+        for _ in range(rng.randint(1, 4)):
+            lines.append(" ".join(_sentence(rng, vocab) for _ in range(rng.randint(2, 6))))
+            lines.append("")
+        roll = rng.random()
+        if roll < 0.2:
+            lines += ["```bash", f"kubectl rollout restart deployment/app-{number % 97}", "```", ""]
+        elif roll < 0.4:
+            link = f"[{rng.choice(vocab['links'])}](https://example.com/{number})"
+            lines += [f"{vocab['see']} {link} **{rare_term(number)}**.", ""]
+    return "\n".join(lines)
+
+
+def rare_term(number: int) -> str:
+    """Seltener Fachbegriff (wenige Dokumente je Begriff) für realistische Stichwortlisten."""
+    return f"module{number % 1000}"
+
+
+def generate_documents(count: int, language: str = "en", seed: int = 42) -> list[str]:
+    """Erzeugt `count` Dokumente; gleiche Parameter liefern immer denselben Korpus."""
+    rng = random.Random(f"{seed}-{language}")
+    return [generate_document(rng, language, number) for number in range(count)]
+
+
+def write_corpus(folder: str, count: int, language: str = "en", seed: int = 42) -> list[str]:
+    """Schreibt den Korpus nach `folder` (verteilt auf Unterordner) und gibt die Pfade zurück.
+    Ein bereits vollständig vorhandener Korpus wird wiederverwendet.
+    """
+    marker = os.path.join(folder, ".complete")
+    paths = [
+        os.path.join(folder, f"d{number // _FILES_PER_DIR:04d}", f"doc-{number:06d}.md")
+        for number in range(count)
+    ]
+    if os.path.exists(marker):
+        return paths
+    rng = random.Random(f"{seed}-{language}")
+    for number, path in enumerate(paths):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(generate_document(rng, language, number))
+    with open(marker, "w", encoding="utf-8") as f:
+        f.write(f"{count} {language} {seed}\n")
+    return paths
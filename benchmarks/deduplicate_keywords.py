@@ -0,0 +1,77 @@
+# benchmarks/deduplicate_keywords.py
+"""Mikrobenchmark für _deduplicate_keywords: früherer paarweiser Vergleich gegen den
+Präfix-Index, auf zufälligen Vokabularen mit abgeschnittenen Lemma-Varianten.
+
+    uv run python benchmarks/deduplicate_keywords.py [--sizes 1000 10000 100000]
+
+Prüft zugleich, dass beide Verfahren dieselben Stichwörter liefern. Das frühere Verfahren
+wächst quadratisch und wird nur bis --reference-limit Stichwörter gemessen.
+"""
+
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extractor import _deduplicate_keywords  # noqa: E402
+
+
+def deduplicate_pairwise(keywords: set[str]) -> set[str]:
+    """Bisherige Implementierung als Vergleichsbasis."""
+    to_remove = set()
+    sorted_kw = sorted(keywords, key=len)
+    for i, short in enumerate(sorted_kw):
+        if len(short) < 4:
+            continue
+        for long in sorted_kw[i + 1:]:
+            if long.startswith(short) and len(long) - len(short) <= 3:
+                to_remove.add(short)
+                break
+    return keywords - to_remove
+
+
+def vocabulary(size: int, seed: int = 42) -> set[str]:
+    """Zufällige Stichwörter; etwa jedes zehnte ist eine um 1–3 Zeichen gekürzte Variante."""
+    rng = random.Random(seed)
+    keywords: set[str] = set()
+    while len(keywords) < size:
+        word = "".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 14)))
+        keywords.add(word)
+        if len(word) > 5 and rng.random() < 0.1:
+            keywords.add(word[:-rng.randint(1, 3)])
+    return keywords
+
+
+def _seconds(func, keywords: set[str]) -> float:
+    start = time.perf_counter()
+    func(keywords)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mikrobenchmark für _deduplicate_keywords.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--reference-limit", type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"{'Stichwörter':>11} {'paarweise ms':>13} {'Präfix ms':>10} {'Faktor':>7} {'gleich':>7}")
+    for size in args.sizes:
+        keywords = vocabulary(size)
+        indexed = _seconds(_deduplicate_keywords, keywords)
+        if size > args.reference_limit:
+            print(f"{len(keywords):>11} {'-':>13} {indexed * 1000:>10.2f} {'-':>7} {'-':>7}")
+            continue
+        pairwise = _seconds(deduplicate_pairwise, keywords)
+        equal = deduplicate_pairwise(keywords) == _deduplicate_keywords(keywords)
+        print(
+            f"{len(keywords):>11} {pairwise * 1000:>13.2f} {indexed * 1000:>10.2f} "
+            f"{pairwise / indexed:>7.1f} {'ja' if equal else 'NEIN':>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
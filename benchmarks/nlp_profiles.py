@@ -0,0 +1,70 @@
+# benchmarks/nlp_profiles.py
+"""Vergleicht die Extraktionsprofile (MCP_NLP_PROFILE) nach Durchsatz und Stichwort-Gleichheit.
+
+    uv run python benchmarks/nlp_profiles.py [ORDNER] [--language en] [--limit 500]
+
+Ohne ORDNER wird ein synthetischer Korpus (benchmarks/corpus.py) verwendet. Referenz für die
+Gleichheit ist das Profil "full"; benötigt die installierten spaCy-Modelle.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from corpus import generate_documents  # noqa: E402
+from extractor import NLP_PROFILES, _load_model, extract_keyword_sets  # noqa: E402
+
+
+def load_corpus(folder: str | None, limit: int, language: str) -> list[str]:
+    """Liest bis zu `limit` Markdown-Dateien aus `folder` oder erzeugt einen synthetischen Korpus."""
+    if not folder:
+        return generate_documents(limit, language)
+    texts = []
+    for root, _, files in os.walk(folder):
+        for file in sorted(files):
+            if file.endswith(".md") and len(texts) < limit:
+                with open(os.path.join(root, file), encoding="utf-8") as f:
+                    texts.append(f.read())
+    return texts
+
+
+def _jaccard(a: list[str], b: list[str]) -> float:
+    union = set(a) | set(b)
+    return len(set(a) & set(b)) / len(union) if union else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vergleicht die Extraktionsprofile (MCP_NLP_PROFILE).")
+    parser.add_argument("folder", nargs="?")
+    parser.add_argument("--language", default="en")
+    parser.add_argument("--limit", type=int, default=500)
+    args = parser.parse_args()
+
+    texts = load_corpus(args.folder, args.limit, args.language)
+    chars = sum(len(text) for text in texts)
+    print(f"{len(texts)} Dokumente, {chars} Zeichen, Sprache {args.language}")
+    print(f"{'Profil':<8} {'Dok/s':>8} {'kZeichen/s':>11} {'gleich':>8} {'Jaccard':>8}")
+    reference = None
+    for profile in NLP_PROFILES:
+        # Modell außerhalb der Messung laden
+        extract_keyword_sets(texts[:1], language=args.language, n_process=1, profile=profile)
+        start = time.perf_counter()
+        results = extract_keyword_sets(texts, language=args.language, n_process=1, profile=profile)
+        elapsed = time.perf_counter() - start
+        keywords = [result.keywords for result in results]
+        if reference is None:
+            reference = keywords
+        equal = sum(a == b for a, b in zip(reference, keywords, strict=True)) / max(len(texts), 1)
+        jaccard = sum(map(_jaccard, reference, keywords)) / max(len(texts), 1)
+        print(
+            f"{profile:<8} {len(texts) / elapsed:>8.1f} {chars / elapsed / 1000:>11.1f} "
+            f"{equal:>8.1%} {jaccard:>8.3f}"
+        )
+        _load_model.cache_clear()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+# benchmarks/run.py
+"""Benchmark für Indexierungsdurchsatz und Tool-Latenz auf synthetischen Korpora.
+
+    uv run python benchmarks/run.py --sizes 1000 10000 100000 --languages en de --output bench.json
+
+Jede Kombination aus Größe und Sprache läuft in einem eigenen Prozess (eigene
+Datenbank, eigener Spitzenwert des Speicherverbrauchs). Gemessen werden:
+- cold_index: erster scan_markdown_files-Lauf auf leerer Datenbank
+- noop_rescan: erneuter Scan ohne Änderungen
+- incremental_index: Scan nach Änderung eines Anteils der Dateien (--changed)
+- tools: p50/p99 je MCP-Tool (direkter Funktionsaufruf, ohne HTTP-Transport)
+- peak_rss_mb: maximaler Speicher des Prozesses und seiner Worker-Prozesse
+Die Korpora werden in --workdir zwischengespeichert und wiederverwendet.
+"""
+
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, ROOT)
+
+from corpus import _VOCABULARY, write_corpus  # noqa: E402
+
+
+class _ToolCollector:
+    """Fängt die registrierten Tool-Funktionen ein, um sie direkt aufzurufen."""
+
+    def __init__(self):
+        self.tools: dict = {}
+
+    def tool(self, name: str, description: str):
+        def decorator(func):
+            self.tools[name] = func
+            return func
+        return decorator
+
+
+def _percentile(samples: list[float], percent: float) -> float:
+    """Perzentil nach dem Nearest-Rank-Verfahren."""
+    ordered = sorted(samples)
+    rank = max(1, round(percent / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def _peak_rss_mb() -> float:
+    """Maximaler Speicher (RSS) dieses Prozesses und seiner beendeten Kindprozesse in MB."""
+    # ru_maxrss: Kilobyte unter Linux, Byte unter macOS
+    unit = 1 if sys.platform == "darwin" else 1024
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    return round(peak * unit / 1024 / 1024, 1)
+
+
+def _timed_scan(folder: str, files: int) -> dict:
+    from scanner import scan_markdown_files
+
+    start = time.perf_counter()
+    scan_markdown_files(folder)
+    seconds = time.perf_counter() - start
+    return {"seconds": round(seconds, 3), "files_per_s": round(files / seconds, 1)}
+
+
+def _touch(paths: list[str], share: float, rng: random.Random) -> dict[str, str]:
+    """Hängt an einen Anteil der Dateien eine Zeile an und setzt die mtime vor.
+    Gibt die ursprünglichen Inhalte zurück, damit der Korpus danach wiederhergestellt werden kann.
+    """
+    originals = {}
+    for path in rng.sample(paths, max(1, int(len(paths) * share))):
+        with open(path, encoding="utf-8") as f:
+            originals[path] = f.read()
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("\nUpdated paragraph for the incremental benchmark.\n")
+        stat = os.stat(path)
+        os.utime(path, (stat.st_atime, stat.st_mtime + 1))
+    return originals
+
+
+def _restore(originals: dict[str, str]):
+    """Stellt die von _touch geänderten Dateien wieder her (der Korpus bleibt wiederverwendbar)."""
+    for path, content in originals.items():
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+
+
+def _workload(language: str, filenames: list[str], rng: random.Random) -> dict:
+    """Argumente je Tool; jeder Aufruf bekommt zufällige, aber reproduzierbare Werte."""
+    vocab = _VOCABULARY[language]
+    terms = [word.lower() for word in vocab["nouns"] + vocab["names"]]
+    return {
+        "search-by-keywords": lambda: {"keywords": rng.sample(terms, 2)},
+        "search-sections": lambda: {"keywords": rng.sample(terms, 2)},
+        "list-all-files": dict,
+        "list-all-keywords": dict,
+        "fulltext-search": lambda: {"query": rng.choice(terms)},
+        "get-file-by-name": lambda: {"filename": rng.choice(filenames)},
+        "get-file-info": lambda: {"filename": rng.choice(filenames)},
+        "semantic-search": lambda: {"query": " ".join(rng.sample(terms, 3))},
+    }
+
+
+def _measure_tools(language: str, filenames: list[str], calls: int, rng: random.Random) -> dict:
+    from tools import register_tools
+
+    app = _ToolCollector()
+    register_tools(app)
+    workload = _workload(language, filenames, rng)
+    results = {}
+    for name, func in app.tools.items():
+        if name not in workload:
+            continue
+        samples = []
+        for _ in range(calls):
+            kwargs = workload[name]()
+            start = time.perf_counter()
+            func(**kwargs)
+            samples.append((time.perf_counter() - start) * 1000)
+        results[name] = {
+            "calls": calls,
+            # Erster Aufruf getrennt: list-all-* werden danach aus dem Cache bedient
+            "first_ms": round(samples[0], 3),
+            "p50_ms": round(_percentile(samples, 50), 3),
+            "p99_ms": round(_percentile(samples, 99), 3),
+        }
+    return results
+
+
+def run_single(args) -> dict:
+    """Misst eine Kombination aus Größe und Sprache (läuft im eigenen Prozess)."""
+    from config import INDEX_WORKERS, NLP_BATCH_SIZE, NLP_PROFILE
+    from db import close_connections, init_db
+
+    folder = os.environ["MCP_SCAN_FOLDER"]
+    paths = write_corpus(folder, args.size, args.language, args.seed)
+    rng = random.Random(args.seed)
+    # Ausgaben des Scanners nach stderr, damit stdout nur das JSON-Ergebnis enthält
+    with contextlib.redirect_stdout(sys.stderr):
+        init_db()
+        cold = _timed_scan(folder, len(paths))
+        noop = _timed_scan(folder, len(paths))
+        changed = _touch(paths, args.changed, rng)
+        try:
+            incremental = _timed_scan(folder, len(changed))
+        finally:
+            _restore(changed)
+        filenames = [os.path.relpath(path, folder) for path in paths]
+        tools = _measure_tools(args.language, filenames, args.calls, rng)
+        close_connections()
+    return {
+        "language": args.language,
+        "files": len(paths),
+        "bytes": sum(os.path.getsize(path) for path in paths),
+        "nlp_profile": NLP_PROFILE,
+        "index_workers": INDEX_WORKERS,
+        "nlp_batch_size": NLP_BATCH_SIZE,
+        "cold_index": cold,
+        "noop_rescan": noop,
+        "incremental_index": {**incremental, "changed_files": len(changed)},
+        "tools": tools,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_all(args) -> dict:
+    """Startet je Kombination einen Messprozess und fasst die Ergebnisse zusammen."""
+    workdir = args.workdir or os.path.join(tempfile.gettempdir(), "mcp-md-benchmarks")
+    runs = []
+    for language in args.languages:
+        for size in args.sizes:
+            folder = os.path.join(workdir, f"corpus-{language}-{size}-{args.seed}")
+            db_path = os.path.join(workdir, f"bench-{language}-{size}.db")
+            for suffix in ("", "-wal", "-shm"):
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(db_path + suffix)
+            # Korpus vorab erzeugen, damit das Schreiben nicht in die Messung eingeht
+            write_corpus(folder, size, language, args.seed)
+            print(f"[Benchmark] {language} {size} Dateien ...", file=sys.stderr)
+            env = {**os.environ, "MCP_SCAN_FOLDER": folder, "MCP_DB_PATH": db_path}
+            command = [
+                sys.executable, os.path.abspath(__file__), "--single",
+                "--sizes", str(size), "--languages", language, "--seed", str(args.seed),
+                "--calls", str(args.calls), "--changed", str(args.changed),
+            ]
+            output = subprocess.run(command, env=env, cwd=ROOT, capture_output=True, text=True, check=False)
+            if output.returncode != 0:
+                sys.exit(f"[Fehler] Benchmark {language} {size} fehlgeschlagen\n{output.stderr}")
+            runs.append(json.loads(output.stdout))
+    return {
+        "meta": {
+            "timestamp": datetime.datetime.now(datetime.UTC).isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "seed": args.seed,
+        },
+        "runs": runs,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark für Indexierung und Tool-Latenz.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--languages", nargs="+", default=["en", "de"], choices=sorted(_VOCABULARY))
+    parser.add_argument("--calls", type=int, default=200, help="Aufrufe je Tool")
+    parser.add_argument("--changed", type=float, default=0.01, help="Anteil geänderter Dateien")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workdir", help="Ablage für Korpora und Datenbanken (Standard: Temp-Verzeichnis)")
+    parser.add_argument("--output", help="JSON-Datei (Standard: stdout)")
+    parser.add_argument("--single", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        args.size, args.language = args.sizes[0], args.languages[0]
+        print(json.dumps(run_single(args)))
+        return
+    result = json.dumps(run_all(args), indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(result + "\n")
+    else:
+        print(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# benchmarks/strip_markdown.py
+"""Mikrobenchmark für die Markdown-Bereinigung: früheres Verfahren (fünf aufeinanderfolgende
+re.sub) gegen _scan_markdown, auf pathologischen Eingaben und dem synthetischen Korpus.
+
+    uv run python benchmarks/strip_markdown.py [--size 20000] [--repeat 5]
+
+Prüft zugleich, dass beide Verfahren denselben Text liefern. Bei "brackets" braucht das frühere
+Verfahren quadratische Zeit – große --size-Werte dauern dort Minuten.
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from corpus import generate_documents  # noqa: E402
+from extractor import _strip_markdown  # noqa: E402
+
+
+def strip_markdown_chained(text: str) -> str:
+    """Bisherige Implementierung als Vergleichsbasis."""
+    text = re.sub(r"^#+\s*", "", text, flags=re.MULTILINE)
+    text = re.sub(r"```[\s\S]*?```", "", text)
+    text = re.sub(r"`[^`]+`", "", text)
+    text = re.sub(r"\[([^\]]+)\]\([^)]+\)", r"\1", text)
+    text = re.sub(r"[*_]{1,3}([^*_]+)[*_]{1,3}", r"\1", text)
+    return text
+
+
+def inputs(size: int) -> dict[str, str]:
+    """Eingaben mit etwa `size` Zeichen, die die einzelnen Regeln an ihre Grenzen bringen."""
+
+    def repeat(piece: str) -> str:
+        return piece * max(1, size // len(piece))
+
+    return {
+        "snake_case": repeat("some_long_snake_case_identifier_name "),
+        "backticks": repeat("` unmatched "),
+        "unclosed_fence": "```python\n" + repeat("print(value) # `x`\n"),
+        "brackets": repeat("[") + "]",
+        "open_links": repeat("[text](") + ")",
+        "emphasis": repeat("***bold*** and _it_ "),
+        "headings": repeat("## Heading\nText with **bold** and [a link](url).\n"),
+        "corpus": "\n".join(generate_documents(max(1, size // 2000), "en")),
+    }
+
+
+def _best(func, text: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mikrobenchmark für die Markdown-Bereinigung.")
+    parser.add_argument("--size", type=int, default=20_000, help="Zeichen je Eingabe")
+    parser.add_argument("--repeat", type=int, default=5, help="Wiederholungen (gemessen wird die schnellste)")
+    args = parser.parse_args()
+
+    print(f"{'Eingabe':<15} {'Zeichen':>9} {'re.sub ms':>10} {'Scan ms':>9} {'Faktor':>7} {'gleich':>7}")
+    for name, text in inputs(args.size).items():
+        chained = _best(strip_markdown_chained, text, args.repeat)
+        scanned = _best(_strip_markdown, text, args.repeat)
+        equal = strip_markdown_chained(text) == _strip_markdown(text)
+        print(
+            f"{name:<15} {len(text):>9} {chained * 1000:>10.2f} {scanned * 1000:>9.2f} "
+            f"{chained / scanned:>7.1f} {'ja' if equal else 'NEIN':>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,105 @@
 # config.py
 
 import os
+from typing import NamedTuple
 
 # Basisordner für Markdown-Dateien
 SCAN_FOLDER = os.getenv("MCP_SCAN_FOLDER", "/markdowns")
 
+
+class ScanRoot(NamedTuple):
+    """Ein zu scannender Wurzelordner mit seinen Regeln."""
+    path: str
+    # Präfix der Dateinamen in der Datenbank ("" bei nur einem Wurzelordner)
+    label: str
+    # Globs für aufzunehmende Dateien und für auszulassende Dateien und Verzeichnisse; ohne "/"
+    # gegen den Namen geprüft, mit "/" gegen den Pfad relativ zum Wurzelordner
+    include: tuple[str, ...]
+    exclude: tuple[str, ...]
+
+
+def _globs(value: str) -> tuple[str, ...]:
+    return tuple(glob.strip() for glob in value.split(",") if glob.strip())
+
+
+def parse_scan_roots(spec: str, include: tuple[str, ...], exclude: tuple[str, ...]) -> list[ScanRoot]:
+    """Liest MCP_SCAN_ROOTS: Ordner getrennt durch os.pathsep, je Ordner optional mit
+    "|include=...", "|exclude=..." (kommagetrennte Globs, ersetzen die Vorgaben) und "|name=...".
+    Bei mehreren Ordnern beginnen die Dateinamen mit dem Namen (Standard: letzter Pfadteil).
+    """
+    roots = []
+    for item in (part.strip() for part in spec.split(os.pathsep)):
+        if not item:
+            continue
+        path, *options = item.split("|")
+        rules = {"include": include, "exclude": exclude, "name": os.path.basename(os.path.normpath(path))}
+        for option in options:
+            key, _, value = option.partition("=")
+            if key.strip() not in rules:
+                raise ValueError(f"MCP_SCAN_ROOTS: unbekannte Option '{key.strip()}' bei {path}")
+            rules[key.strip()] = value.strip() if key.strip() == "name" else _globs(value)
+        roots.append(ScanRoot(os.path.normpath(path), str(rules["name"]), rules["include"], rules["exclude"]))
+    if len(roots) == 1:
+        return [roots[0]._replace(label="")]
+    labels = [root.label for root in roots]
+    for label in labels:
+        if labels.count(label) > 1:
+            raise ValueError(f"MCP_SCAN_ROOTS: Name '{label}' ist mehrfach vergeben – eindeutig per '|name=...' festlegen")
+    return roots
+
+
+# Globs für aufzunehmende Dateien und für auszulassende Dateien/Verzeichnisse (kommagetrennt).
+# Ausgelassene Verzeichnisse werden nicht betreten.
+SCAN_INCLUDE = _globs(os.getenv("MCP_SCAN_INCLUDE", "*.md"))
+SCAN_EXCLUDE = _globs(os.getenv("MCP_SCAN_EXCLUDE", ".git,node_modules"))
+
+# Wurzelordner (durch ":" getrennt, je Ordner optional mit eigenen Regeln), z.B.
+# "/markdowns:/srv/repos|exclude=.git,node_modules,vendor|name=repos"; leer = nur MCP_SCAN_FOLDER
+SCAN_ROOTS = parse_scan_roots(os.getenv("MCP_SCAN_ROOTS", "") or SCAN_FOLDER, SCAN_INCLUDE, SCAN_EXCLUDE)
+
 # ⏱Scanintervall in Sekunden
 SCAN_INTERVAL = int(os.getenv("MCP_SCAN_INTERVAL", "60"))
 
+# Verzeichnis-Snapshot: 0 = jeder Scan liest alle Verzeichnisse und prüft alle Dateien;
+# > 0 = Verzeichnisse mit unveränderter mtime werden übersprungen, alle N Sekunden vollständiger Scan
+DEEP_SCAN_INTERVAL = int(os.getenv("MCP_DEEP_SCAN_INTERVAL", "0"))
+
 # SQLite-Datenbankpfad
 DB_PATH = os.getenv("MCP_DB_PATH", "./model_context.db")
 
+# SQLite: Wartezeit in Millisekunden bei gesperrter Datenbank
+SQLITE_BUSY_TIMEOUT = int(os.getenv("MCP_SQLITE_BUSY_TIMEOUT", "5000"))
+
+# SQLite: Größe des Memory-Mappings in Bytes (0 = deaktiviert)
+SQLITE_MMAP_SIZE = int(os.getenv("MCP_SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
 # spaCy-Modelle (kommasepariert, erstes Modell = Fallback)
 SPACY_MODELS = [m.strip() for m in os.getenv("MCP_SPACY_MODELS", "en_core_web_sm,de_core_news_sm").split(",")]
+
+# Extraktionsprofil: "full" = komplette Pipeline, "lean" = ohne NER,
+# "tagger" = ohne NER und Parser (am schnellsten, ROOT-Verben werden angenähert).
+# Standard bleibt "full", bis Messungen mit benchmarks/nlp_profiles.py vorliegen
+NLP_PROFILE = os.getenv("MCP_NLP_PROFILE", "full").strip().lower()
+
+# Worker-Prozesse für die Stichwort-Extraktion (0 = alle CPU-Kerne)
+INDEX_WORKERS = int(os.getenv("MCP_INDEX_WORKERS", "1")) or os.cpu_count() or 1
+
+# Dokumente pro spaCy-Batch (nlp.pipe)
+NLP_BATCH_SIZE = int(os.getenv("MCP_NLP_BATCH_SIZE", "32"))
+
+# Watch-Modus: Änderungen per inotify (watchdog) statt nur per periodischem Scan erkennen
+WATCH_MODE = os.getenv("MCP_WATCH", "false").lower() in {"1", "true", "yes"}
+
+# Wartezeit in Sekunden, bis eine geänderte Datei im Watch-Modus indexiert wird
+WATCH_DEBOUNCE = float(os.getenv("MCP_WATCH_DEBOUNCE", "2"))
+
+# Intervall in Sekunden für den vollständigen Abgleich-Scan im Watch-Modus
+RECONCILE_INTERVAL = int(os.getenv("MCP_RECONCILE_INTERVAL", "3600"))
+
+# Semantische Suche: "" = aus, "spacy" = Vektoren der spaCy-Modelle (je Sprache),
+# sonst Name eines sentence-transformers-Modells (z.B. "paraphrase-multilingual-MiniLM-L12-v2")
+EMBEDDING_MODEL = os.getenv("MCP_EMBEDDING_MODEL", "").strip()
+
+# Indexer: "process" = eigener Prozess (konkurriert nicht mit dem Server um den GIL),
+# "thread" = Thread im Server-Prozess, "off" = kein Indexer (z.B. bei separatem scanner.py)
+INDEXER_MODE = os.getenv("MCP_INDEXER_MODE", "process").strip().lower()
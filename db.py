@@ -1,9 +1,219 @@
 # db.py
 
+import hashlib
 import sqlite3
 import os
-from config import DB_PATH
-from extractor import extract_keywords, detect_language
+import threading
+import zlib
+from collections import defaultdict
+from contextlib import contextmanager
+import numpy as np
+import metrics
+from config import DB_PATH, EMBEDDING_MODEL, SQLITE_BUSY_TIMEOUT, SQLITE_MMAP_SIZE
+from embeddings import embed_texts, embeddings_enabled
+from extractor import _profile_name, extract_keyword_sets, detect_language
+from layout import document_layout
+
+# Dateien pro Transaktion bei der Aktualisierung (begrenzt den Speicherbedarf beim Erstindex)
+_INDEX_CHUNK_SIZE = 512
+# Dokumentinhalte werden in zlib-komprimierten Blöcken dieser Länge (Zeichen) gespeichert,
+# damit Bereichsabfragen nur die betroffenen Blöcke entpacken müssen
+_CONTENT_CHUNK_CHARS = 65536
+# Einträge, die das Änderungsprotokoll der Abschnittsvektoren (vector_changes) mindestens behält;
+# ein Server, der weiter zurückliegt, lädt seine Vektoren vollständig neu
+_VECTOR_LOG_SIZE = 100_000
+# Ab so vielen Einträgen (Scan) werden die bekannten mtimes vollständig vorab geladen;
+# kleinere Listen (Watch-Modus) fragen gezielt nach ihren Dateinamen
+_PRELOAD_MIN_ENTRIES = _INDEX_CHUNK_SIZE
+# Version der Stichwort-Extraktion je Profil: Einträge mit anderer Version werden beim nächsten
+# Scan neu extrahiert, auch wenn sich weder mtime noch Inhalt geändert haben. Jedes Profil hat
+# eine eigene Version, damit ein Wechsel des Profils neu extrahiert ("lean" könnte sich "full"
+# teilen, sobald Messungen gleiche Stichwörter belegen). Beim Erhöhen immer eine noch nie
+# vergebene Nummer wählen, sonst gelten Einträge eines anderen Profils als aktuell.
+_INDEX_VERSIONS = {
+    "full": 1,
+    "lean": 3,
+    "tagger": 2,
+}
+_INDEX_VERSION = _INDEX_VERSIONS[_profile_name()]
+
+# Volltextindex (Trigramme → Teilstring-Suche, inkl. Codebeispiele). contentless: der Text
+# liegt nur komprimiert in contents; files.fts_rowid verweist auf die Zeile im Index
+_FULLTEXT_SCHEMA = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS files_fts USING fts5(
+        content,
+        content = '',
+        tokenize = 'trigram'
+    )
+"""
+
+# Lesende Verbindungen: eine pro Thread und Datenbankpfad
+_readers = threading.local()
+# Schreibende Verbindung: eine pro Prozess und Datenbankpfad, serialisiert über einen Lock
+_writers: dict[str, sqlite3.Connection] = {}
+_write_lock = threading.RLock()
+
+# Generation des Index: ein Zähler in der Datenbank (index_generation), den jeder Commit mit
+# geänderten Einträgen erhöht, auch in anderen Prozessen. Caches im Server-Prozess erkennen
+# daran, wann sie verworfen werden müssen.
+_uncommitted_changes = False
+# Werden Änderungen gemeldet (Indexer-Thread im selben Prozess oder Pipe vom Indexer-Prozess),
+# merkt sich current_generation den Zähler bis zur nächsten Meldung; sonst liest es ihn jedes Mal
+_changes_reported = False
+_generation_memo: dict[str, int] = {}
+_generation_epoch = 0
+_generation_lock = threading.Lock()
+# Wird nach jedem Commit mit geänderten Einträgen aufgerufen (Indexer-Prozess → Server)
+_change_listener = None
+
+
+class _TimedCursor(sqlite3.Cursor):
+    """Cursor, der die Ausführungszeit jeder Anweisung misst (mcp_sqlite_query_seconds).
+    SQLite berechnet bei execute() die erste Ergebniszeile; Sortierung und Aggregation
+    der Suchabfragen sind damit enthalten, das Abholen weiterer Zeilen nicht.
+    """
+
+    def execute(self, sql, parameters=(), /):
+        with metrics.timed("mcp_sqlite_query_seconds", **self._labels(sql)):
+            return super().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters, /):
+        with metrics.timed("mcp_sqlite_query_seconds", **self._labels(sql)):
+            return super().executemany(sql, seq_of_parameters)
+
+    def _labels(self, sql: str) -> dict:
+        words = sql.split(None, 1)
+        return {"connection": getattr(self.connection, "role", "read"), "statement": words[0].lower() if words else ""}
+
+
+class _TimedConnection(sqlite3.Connection):
+    """Verbindung, deren Cursor (auch für conn.execute) die Ausführungszeit messen."""
+
+    role = "read"
+
+    def cursor(self, factory=_TimedCursor):  # type: ignore[override]
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=(), /):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters, /):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def _configure_connection(conn):
+    """Setzt die gemeinsamen PRAGMAs für alle Verbindungen."""
+    conn.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT}")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+
+
+def get_read_connection() -> sqlite3.Connection:
+    """Gibt die read-only Verbindung des aktuellen Threads zurück.
+    Im WAL-Modus blockieren Leser nicht auf Schreibzugriffe des Scanners;
+    die Verbindung wird pro Thread wiederverwendet statt pro Anfrage neu geöffnet.
+    """
+    connections = getattr(_readers, "connections", None)
+    if connections is None:
+        connections = _readers.connections = {}
+    conn = connections.get(DB_PATH)
+    if conn is None:
+        conn = sqlite3.connect(f"file:{DB_PATH}?mode=ro", uri=True, factory=_TimedConnection)
+        _configure_connection(conn)
+        connections[DB_PATH] = conn
+    return conn
+
+
+@contextmanager
+def write_connection():
+    """Stellt die einzige schreibende Verbindung des Prozesses exklusiv bereit.
+    Am Ende wird committet, bei einer Exception zurückgerollt.
+    """
+    with _write_lock:
+        conn = _writers.get(DB_PATH)
+        if conn is None:
+            conn = sqlite3.connect(DB_PATH, check_same_thread=False, factory=_TimedConnection)
+            conn.role = "write"
+            conn.execute("PRAGMA journal_mode = WAL")
+            _configure_connection(conn)
+            _writers[DB_PATH] = conn
+        try:
+            yield conn
+            commit(conn)
+        except BaseException:
+            conn.rollback()
+            raise
+
+
+def commit(conn):
+    """Committet die schreibende Verbindung und erhöht die Generation, falls Einträge geändert wurden."""
+    global _uncommitted_changes
+    if _uncommitted_changes:
+        conn.execute("UPDATE index_generation SET generation = generation + 1")
+    conn.commit()
+    if _uncommitted_changes:
+        _uncommitted_changes = False
+        bump_generation()
+        if _change_listener is not None:
+            _change_listener()
+
+
+def bump_generation():
+    """Verwirft den gemerkten Zähler, damit current_generation ihn neu liest (nach einer Änderungsmeldung)."""
+    global _generation_epoch
+    with _generation_lock:
+        _generation_epoch += 1
+        _generation_memo.clear()
+
+
+def report_changes(enabled: bool):
+    """Legt fest, ob ein Schreiber jede Änderung per bump_generation meldet.
+    Nur dann darf current_generation den gelesenen Zähler zwischen den Meldungen merken.
+    """
+    global _changes_reported
+    with _generation_lock:
+        _changes_reported = enabled
+        _generation_memo.clear()
+
+
+def set_change_listener(listener):
+    """Registriert eine Funktion, die nach jedem Commit mit geänderten Einträgen aufgerufen wird."""
+    global _change_listener
+    _change_listener = listener
+
+
+def current_generation() -> int | None:
+    """Gibt die aktuelle Generation des Index zurück (None, solange die Datenbank nicht angelegt ist)."""
+    with _generation_lock:
+        epoch = _generation_epoch
+        if _changes_reported and DB_PATH in _generation_memo:
+            return _generation_memo[DB_PATH]
+    try:
+        generation = get_read_connection().execute("SELECT generation FROM index_generation").fetchone()[0]
+    except sqlite3.OperationalError:
+        return None
+    with _generation_lock:
+        # Eine Meldung während des Lesens macht den Wert womöglich veraltet → nicht merken
+        if _changes_reported and epoch == _generation_epoch:
+            _generation_memo[DB_PATH] = generation
+    return generation
+
+
+def _mark_changed():
+    """Merkt vor, dass die laufende Transaktion Einträge ändert (Generation steigt beim Commit)."""
+    global _uncommitted_changes
+    _uncommitted_changes = True
+
+
+def close_connections():
+    """Schließt die Leseverbindungen des aktuellen Threads und alle Schreibverbindungen."""
+    for conn in getattr(_readers, "connections", {}).values():
+        conn.close()
+    _readers.connections = {}
+    with _write_lock:
+        for conn in _writers.values():
+            conn.close()
+        _writers.clear()
 
 
 def _migrate_columns(conn):
@@ -19,6 +229,401 @@ def _migrate_columns(conn):
         cur.execute("ALTER TABLE files ADD COLUMN language TEXT")
         conn.commit()
         print("[Migration] language-Spalte zur Datenbank hinzugefügt")
+    if "fts_rowid" not in columns:
+        cur.execute("ALTER TABLE files ADD COLUMN fts_rowid INTEGER")
+        conn.commit()
+        print("[Migration] fts_rowid-Spalte zur Datenbank hinzugefügt")
+    if "content_hash" not in columns:
+        cur.execute("ALTER TABLE files ADD COLUMN content_hash TEXT")
+        # Hashes aus dem gespeicherten Inhalt nachtragen, damit der nächste Scan nicht alles neu indexiert
+        cur.execute("SELECT filename, content FROM files WHERE content IS NOT NULL")
+        cur.executemany(
+            "UPDATE files SET content_hash = ? WHERE filename = ?",
+            [(_content_hash(content), filename) for filename, content in cur.fetchall()],
+        )
+        conn.commit()
+        print("[Migration] content_hash-Spalte zur Datenbank hinzugefügt")
+    if "index_version" not in columns:
+        # Bestehende Einträge behalten Version 0 und werden beim nächsten Scan neu extrahiert
+        cur.execute("ALTER TABLE files ADD COLUMN index_version INTEGER NOT NULL DEFAULT 0")
+        conn.commit()
+        print("[Migration] index_version-Spalte zur Datenbank hinzugefügt")
+
+
+def _content_hash(content):
+    """BLAKE2b-Hash des Dateiinhalts zur Erkennung inhaltlich unveränderter Dateien."""
+    return hashlib.blake2b(content.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _migrate_keywords(conn):
+    """Befüllt den invertierten Index aus der keywords-Spalte (für bestehende DBs)."""
+    cur = conn.cursor()
+    cur.execute("PRAGMA table_info(keywords)")
+    if "in_heading" not in [row[1] for row in cur.fetchall()]:
+        # Herkunft aus Überschriften ist erst nach der nächsten Extraktion bekannt
+        cur.execute("ALTER TABLE keywords ADD COLUMN in_heading INTEGER NOT NULL DEFAULT 0")
+        conn.commit()
+        print("[Migration] in_heading-Spalte zum Stichwort-Index hinzugefügt")
+    cur.execute("SELECT 1 FROM keywords LIMIT 1")
+    if cur.fetchone():
+        return
+    cur.execute("SELECT filename, keywords, language FROM files WHERE keywords IS NOT NULL AND keywords != ''")
+    rows = cur.fetchall()
+    cur.executemany(
+        "INSERT INTO keywords (term, filename, language, in_heading) VALUES (?, ?, ?, ?)",
+        [posting for filename, keyword_str, language in rows
+         for posting in _postings(filename, keyword_str.split(","), language)],
+    )
+    if rows:
+        conn.commit()
+        print(f"[Migration] Stichwort-Index für {len(rows)} Dateien aufgebaut")
+
+
+def _migrate_keyword_stats(conn):
+    """Berechnet die Dokumenthäufigkeiten aus dem Stichwort-Index (für bestehende DBs)."""
+    cur = conn.cursor()
+    cur.execute("SELECT 1 FROM keyword_stats LIMIT 1")
+    if cur.fetchone():
+        return
+    cur.execute("""
+        INSERT INTO keyword_stats (term, language, doc_count)
+        SELECT term, language, COUNT(*) FROM keywords GROUP BY term, language
+    """)
+    if cur.rowcount > 0:
+        conn.commit()
+        print(f"[Migration] Stichwort-Statistik für {cur.rowcount} Stichwörter aufgebaut")
+
+
+def _migrate_language_stats(conn):
+    """Zählt die Dokumente je Sprache aus der files-Tabelle (für bestehende DBs)."""
+    cur = conn.cursor()
+    cur.execute("SELECT 1 FROM language_stats LIMIT 1")
+    if cur.fetchone():
+        return
+    cur.execute("""
+        INSERT INTO language_stats (language, doc_count)
+        SELECT coalesce(language, 'unknown'), COUNT(*) FROM files GROUP BY coalesce(language, 'unknown')
+    """)
+    if cur.rowcount > 0:
+        conn.commit()
+        print(f"[Migration] Dokumentzahlen für {cur.rowcount} Sprachen aufgebaut")
+
+
+def _migrate_scan_roots(conn):
+    """Fügt scan_roots die Spalte index_state hinzu (für bestehende DBs). Snapshots ohne
+    Stand gelten als veraltet; der nächste Scan ist vollständig und schreibt sie neu.
+    """
+    cur = conn.cursor()
+    cur.execute("PRAGMA table_info(scan_roots)")
+    if "index_state" not in [row[1] for row in cur.fetchall()]:
+        cur.execute("ALTER TABLE scan_roots ADD COLUMN index_state TEXT NOT NULL DEFAULT ''")
+        conn.commit()
+        print("[Migration] index_state-Spalte zu scan_roots hinzugefügt")
+
+
+def _migrate_fulltext(conn):
+    """Befüllt den Volltextindex aus dem komprimierten Inhaltsspeicher (für bestehende DBs).
+    Ein Index der früheren Fassung, der jeden Text ein zweites Mal unkomprimiert speicherte
+    (Schattentabelle files_fts_content), wird durch den contentless-Index ersetzt.
+    """
+    cur = conn.cursor()
+    cur.execute("SELECT 1 FROM sqlite_master WHERE name = 'files_fts_content'")
+    rebuilt = cur.fetchone() is not None
+    if rebuilt:
+        cur.execute("DROP TABLE files_fts")
+        cur.execute(_FULLTEXT_SCHEMA)
+        cur.execute("UPDATE files SET fts_rowid = NULL")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_files_fts_rowid ON files (fts_rowid)")
+    cur.execute("SELECT filename, content_hash FROM files WHERE content_hash IS NOT NULL AND fts_rowid IS NULL")
+    rows = cur.fetchall()
+    for filename, content_hash in rows:
+        cur.execute("INSERT INTO files_fts (content) VALUES (?)", (_read_content(cur, content_hash),))
+        cur.execute("UPDATE files SET fts_rowid = ? WHERE filename = ?", (cur.lastrowid, filename))
+    if rows or rebuilt:
+        conn.commit()
+        print(f"[Migration] Volltextindex für {len(rows)} Dateien aufgebaut")
+    if rebuilt:
+        conn.execute("VACUUM")
+
+
+def _migrate_sections(conn):
+    """Berechnet die Gliederung aus der content-Spalte (für bestehende DBs)."""
+    cur = conn.cursor()
+    cur.execute("SELECT 1 FROM sections LIMIT 1")
+    if cur.fetchone():
+        return
+    cur.execute("SELECT filename, content FROM files WHERE content IS NOT NULL")
+    rows = cur.fetchall()
+    for filename, content in rows:
+        _write_layout(cur, filename, content)
+    if rows:
+        conn.commit()
+        print(f"[Migration] Gliederung für {len(rows)} Dateien aufgebaut")
+
+
+def _migrate_contents(conn):
+    """Verschiebt Inhalte aus der files-Tabelle in den komprimierten Inhaltsspeicher (für bestehende DBs)."""
+    cur = conn.cursor()
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_files_content_hash ON files (content_hash)")
+    moved = 0
+    while True:
+        cur.execute("SELECT filename, content FROM files WHERE content IS NOT NULL LIMIT ?", (_INDEX_CHUNK_SIZE,))
+        rows = cur.fetchall()
+        if not rows:
+            break
+        for filename, content in rows:
+            content_hash = _content_hash(content)
+            _store_content(cur, content_hash, content)
+            cur.execute(
+                "UPDATE files SET content = NULL, content_hash = ? WHERE filename = ?",
+                (content_hash, filename),
+            )
+        conn.commit()
+        moved += len(rows)
+    if moved:
+        # Freigewordene Seiten zurückgeben, damit die Datenbankdatei tatsächlich schrumpft
+        conn.execute("VACUUM")
+        print(f"[Migration] Inhalt von {moved} Dateien in den komprimierten Speicher verschoben")
+
+
+def _store_content(cur, content_hash, content):
+    """Legt den Inhalt komprimiert in Blöcken ab (ohne Commit); bereits gespeicherte Hashes werden übersprungen."""
+    cur.executemany(
+        "INSERT OR IGNORE INTO contents (hash, seq, data) VALUES (?, ?, ?)",
+        [
+            (content_hash, seq, zlib.compress(content[start:start + _CONTENT_CHUNK_CHARS].encode("utf-8")))
+            for seq, start in enumerate(range(0, len(content), _CONTENT_CHUNK_CHARS))
+        ],
+    )
+
+
+def _prune_contents(cur, hashes):
+    """Entfernt gespeicherte Inhalte, auf die keine Datei mehr verweist."""
+    cur.executemany(
+        "DELETE FROM contents WHERE hash = ? AND NOT EXISTS (SELECT 1 FROM files WHERE content_hash = ?)",
+        [(content_hash, content_hash) for content_hash in hashes if content_hash],
+    )
+
+
+def _load_content_hashes(cur, filenames):
+    """Liest die gespeicherten Inhalts-Hashes der Dateien: {filename: content_hash}."""
+    hashes = {}
+    for start in range(0, len(filenames), _INDEX_CHUNK_SIZE):
+        chunk = filenames[start:start + _INDEX_CHUNK_SIZE]
+        placeholders = ",".join("?" * len(chunk))
+        cur.execute(f"SELECT filename, content_hash FROM files WHERE filename IN ({placeholders})", chunk)
+        hashes.update(cur.fetchall())
+    return hashes
+
+
+def _write_layout(cur, filename, content):
+    """Speichert Abschnitte und Zeilenmarken eines Dokuments (ohne Commit)."""
+    sections, line_marks = document_layout(content)
+    cur.executemany(
+        "INSERT INTO sections (filename, idx, heading, level, start_line, line_count, start_char, length) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        [(filename, idx, *section) for idx, section in enumerate(sections)],
+    )
+    cur.executemany(
+        "INSERT INTO line_marks (filename, line, start_char) VALUES (?, ?, ?)",
+        [(filename, line, start_char) for line, start_char in line_marks],
+    )
+
+
+def _delete_layout(cur, params):
+    """Entfernt Abschnitte, Abschnitts-Stichwörter und Zeilenmarken der Dateien."""
+    cur.executemany("DELETE FROM sections WHERE filename = ?", params)
+    cur.executemany("DELETE FROM section_keywords WHERE filename = ?", params)
+    cur.executemany("DELETE FROM section_vectors WHERE filename = ?", params)
+    cur.executemany("DELETE FROM line_marks WHERE filename = ?", params)
+    cur.executemany("INSERT INTO vector_changes (filename) VALUES (?)", params)
+
+
+def _postings(filename, keywords, language, heading_keywords=()):
+    """Zeilen des invertierten Stichwort-Index für eine Datei: (term, filename, language, in_heading)."""
+    terms = {kw.strip().lower() for kw in keywords if kw.strip()}
+    in_heading = {kw.strip().lower() for kw in heading_keywords}
+    return [(term, filename, language or "unknown", int(term in in_heading)) for term in terms]
+
+
+def _load_postings(cur, filenames):
+    """Liest die gespeicherten Stichwörter der Dateien: {filename: {(term, language, in_heading), ...}}."""
+    postings = defaultdict(set)
+    for start in range(0, len(filenames), _INDEX_CHUNK_SIZE):
+        chunk = filenames[start:start + _INDEX_CHUNK_SIZE]
+        placeholders = ",".join("?" * len(chunk))
+        cur.execute(
+            f"SELECT filename, term, language, in_heading FROM keywords WHERE filename IN ({placeholders})",
+            chunk,
+        )
+        for filename, term, language, in_heading in cur.fetchall():
+            postings[filename].add((term, language, in_heading))
+    return postings
+
+
+def _apply_keyword_deltas(cur, deltas):
+    """Addiert die Änderungen {(term, language): delta} auf keyword_stats und entfernt Stichwörter ohne Dokumente."""
+    changed = [(term, language, delta) for (term, language), delta in deltas.items() if delta]
+    if not changed:
+        return
+    cur.executemany("""
+        INSERT INTO keyword_stats (term, language, doc_count) VALUES (?, ?, ?)
+        ON CONFLICT (term, language) DO UPDATE SET doc_count = doc_count + excluded.doc_count
+    """, changed)
+    cur.executemany(
+        "DELETE FROM keyword_stats WHERE term = ? AND language = ? AND doc_count <= 0",
+        [(term, language) for term, language, delta in changed if delta < 0],
+    )
+
+
+def _load_document_languages(cur, filenames):
+    """Liest die gespeicherten Sprachen der Dateien: {filename: language}."""
+    languages = {}
+    for start in range(0, len(filenames), _INDEX_CHUNK_SIZE):
+        chunk = filenames[start:start + _INDEX_CHUNK_SIZE]
+        placeholders = ",".join("?" * len(chunk))
+        cur.execute(
+            f"SELECT filename, coalesce(language, 'unknown') FROM files WHERE filename IN ({placeholders})",
+            chunk,
+        )
+        languages.update(cur.fetchall())
+    return languages
+
+
+def _apply_language_deltas(cur, deltas):
+    """Addiert die Änderungen {language: delta} auf language_stats und entfernt Sprachen ohne Dokumente."""
+    changed = [(language, delta) for language, delta in deltas.items() if delta]
+    if not changed:
+        return
+    cur.executemany("""
+        INSERT INTO language_stats (language, doc_count) VALUES (?, ?)
+        ON CONFLICT (language) DO UPDATE SET doc_count = doc_count + excluded.doc_count
+    """, changed)
+    cur.executemany(
+        "DELETE FROM language_stats WHERE language = ? AND doc_count <= 0",
+        [(language,) for language, delta in changed if delta < 0],
+    )
+
+
+def _delete_fulltext(cur, filenames):
+    """Entfernt die Volltextindex-Einträge der Dateien über die gespeicherte rowid.
+    Der contentless-Index braucht dafür den indexierten Text; er kommt aus dem komprimierten
+    Speicher (muss also vor _prune_contents gelöscht werden).
+    """
+    indexed = []
+    for start in range(0, len(filenames), _INDEX_CHUNK_SIZE):
+        chunk = list(filenames[start:start + _INDEX_CHUNK_SIZE])
+        placeholders = ",".join("?" * len(chunk))
+        cur.execute(
+            f"SELECT fts_rowid, content_hash FROM files WHERE filename IN ({placeholders}) AND fts_rowid IS NOT NULL",
+            chunk,
+        )
+        indexed.extend(cur.fetchall())
+    rows = []
+    for fts_rowid, content_hash in indexed:
+        content = _read_content(cur, content_hash)
+        if content is not None:
+            rows.append((fts_rowid, content))
+    cur.executemany("INSERT INTO files_fts (files_fts, rowid, content) VALUES ('delete', ?, ?)", rows)
+
+
+def _write_entries(cur, rows):
+    """Schreibt mehrere Dateieinträge samt Stichwort- und Volltextindex per executemany (ohne Commit).
+    rows: Liste von (filename, path, mtime, content, language, keywords, heading_keywords, section_keywords).
+    """
+    if not rows:
+        return
+    _mark_changed()
+    filenames = [row[0] for row in rows]
+    _delete_fulltext(cur, filenames)
+    # rowids für den Volltextindex selbst vergeben, damit alle Zeilen gebündelt eingefügt werden können
+    cur.execute("SELECT coalesce(max(rowid), 0) FROM files_fts")
+    next_rowid = cur.fetchone()[0] + 1
+
+    old_postings = _load_postings(cur, filenames)
+    old_hashes = _load_content_hashes(cur, filenames)
+    language_deltas = defaultdict(int)
+    for language in _load_document_languages(cur, filenames).values():
+        language_deltas[language] -= 1
+
+    fts_rows, file_rows, added, removed, section_postings = [], [], [], [], []
+    deltas = defaultdict(int)
+    for offset, row in enumerate(rows):
+        filename, path, mtime, content, language, keywords, heading_keywords, section_keywords = row
+        language_deltas[language or "unknown"] += 1
+        fts_rowid = next_rowid + offset
+        keyword_str = ",".join(sorted(set(keywords)))
+        fts_rows.append((fts_rowid, content))
+        content_hash = _content_hash(content)
+        _store_content(cur, content_hash, content)
+        file_rows.append((filename, path, mtime, keyword_str, language, fts_rowid, content_hash, _INDEX_VERSION))
+        for idx, terms in enumerate(section_keywords):
+            section_postings.extend(
+                (term, filename, idx, lang) for term, _, lang, _ in _postings(filename, terms, language)
+            )
+        # Nur die Differenz zum bisherigen Stichwort-Satz schreiben
+        old = old_postings.get(filename, set())
+        new = {
+            (term, lang, in_heading)
+            for term, _, lang, in_heading in _postings(filename, keywords, language, heading_keywords)
+        }
+        for term, lang, in_heading in new - old:
+            added.append((term, filename, lang, in_heading))
+            deltas[(term, lang)] += 1
+        for term, lang, _ in old - new:
+            removed.append((filename, term))
+            deltas[(term, lang)] -= 1
+
+    cur.executemany("INSERT INTO files_fts (rowid, content) VALUES (?, ?)", fts_rows)
+    cur.executemany("""
+        REPLACE INTO files (filename, path, mtime, keywords, language, fts_rowid, content_hash, index_version)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, file_rows)
+    _prune_contents(cur, set(old_hashes.values()))
+    cur.executemany("DELETE FROM keywords WHERE filename = ? AND term = ?", removed)
+    cur.executemany("INSERT INTO keywords (term, filename, language, in_heading) VALUES (?, ?, ?, ?)", added)
+    _apply_keyword_deltas(cur, deltas)
+    _apply_language_deltas(cur, language_deltas)
+    _delete_layout(cur, [(filename,) for filename in filenames])
+    for filename, _, _, content, *_ in rows:
+        _write_layout(cur, filename, content)
+    cur.executemany(
+        "INSERT INTO section_keywords (term, filename, idx, language) VALUES (?, ?, ?, ?)",
+        section_postings,
+    )
+
+
+def _write_entry(cur, filename, path, mtime, content, language, keywords, heading_keywords=(), section_keywords=()):
+    """Schreibt einen Dateieintrag samt Stichwort- und Volltextindex (ohne Commit)."""
+    _write_entries(cur, [(filename, path, mtime, content, language, keywords, heading_keywords, section_keywords)])
+
+
+def remove_file_entries(cur, filenames):
+    """Entfernt mehrere Dateieinträge samt Stichwort- und Volltextindex per executemany (ohne Commit)."""
+    if not filenames:
+        return
+    _mark_changed()
+    params = [(filename,) for filename in filenames]
+    old_hashes = _load_content_hashes(cur, list(filenames))
+    deltas = defaultdict(int)
+    for postings in _load_postings(cur, list(filenames)).values():
+        for term, language, _ in postings:
+            deltas[(term, language)] -= 1
+    language_deltas = defaultdict(int)
+    for language in _load_document_languages(cur, list(filenames)).values():
+        language_deltas[language] -= 1
+    _delete_fulltext(cur, filenames)
+    cur.executemany("DELETE FROM files WHERE filename = ?", params)
+    _prune_contents(cur, set(old_hashes.values()))
+    cur.executemany("DELETE FROM keywords WHERE filename = ?", params)
+    _apply_keyword_deltas(cur, deltas)
+    _apply_language_deltas(cur, language_deltas)
+    _delete_layout(cur, params)
+
+
+def remove_file_entry(cur, filename):
+    """Entfernt einen Dateieintrag samt Stichwort- und Volltextindex (ohne Commit)."""
+    remove_file_entries(cur, [filename])
 
 
 def init_db():
@@ -27,7 +632,7 @@ def init_db():
     if db_dir:
         os.makedirs(db_dir, exist_ok=True)
 
-    with sqlite3.connect(DB_PATH) as conn:
+    with write_connection() as conn:
         conn.execute("""
         CREATE TABLE IF NOT EXISTS files (
             filename TEXT PRIMARY KEY,
@@ -35,31 +640,501 @@ def init_db():
             mtime REAL,
             keywords TEXT,
             content TEXT,
-            language TEXT
+            language TEXT,
+            fts_rowid INTEGER,
+            content_hash TEXT,
+            index_version INTEGER NOT NULL DEFAULT 0
+        )
+        """)
+        # Invertierter Index: ein Eintrag pro (Stichwort, Datei)
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS keywords (
+            term TEXT NOT NULL,
+            filename TEXT NOT NULL,
+            language TEXT NOT NULL,
+            in_heading INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (filename, term)
+        )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_keywords_term_language ON keywords (term, language)")
+        # Dokumenthäufigkeit je Stichwort – wird bei jeder Änderung inkrementell nachgeführt
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS keyword_stats (
+            term TEXT NOT NULL,
+            language TEXT NOT NULL,
+            doc_count INTEGER NOT NULL,
+            PRIMARY KEY (term, language)
+        )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_keyword_stats_language ON keyword_stats (language, term)")
+        # Dokumente je Sprache (Gesamtzahl N für die IDF-Gewichte der Keyword-Suche)
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS language_stats (
+            language TEXT PRIMARY KEY,
+            doc_count INTEGER NOT NULL
+        )
+        """)
+        conn.execute(_FULLTEXT_SCHEMA)
+        # Invertierter Index je Abschnitt (idx wie in sections)
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS section_keywords (
+            term TEXT NOT NULL,
+            filename TEXT NOT NULL,
+            idx INTEGER NOT NULL,
+            language TEXT NOT NULL,
+            PRIMARY KEY (filename, idx, term)
+        )
+        """)
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_section_keywords_term_language ON section_keywords (term, language)"
+        )
+        # Vektoren je Abschnitt für die semantische Suche (float32, auf Länge 1 normiert)
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS section_vectors (
+            filename TEXT NOT NULL,
+            idx INTEGER NOT NULL,
+            language TEXT NOT NULL,
+            model TEXT NOT NULL,
+            vector BLOB NOT NULL,
+            PRIMARY KEY (filename, idx)
+        )
+        """)
+        if EMBEDDING_MODEL:
+            # Vektoren eines anderen Modells sind nicht vergleichbar → beim nächsten Scan neu berechnen
+            conn.execute("DELETE FROM section_vectors WHERE model != ?", (EMBEDDING_MODEL,))
+        # Generation des Index (eine Zeile), siehe commit() und current_generation()
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS index_generation (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            generation INTEGER NOT NULL
+        )
+        """)
+        conn.execute("INSERT OR IGNORE INTO index_generation (id, generation) VALUES (1, 0)")
+        # Änderungsprotokoll der Abschnittsvektoren: der Server ersetzt in seiner Vektormatrix
+        # nur die hier genannten Dateien, statt sie bei jeder Änderung komplett neu zu laden
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS vector_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            filename TEXT NOT NULL
+        )
+        """)
+        # Komprimierte Dokumentinhalte, nach Inhalts-Hash dedupliziert (files.content bleibt leer)
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS contents (
+            hash TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            data BLOB NOT NULL,
+            PRIMARY KEY (hash, seq)
+        ) WITHOUT ROWID
+        """)
+        # Gliederung der Dokumente für abschnitts- und zeilenweises Lesen
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS sections (
+            filename TEXT NOT NULL,
+            idx INTEGER NOT NULL,
+            heading TEXT NOT NULL,
+            level INTEGER NOT NULL,
+            start_line INTEGER NOT NULL,
+            line_count INTEGER NOT NULL,
+            start_char INTEGER NOT NULL,
+            length INTEGER NOT NULL,
+            PRIMARY KEY (filename, idx)
+        )
+        """)
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS line_marks (
+            filename TEXT NOT NULL,
+            line INTEGER NOT NULL,
+            start_char INTEGER NOT NULL,
+            PRIMARY KEY (filename, line)
+        )
+        """)
+        # Verzeichnis-Snapshot (MCP_DEEP_SCAN_INTERVAL): Stand jedes gelisteten Verzeichnisses,
+        # damit unveränderte Verzeichnisse beim nächsten Scan nicht erneut gelesen werden
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS dirs (
+            root TEXT NOT NULL,
+            path TEXT NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            listed_ns INTEGER NOT NULL,
+            subdirs TEXT NOT NULL,
+            files TEXT NOT NULL,
+            PRIMARY KEY (root, path)
+        )
+        """)
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS scan_roots (
+            root TEXT PRIMARY KEY,
+            rules TEXT NOT NULL,
+            deep_scan_at REAL NOT NULL,
+            index_state TEXT NOT NULL DEFAULT ''
         )
         """)
         # Migration: fehlende Spalten hinzufügen (für bestehende DBs)
         _migrate_columns(conn)
+        _migrate_keywords(conn)
+        _migrate_keyword_stats(conn)
+        _migrate_language_stats(conn)
+        _migrate_scan_roots(conn)
+        _migrate_sections(conn)
+        _migrate_contents(conn)
+        _migrate_fulltext(conn)
+
+
+def _snapshot_state():
+    """Stand der Extraktion, für den ein Verzeichnis-Snapshot gilt. Übersprungene Verzeichnisse
+    liefern keine Einträge; ein anderes Profil oder Einbettungsmodell braucht daher einen
+    vollständigen Scan, damit alle Dateien neu extrahiert bzw. eingebettet werden.
+    """
+    return f"{_INDEX_VERSION}:{EMBEDDING_MODEL}"
+
+
+def _split_names(names):
+    """Namen eines Verzeichnisses werden durch "/" getrennt gespeichert (in Namen nicht erlaubt)."""
+    return names.split("/") if names else []
+
+
+def load_dir_snapshot(root, rules):
+    """Liest den Verzeichnis-Snapshot eines Wurzelordners: ({Verzeichnis: (mtime_ns, listed_ns,
+    Unterverzeichnisse)}, Zeitpunkt des letzten vollständigen Scans). Ohne Snapshot, bei
+    geänderten Regeln oder anderem Extraktionsstand ({}, None). Die Dateinamen je Verzeichnis
+    liest load_dir_files nur für die Verzeichnisse, die sich geändert haben.
+    """
+    cur = get_read_connection().cursor()
+    cur.execute("SELECT rules, deep_scan_at, index_state FROM scan_roots WHERE root = ?", (root,))
+    row = cur.fetchone()
+    if row is None or row[0] != rules or row[2] != _snapshot_state():
+        return {}, None
+    cur.execute("SELECT path, mtime_ns, listed_ns, subdirs FROM dirs WHERE root = ?", (root,))
+    snapshot = {
+        path: (mtime_ns, listed_ns, _split_names(subdirs))
+        for path, mtime_ns, listed_ns, subdirs in cur.fetchall()
+    }
+    return snapshot, row[1]
+
+
+def load_dir_files(root, paths):
+    """Gespeicherte Dateinamen der angegebenen Verzeichnisse: {Verzeichnis: [Datei, ...]}."""
+    cur = get_read_connection().cursor()
+    files = {}
+    for start in range(0, len(paths), _INDEX_CHUNK_SIZE):
+        chunk = paths[start:start + _INDEX_CHUNK_SIZE]
+        cur.execute(
+            f"SELECT path, files FROM dirs WHERE root = ? AND path IN ({','.join('?' * len(chunk))})", [root, *chunk]
+        )
+        files.update((path, _split_names(names)) for path, names in cur.fetchall())
+    return files
+
+
+def save_dir_snapshot(root, rules, listed, stale, deep_scan_at=None):
+    """Speichert neu gelistete Verzeichnisse ({Verzeichnis: (mtime_ns, listed_ns,
+    Unterverzeichnisse, Dateien)}) und entfernt nicht mehr vorhandene.
+    Mit deep_scan_at (vollständiger Scan) wird der Snapshot des Wurzelordners ersetzt.
+    """
+    with write_connection() as conn:
+        cur = conn.cursor()
+        if deep_scan_at is not None:
+            cur.execute("DELETE FROM dirs WHERE root = ?", (root,))
+            cur.execute(
+                "INSERT OR REPLACE INTO scan_roots (root, rules, deep_scan_at, index_state) VALUES (?, ?, ?, ?)",
+                (root, rules, deep_scan_at, _snapshot_state()),
+            )
+        else:
+            cur.executemany("DELETE FROM dirs WHERE root = ? AND path = ?", ((root, path) for path in stale))
+        cur.executemany(
+            "INSERT OR REPLACE INTO dirs (root, path, mtime_ns, listed_ns, subdirs, files) VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                (root, path, mtime_ns, listed_ns, "/".join(subdirs), "/".join(files))
+                for path, (mtime_ns, listed_ns, subdirs, files) in listed.items()
+            ),
+        )
+
 
 def update_file_entry(path, filename, mtime):
     """Aktualisiert oder fügt einen Dateieintrag hinzu, wenn sich das Änderungsdatum geändert hat."""
-    with sqlite3.connect(DB_PATH) as conn:
+    update_file_entries([(path, filename, mtime)])
+
+
+def update_file_entries(entries):
+    """Aktualisiert mehrere Dateieinträge, deren Änderungsdatum sich geändert hat.
+    Bei einem Scan werden die bekannten mtimes einmalig vorab geladen; ein unveränderter
+    Korpus kostet so genau eine Abfrage. Kleine Listen (Watch-Modus) lesen nur ihre eigenen
+    Zeilen. Geänderte Dateien werden nach Sprache gruppiert, gebündelt durch spaCy
+    geschickt und blockweise per executemany geschrieben. Kommt eine Datei mehrfach vor
+    (Watch-Modus: Verzeichnis und Datei darin im selben Ereignis-Batch), gilt der letzte Eintrag.
+    Gibt die Dateinamen zurück, die nicht gelesen oder extrahiert werden konnten.
+    """
+    entries = list({entry[1]: entry for entry in entries}.values())
+    filenames = [filename for _, filename, _ in entries]
+    preload = len(entries) >= _PRELOAD_MIN_ENTRIES
+    with write_connection() as conn:
         cur = conn.cursor()
-        cur.execute("SELECT mtime FROM files WHERE filename=?", (filename,))
-        row = cur.fetchone()
-
-        if not row or row[0] != mtime:
-            try:
-                with open(path, encoding="utf-8") as f:
-                    content = f.read()
-                language = detect_language(content)
-                keywords = extract_keywords(content, language=language)
-                keyword_str = ",".join(sorted(set(keywords)))
-                cur.execute("""
-                    REPLACE INTO files (filename, path, mtime, keywords, content, language)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (filename, path, mtime, keyword_str, content, language))
-                conn.commit()
-                print(f"[Aktualisiert] {filename} ({language}) mit {len(keywords)} Stichwörtern")
-            except Exception as e:
-                print(f"[Fehler] Datei konnte nicht verarbeitet werden: {path}\n{e}")
+        known_mtimes = _load_known_mtimes(cur, None if preload else filenames)
+        changed = [entry for entry in entries if known_mtimes.get(entry[1]) != entry[2]]
+        failed = []
+        for start in range(0, len(changed), _INDEX_CHUNK_SIZE):
+            failed += _update_chunk(conn, changed[start:start + _INDEX_CHUNK_SIZE])
+        _update_vectors(conn, None if preload else filenames)
+        cur.execute(
+            "DELETE FROM vector_changes WHERE seq <= (SELECT max(seq) FROM vector_changes) - ?", (_VECTOR_LOG_SIZE,)
+        )
+    return failed
+
+
+def _load_known_mtimes(cur, filenames=None):
+    """Gespeicherte mtimes der aktuellen Extraktions-Version: {filename: mtime}.
+    Ohne filenames für alle Dateien; Einträge einer älteren Version gelten als geändert.
+    """
+    if filenames is None:
+        cur.execute("SELECT filename, mtime FROM files WHERE index_version = ?", (_INDEX_VERSION,))
+        return dict(cur.fetchall())
+    known = {}
+    for start in range(0, len(filenames), _INDEX_CHUNK_SIZE):
+        chunk = filenames[start:start + _INDEX_CHUNK_SIZE]
+        placeholders = ",".join("?" * len(chunk))
+        cur.execute(
+            f"SELECT filename, mtime FROM files WHERE filename IN ({placeholders}) AND index_version = ?",
+            [*chunk, _INDEX_VERSION],
+        )
+        known.update(cur.fetchall())
+    return known
+
+
+def _update_vectors(conn, filenames=None):
+    """Berechnet die Vektoren aller Abschnitte (bzw. der Abschnitte von filenames), für die
+    noch keine vorliegen. Neue und geänderte Dateien verlieren ihre Vektoren mit der alten
+    Gliederung; so werden nur sie neu eingebettet. Derselbe Weg füllt den Index nach dem
+    Aktivieren der semantischen Suche oder einem Modellwechsel (beim nächsten Scan).
+    """
+    if not embeddings_enabled() or filenames == []:
+        return
+    cur = conn.cursor()
+    sql = """
+        SELECT DISTINCT s.filename
+        FROM sections s LEFT JOIN section_vectors v ON v.filename = s.filename AND v.idx = s.idx
+        WHERE v.filename IS NULL
+    """
+    if filenames is None:
+        cur.execute(sql)
+        pending = [row[0] for row in cur.fetchall()]
+    else:
+        pending = []
+        for start in range(0, len(filenames), _INDEX_CHUNK_SIZE):
+            chunk = filenames[start:start + _INDEX_CHUNK_SIZE]
+            cur.execute(f"{sql} AND s.filename IN ({','.join('?' * len(chunk))})", chunk)
+            pending.extend(row[0] for row in cur.fetchall())
+    for start in range(0, len(pending), _INDEX_CHUNK_SIZE):
+        _update_vector_chunk(conn, pending[start:start + _INDEX_CHUNK_SIZE])
+
+
+def _update_vector_chunk(conn, filenames):
+    """Bettet die Abschnitte eines Blocks von Dateien ein (gebündelt je Sprache) und committet."""
+    cur = conn.cursor()
+    placeholders = ",".join("?" * len(filenames))
+    cur.execute(
+        f"SELECT filename, coalesce(language, 'unknown'), content_hash FROM files WHERE filename IN ({placeholders})",
+        filenames,
+    )
+    pending_by_language = defaultdict(list)
+    for filename, language, content_hash in cur.fetchall():
+        content = _read_content(cur, content_hash)
+        if content is None:
+            continue
+        for idx, (*_, start, length) in enumerate(document_layout(content)[0]):
+            pending_by_language[language].append((filename, idx, content[start:start + length]))
+
+    rows = []
+    for language, pending in pending_by_language.items():
+        try:
+            vectors = embed_texts([text for _, _, text in pending], language=language)
+        except Exception as e:
+            print(f"[Fehler] Einbettung von {len(pending)} Abschnitten ({language}) fehlgeschlagen\n{e}")
+            continue
+        for (filename, idx, _), vector in zip(pending, vectors, strict=True):
+            rows.append((filename, idx, language, EMBEDDING_MODEL, vector.astype(np.float32).tobytes()))
+
+    if rows:
+        _mark_changed()
+        cur.executemany(
+            "REPLACE INTO section_vectors (filename, idx, language, model, vector) VALUES (?, ?, ?, ?, ?)",
+            rows,
+        )
+        cur.executemany(
+            "INSERT INTO vector_changes (filename) VALUES (?)",
+            [(filename,) for filename in dict.fromkeys(row[0] for row in rows)],
+        )
+        print(f"[Vektoren] {len(rows)} Abschnitte eingebettet")
+    commit(conn)
+
+
+def _load_languages(cur, content_hashes):
+    """Bereits erkannte Sprachen je Inhalts-Hash (Kopien, Neuextraktion nach Versionswechsel).
+    So wird dieselbe Datei immer derselben Sprache und damit demselben Modell zugeordnet.
+    """
+    if not content_hashes:
+        return {}
+    placeholders = ",".join("?" * len(content_hashes))
+    cur.execute(
+        f"SELECT content_hash, language FROM files WHERE content_hash IN ({placeholders}) AND language IS NOT NULL",
+        content_hashes,
+    )
+    return dict(cur.fetchall())
+
+
+def _update_chunk(conn, entries):
+    """Verarbeitet einen Block geänderter Einträge in einer Transaktion und gibt die
+    Dateinamen zurück, die nicht gelesen oder extrahiert werden konnten.
+    """
+    cur = conn.cursor()
+    placeholders = ",".join("?" * len(entries))
+    cur.execute(
+        f"SELECT filename, content_hash FROM files WHERE filename IN ({placeholders}) AND index_version = ?",
+        [*(filename for _, filename, _ in entries), _INDEX_VERSION],
+    )
+    known_hashes = dict(cur.fetchall())
+
+    touched = []
+    contents = []
+    failed = []
+    for path, filename, mtime in entries:
+        try:
+            with open(path, encoding="utf-8") as f:
+                content = f.read()
+        except Exception as e:
+            print(f"[Fehler] Datei konnte nicht verarbeitet werden: {path}\n{e}")
+            metrics.inc("mcp_files_total", result="failed")
+            failed.append(filename)
+            continue
+        content_hash = _content_hash(content)
+        # Nur mtime geändert (touch/Kopie) → keine erneute NLP-Verarbeitung
+        if known_hashes.get(filename) == content_hash:
+            touched.append((mtime, path, filename))
+        else:
+            contents.append((path, filename, mtime, content, content_hash))
+
+    known_languages = _load_languages(cur, [item[4] for item in contents])
+    pending_by_language = defaultdict(list)
+    for path, filename, mtime, content, content_hash in contents:
+        language = known_languages.get(content_hash) or detect_language(content)
+        pending_by_language[language].append((path, filename, mtime, content))
+
+    rows = []
+    for language, pending in pending_by_language.items():
+        try:
+            keyword_sets = extract_keyword_sets([item[3] for item in pending], language=language)
+        except Exception as e:
+            print(f"[Fehler] Stichwort-Extraktion für {len(pending)} Dateien ({language}) fehlgeschlagen\n{e}")
+            metrics.inc("mcp_files_total", len(pending), result="failed")
+            failed.extend(item[1] for item in pending)
+            continue
+        for (path, filename, mtime, content), result in zip(pending, keyword_sets, strict=True):
+            keywords, heading_keywords, section_keywords = result
+            rows.append((filename, path, mtime, content, language, keywords, heading_keywords, section_keywords))
+            print(f"[Aktualisiert] {filename} ({language}) mit {len(keywords)} Stichwörtern")
+
+    cur.executemany("UPDATE files SET mtime = ?, path = ? WHERE filename = ?", touched)
+    _write_entries(cur, rows)
+    commit(conn)
+    metrics.inc("mcp_files_total", len(rows), result="changed")
+    return failed
+
+
+# ── Lesen von Teilbereichen ───────────────────────────────────────────────────
+
+def _read_content(cur, content_hash, offset=0, length=None):
+    """Liest einen Zeichenbereich aus dem komprimierten Speicher; entpackt nur die betroffenen Blöcke."""
+    if content_hash is None:
+        return None
+    first = offset // _CONTENT_CHUNK_CHARS
+    if length is None:
+        cur.execute("SELECT data FROM contents WHERE hash = ? AND seq >= ? ORDER BY seq", (content_hash, first))
+    else:
+        last = (offset + max(length, 1) - 1) // _CONTENT_CHUNK_CHARS
+        cur.execute(
+            "SELECT data FROM contents WHERE hash = ? AND seq BETWEEN ? AND ? ORDER BY seq",
+            (content_hash, first, last),
+        )
+    text = "".join(zlib.decompress(data).decode("utf-8") for data, in cur.fetchall())
+    start = offset - first * _CONTENT_CHUNK_CHARS
+    return text[start:] if length is None else text[start:start + length]
+
+
+def read_document(filename, offset=0, length=None):
+    """Liest einen Zeichenbereich des gespeicherten Inhalts. Entpackt werden nur die Blöcke,
+    die den Bereich überdecken. Gibt None zurück, wenn kein Inhalt gespeichert ist.
+    """
+    cur = get_read_connection().cursor()
+    cur.execute("SELECT content_hash FROM files WHERE filename = ?", (filename,))
+    row = cur.fetchone()
+    if row is None:
+        return None
+    return _read_content(cur, row[0], offset, length)
+
+
+def read_document_lines(filename, start_line, end_line=None):
+    """Liest die Zeilen start_line bis end_line (inklusive, ab 1). Gelesen wird nur der Bereich
+    zwischen den umgebenden Zeilenmarken. Gibt None zurück, wenn kein Inhalt gespeichert ist.
+    """
+    start_line = max(1, start_line)
+    cur = get_read_connection().cursor()
+    cur.execute(
+        "SELECT line, start_char FROM line_marks WHERE filename = ? AND line <= ? ORDER BY line DESC LIMIT 1",
+        (filename, start_line),
+    )
+    mark = cur.fetchone()
+    if mark is None:
+        return read_document(filename, 0, 0)
+    first_line, start_char = mark
+    length = None
+    if end_line is not None:
+        cur.execute(
+            "SELECT start_char FROM line_marks WHERE filename = ? AND line > ? ORDER BY line LIMIT 1",
+            (filename, end_line),
+        )
+        next_mark = cur.fetchone()
+        if next_mark:
+            length = next_mark[0] - start_char
+    text = read_document(filename, start_char, length)
+    if text is None:
+        return None
+    lines = text.splitlines(keepends=True)
+    end = None if end_line is None else end_line - first_line + 1
+    return "".join(lines[start_line - first_line:end])
+
+
+def read_document_section(filename, idx):
+    """Liest einen Abschnitt (Index aus document_info). Gibt None zurück, wenn es ihn nicht gibt."""
+    cur = get_read_connection().cursor()
+    cur.execute("SELECT start_char, length FROM sections WHERE filename = ? AND idx = ?", (filename, idx))
+    row = cur.fetchone()
+    if row is None:
+        return None
+    return read_document(filename, *row)
+
+
+def document_info(filename):
+    """Pfad, Größe, Zeilenzahl und Abschnitte eines Dokuments.
+    Gibt None zurück, wenn die Datei unbekannt ist; "stored" ist False für alte Einträge
+    ohne gespeicherten Inhalt (dann fehlen auch die Abschnitte).
+    """
+    cur = get_read_connection().cursor()
+    cur.execute("SELECT path, content_hash IS NOT NULL FROM files WHERE filename = ?", (filename,))
+    row = cur.fetchone()
+    if row is None:
+        return None
+    path, stored = row
+    sections = []
+    if stored:
+        cur.execute(
+            "SELECT idx, heading, level, start_line, line_count, start_char, length "
+            "FROM sections WHERE filename = ? ORDER BY idx",
+            (filename,),
+        )
+        sections = cur.fetchall()
+    return {
+        "path": path,
+        "stored": bool(stored),
+        "size": sum(section[6] for section in sections),
+        "lines": sum(section[4] for section in sections),
+        "sections": sections,
+    }
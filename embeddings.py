@@ -0,0 +1,73 @@
+# embeddings.py
+
+import importlib
+import importlib.util
+from functools import lru_cache
+
+import numpy as np
+
+from config import EMBEDDING_MODEL, NLP_BATCH_SIZE
+from extractor import _get_nlp, _strip_markdown
+
+# Backend-Name für die Vektoren der geladenen spaCy-Modelle (kein zusätzliches Modell nötig)
+SPACY_BACKEND = "spacy"
+
+
+def embeddings_enabled() -> bool:
+    """Gibt zurück, ob die semantische Suche konfiguriert ist (MCP_EMBEDDING_MODEL)."""
+    if not EMBEDDING_MODEL:
+        return False
+    if EMBEDDING_MODEL == SPACY_BACKEND:
+        return True
+    return importlib.util.find_spec("sentence_transformers") is not None
+
+
+def shared_space() -> bool:
+    """Gibt zurück, ob alle Sprachen im selben Vektorraum liegen.
+    spaCy-Vektoren sind je Sprachmodell verschieden und nur innerhalb einer Sprache vergleichbar;
+    mehrsprachige sentence-transformers-Modelle finden auch Treffer über Sprachgrenzen hinweg.
+    """
+    return EMBEDDING_MODEL != SPACY_BACKEND
+
+
+@lru_cache(maxsize=1)
+def _sentence_model():
+    """Lädt das sentence-transformers-Modell einmalig (nur CPU)."""
+    module = importlib.import_module("sentence_transformers")
+    return module.SentenceTransformer(EMBEDDING_MODEL, device="cpu")
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """Normiert die Zeilen auf Länge 1 (Skalarprodukt = Kosinus-Ähnlichkeit); Nullvektoren bleiben 0."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return (vectors / np.where(norms > 0, norms, 1)).astype(np.float32)
+
+
+def embed_texts(texts: list[str], language: str | None = None) -> np.ndarray:
+    """Berechnet normierte float32-Vektoren (eine Zeile je Text)."""
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    stripped = [_strip_markdown(text) for text in texts]
+    if EMBEDDING_MODEL == SPACY_BACKEND:
+        # Für Dokumentvektoren werden Parser und NER nicht gebraucht
+        nlp = _get_nlp(language)
+        docs = nlp.pipe(stripped, batch_size=NLP_BATCH_SIZE, disable=["parser", "ner"])
+        vectors = np.array([doc.vector for doc in docs], dtype=np.float32)
+    else:
+        vectors = np.asarray(
+            _sentence_model().encode(stripped, batch_size=NLP_BATCH_SIZE, convert_to_numpy=True),
+            dtype=np.float32,
+        )
+    return _normalize(vectors)
+
+
+def top_k(matrix: np.ndarray, query: np.ndarray, k: int) -> list[tuple[int, float]]:
+    """Brute-Force-Suche: die k Zeilen mit der höchsten Kosinus-Ähnlichkeit als [(zeile, score), ...]."""
+    if not len(matrix) or k <= 0:
+        return []
+    scores = matrix @ query
+    k = min(k, len(scores))
+    # argpartition statt vollständiger Sortierung: O(n) für die Auswahl, sortiert werden nur k Treffer
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    ranked = candidates[np.argsort(-scores[candidates], kind="stable")]
+    return [(int(row), float(scores[row])) for row in ranked]
@@ -1,17 +1,89 @@
 # extractor.py
 
+import math
 import re
-import spacy
-import spacy.cli
+import threading
+import time
+from bisect import bisect_right
 from functools import lru_cache
-from langdetect import detect, LangDetectException
-from config import SPACY_MODELS
+from itertools import accumulate
+from typing import NamedTuple
+import metrics
+from config import SPACY_MODELS, INDEX_WORKERS, NLP_BATCH_SIZE, NLP_PROFILE
+from layout import document_layout
 
 FALLBACK_MODEL = SPACY_MODELS[0]
 
+# Extraktionsprofile: spaCy-Komponenten, die beim Laden ausgeschlossen werden.
+# Die Extraktion nutzt nur pos_, lemma_, dep_, is_stop und is_punct; NER läuft in den
+# Standardmodellen zuletzt und sollte diese Attribute nicht ändern ("lean"). Gemessen ist die
+# Übereinstimmung mit "full" noch nicht (benchmarks/nlp_profiles.py). "tagger" verzichtet auch
+# auf den Parser und nähert ROOT-Verben an.
+NLP_PROFILES = {
+    "full": (),
+    "lean": ("ner",),
+    "tagger": ("ner", "parser"),
+}
+
+# spaCy und langdetect werden erst bei Bedarf importiert: der Server beantwortet Leseanfragen
+# aus der bestehenden Datenbank, ohne auf die NLP-Bibliotheken warten zu müssen.
+_models_lock = threading.Lock()
+_models_checked = False
+
+# Stichprobe für die Spracherkennung: Anfang plus einige Ausschnitte aus dem Rest (Zeichen)
+_LANGUAGE_PREFIX_CHARS = 1500
+_LANGUAGE_CHUNKS = 3
+_LANGUAGE_CHUNK_CHARS = 500
+
+# Kurz-Lemmata ab _MIN_PREFIX Zeichen werden entfernt, wenn ein Stichwort sie um höchstens
+# _PREFIX_SLACK Zeichen verlängert
+_MIN_PREFIX = 4
+_PREFIX_SLACK = 3
+
+# Satzzeichen, nach denen ohne Parser ein neuer Satz beginnt
+_SENTENCE_END = {".", "!", "?", ":", ";"}
+
+# Markdown-Syntax für _scan_markdown
+_HEADING_MARKER = re.compile(r"^#+\s*", re.MULTILINE)
+_CODE_BLOCK = re.compile(r"```[\s\S]*?```")
+_INLINE_CODE = re.compile(r"`[^`]+`")
+_EMPHASIS = re.compile(r"[*_]{1,3}([^*_]+)[*_]{1,3}")
+
+
+class StrippedMarkdown(NamedTuple):
+    """Bereinigter Text mit den Positionen, die spätere Stufen wiederverwenden."""
+    text: str
+    # (Offset der Überschriftenzeile im Original, Beginn der Überschrift im bereinigten Text)
+    headings: list[tuple[int, int]]
+    # (start, end) der entfernten ```-Codeblöcke im Original
+    code_blocks: list[tuple[int, int]]
+
+
+class KeywordSets(NamedTuple):
+    """Extraktionsergebnis für ein Dokument."""
+    keywords: list[str]
+    # Teilmenge von keywords, die (auch) in Überschriften vorkommt
+    heading_keywords: list[str]
+    # Stichwörter je Abschnitt, in der Reihenfolge von layout.document_layout
+    section_keywords: list[list[str]]
+
+
+def _profile_name(profile: str | None = None) -> str:
+    """Gibt das gültige Extraktionsprofil zurück (unbekannte Namen → "full")."""
+    profile = profile or NLP_PROFILE
+    return profile if profile in NLP_PROFILES else "full"
+
+
+def uses_parser(profile: str | None = None) -> bool:
+    """Gibt zurück, ob das Profil den Dependency-Parser lädt (echte ROOT-Verben)."""
+    return "parser" not in NLP_PROFILES[_profile_name(profile)]
+
 
 def ensure_models():
     """Prüft ob alle konfigurierten spaCy-Modelle installiert sind und lädt fehlende herunter."""
+    import spacy
+    import spacy.cli
+
     for model_name in SPACY_MODELS:
         if spacy.util.is_package(model_name):
             print(f"[OK] spaCy-Modell '{model_name}' vorhanden")
@@ -20,51 +92,200 @@ def ensure_models():
         try:
             spacy.cli.download(model_name)  # type: ignore[attr-defined]
             print(f"[Download] '{model_name}' erfolgreich installiert")
-        except SystemExit:
-            print(f"[Warnung] spaCy-Modell '{model_name}' konnte nicht installiert werden, überspringe")
+        except (SystemExit, Exception) as e:
+            print(f"[Warnung] spaCy-Modell '{model_name}' konnte nicht installiert werden, überspringe\n{e}")
 
 
 @lru_cache(maxsize=8)
-def _load_model(model_name: str):
-    """Lädt und cached ein spaCy-Modell. Gibt None zurück, wenn das Modell nicht installiert ist."""
+def _load_model(model_name: str, profile: str = "full"):
+    """Lädt und cached ein spaCy-Modell ohne die vom Profil ausgeschlossenen Komponenten.
+    Gibt None zurück, wenn das Modell nicht installiert ist.
+    """
+    import spacy
+
     try:
-        return spacy.load(model_name)
+        return spacy.load(model_name, exclude=list(NLP_PROFILES[profile]))
     except OSError:
         return None
 
 
-def _get_nlp(language: str | None = None):
+def _ensure_models_once():
+    """Ruft ensure_models() einmalig vor dem ersten Laden eines Modells auf."""
+    global _models_checked
+    with _models_lock:
+        if not _models_checked:
+            # Auch bei Fehlern nur einmal versuchen, statt bei jedem Block erneut herunterzuladen
+            _models_checked = True
+            if NLP_PROFILE not in NLP_PROFILES:
+                print(f"[Warnung] Unbekanntes MCP_NLP_PROFILE '{NLP_PROFILE}', nutze 'full'")
+            ensure_models()
+
+
+def _get_nlp(language: str | None = None, profile: str | None = None):
     """Gibt das passende spaCy-Modell für die Sprache zurück, mit Fallback.
     Durchsucht alle konfigurierten Modelle nach passendem Sprachprefix.
+    Beim ersten Aufruf werden fehlende Modelle heruntergeladen.
     """
+    _ensure_models_once()
+    profile = _profile_name(profile)
     if language and language != "unknown":
         for model_name in SPACY_MODELS:
             if model_name.startswith(f"{language}_"):
-                model = _load_model(model_name)
+                model = _load_model(model_name, profile)
                 if model:
                     return model
-    model = _load_model(FALLBACK_MODEL)
+    model = _load_model(FALLBACK_MODEL, profile)
     if not model:
         raise RuntimeError(f"[Fehler] Fallback-Modell '{FALLBACK_MODEL}' konnte nicht geladen werden")
     return model
 
 
+def _model_name(nlp) -> str:
+    """Paketname des geladenen spaCy-Modells (z.B. 'en_core_web_sm') für die Metriken."""
+    meta = getattr(nlp, "meta", None)
+    if not isinstance(meta, dict) or "name" not in meta:
+        return "unknown"
+    return f"{meta.get('lang', 'xx')}_{meta['name']}"
+
+
+def _language_sample(text: str) -> str:
+    """Begrenzte Stichprobe des bereinigten Texts für die Spracherkennung:
+    der Anfang plus einige gleichmäßig verteilte Ausschnitte aus dem Rest,
+    jeweils an Wortgrenzen geschnitten. Kurze Texte werden vollständig verwendet.
+    """
+    stripped = _strip_markdown(text).strip() or text.strip()
+    budget = _LANGUAGE_PREFIX_CHARS + _LANGUAGE_CHUNKS * _LANGUAGE_CHUNK_CHARS
+    if len(stripped) <= budget:
+        return stripped
+    parts = [stripped[:stripped.rfind(" ", 0, _LANGUAGE_PREFIX_CHARS) + 1 or _LANGUAGE_PREFIX_CHARS]]
+    rest = len(stripped) - _LANGUAGE_PREFIX_CHARS
+    for n in range(1, _LANGUAGE_CHUNKS + 1):
+        start = _LANGUAGE_PREFIX_CHARS + rest * n // (_LANGUAGE_CHUNKS + 1) - _LANGUAGE_CHUNK_CHARS // 2
+        end = start + _LANGUAGE_CHUNK_CHARS
+        start = stripped.find(" ", start, end) + 1 or start
+        end = stripped.rfind(" ", start, end) if " " in stripped[start:end] else end
+        parts.append(stripped[start:end])
+    return "\n".join(parts)
+
+
 def detect_language(text: str) -> str:
-    """Erkennt die Sprache des Textes. Gibt den ISO-639-1-Code zurück (z.B. 'en', 'de')."""
+    """Erkennt die Sprache des Textes. Gibt den ISO-639-1-Code zurück (z.B. 'en', 'de').
+    Untersucht nur eine begrenzte Stichprobe; mit festem Seed liefert derselbe Text
+    immer dieselbe Sprache (langdetect ist sonst zufallsbasiert).
+    """
+    from langdetect import DetectorFactory, LangDetectException, detect
+
+    DetectorFactory.seed = 0
     try:
-        return detect(text)
+        return detect(_language_sample(text))
     except LangDetectException:
         return "unknown"
 
 
+def _spans(pattern: re.Pattern, text: str) -> list[tuple[int, int]]:
+    return [match.span() for match in pattern.finditer(text)]
+
+
+def _cut(text: str, spans: list[tuple[int, int]]) -> str:
+    """Entfernt sortierte, überlappungsfreie Bereiche aus dem Text."""
+    pieces = []
+    position = 0
+    for start, end in spans:
+        pieces.append(text[position:start])
+        position = end
+    pieces.append(text[position:])
+    return "".join(pieces)
+
+
+def _shift(positions: list[int], spans: list[tuple[int, int]]) -> list[int]:
+    """Rechnet Positionen auf den Text nach dem Entfernen der (sortierten) Bereiche um."""
+    if not spans:
+        return positions
+    # Führender Platzhalter-Bereich, damit jede Position einen Vorgänger hat
+    starts = [-1, *(start for start, _ in spans)]
+    ends = [-1, *(end for _, end in spans)]
+    removed = list(accumulate((end - start for start, end in spans), initial=0))
+    shifted = []
+    for position in positions:
+        index = bisect_right(starts, position) - 1
+        shifted.append(position - removed[index] + max(0, ends[index] - position))
+    return shifted
+
+
+def _inside(position: int, spans: list[tuple[int, int]]) -> bool:
+    index = bisect_right(spans, (position, math.inf)) - 1
+    return index >= 0 and position < spans[index][1]
+
+
+def _link_syntax(text: str) -> list[tuple[int, int]]:
+    """Findet Links [text](ziel) und gibt die zu entfernenden Teile ("[" und "](ziel)") zurück;
+    der Linktext bleibt stehen. Trifft dieselben Links wie der frühere Regex, springt nach einem
+    Fehlschlag aber hinter die "]": Der Regex versuchte jedes "[" davor erneut und brauchte bei
+    vielen offenen Klammern quadratische Zeit.
+    """
+    spans = []
+    start = text.find("[")
+    while start >= 0:
+        close = text.find("]", start + 1)
+        if close < 0:
+            break
+        if close > start + 1 and text.startswith("(", close + 1):
+            end = text.find(")", close + 2)
+            if end < 0:
+                break
+            if end > close + 2:
+                spans += [(start, start + 1), (close, end + 1)]
+                start = text.find("[", end + 1)
+                continue
+        # Jedes "[" vor derselben "]" scheitert an derselben Stelle
+        start = text.find("[", close + 1)
+    return spans
+
+
+def _remove(pattern: re.Pattern, text: str, positions: list[int]) -> tuple[str, list[int]]:
+    """Entfernt alle Treffer des Musters; Positionen werden nur umgerechnet, wenn es welche gibt."""
+    if not positions:
+        return pattern.sub("", text), positions
+    spans = _spans(pattern, text)
+    return _cut(text, spans), _shift(positions, spans)
+
+
+def _scan_markdown(text: str) -> StrippedMarkdown:
+    """Entfernt Markdown-Syntax, die die NLP-Verarbeitung stört, und merkt sich dabei,
+    wo die Überschriften im bereinigten Text beginnen und wo Codeblöcke im Original liegen.
+    Die Stufen laufen wie bisher nacheinander (Heading-Marker, ```-Codeblöcke, Inline-Code,
+    Links → nur Text, Bold/Italic) als vorkompilierte Regex-Durchläufe; nur die Links werden
+    ohne Regex gesucht, damit offene Klammern den Aufwand nicht quadratisch wachsen lassen.
+    """
+    markers = _spans(_HEADING_MARKER, text) if "#" in text else []
+    # Heading-Marker enthalten keine Backticks: die Codeblöcke sind im Original dieselben wie nach Stufe 1
+    code_blocks = _spans(_CODE_BLOCK, text) if "```" in text else []
+    if code_blocks:
+        markers = [marker for marker in markers if not _inside(marker[0], code_blocks)]
+    removed = sorted(markers + code_blocks)
+    stripped = _cut(text, removed)
+    positions = _shift([end for _, end in markers], removed)
+    if "`" in stripped:
+        stripped, positions = _remove(_INLINE_CODE, stripped, positions)
+    if "[" in stripped:
+        spans = _link_syntax(stripped)
+        stripped, positions = _cut(stripped, spans), _shift(positions, spans)
+    if positions and ("*" in stripped or "_" in stripped):
+        spans = [
+            span
+            for match in _EMPHASIS.finditer(stripped)
+            for span in ((match.start(), match.start(1)), (match.end(1), match.end()))
+        ]
+        stripped, positions = _cut(stripped, spans), _shift(positions, spans)
+    else:
+        stripped = _EMPHASIS.sub(r"\1", stripped)
+    headings = list(zip((start for start, _ in markers), positions, strict=True))
+    return StrippedMarkdown(stripped, headings, code_blocks)
+
+
 def _strip_markdown(text: str) -> str:
     """Entfernt Markdown-Syntax, die die NLP-Verarbeitung stört."""
-    text = re.sub(r"^#+\s*", "", text, flags=re.MULTILINE)  # Heading-Marker
-    text = re.sub(r"```[\s\S]*?```", "", text)  # Code-Blöcke
-    text = re.sub(r"`[^`]+`", "", text)  # Inline-Code
-    text = re.sub(r"\[([^\]]+)\]\([^)]+\)", r"\1", text)  # Links → nur Text
-    text = re.sub(r"[*_]{1,3}([^*_]+)[*_]{1,3}", r"\1", text)  # Bold/Italic
-    return text
+    return _scan_markdown(text).text
 
 
 def _token_keyword(token) -> str:
@@ -80,54 +301,180 @@ def _token_keyword(token) -> str:
 def _deduplicate_keywords(keywords: set[str]) -> set[str]:
     """Entfernt fehlerhafte Kurz-Lemmata, wenn eine längere Variante existiert.
     Z.B. 'kubernet' wird entfernt wenn 'kubernetes' vorhanden ist.
+    Statt jedes Stichwort mit allen längeren zu vergleichen, schlägt jedes Stichwort seine
+    um 1–3 Zeichen kürzeren Präfixe (mindestens 4 Zeichen) in der Menge nach: linear statt quadratisch.
     """
-    to_remove = set()
-    sorted_kw = sorted(keywords, key=len)
-    for i, short in enumerate(sorted_kw):
-        if len(short) < 4:
-            continue
-        for long in sorted_kw[i + 1:]:
-            if long.startswith(short) and len(long) - len(short) <= 3:
-                to_remove.add(short)
-                break
+    to_remove = {
+        keyword[:-cut]
+        for keyword in keywords
+        for cut in range(1, min(_PREFIX_SLACK, len(keyword) - _MIN_PREFIX) + 1)
+        if keyword[:-cut] in keywords
+    }
     return keywords - to_remove
 
 
-def extract_keywords(text: str, language: str | None = None) -> list[str]:
-    """
-    Extrahiert Stichwörter aus dem Text:
-    - Alle Nomen und Eigennamen (NOUN, PROPN) aus dem gesamten Text
-    - Alle bedeutungstragenden Wörter aus Markdown-Überschriften
-    - ROOT-Verben für Hauptaktionen
-    Wählt automatisch das passende spaCy-Modell anhand der Sprache.
-    """
-    nlp = _get_nlp(language)
-    keywords = set()
-
-    # 1. Wörter aus Markdown-Überschriften extrahieren (hohe Relevanz)
+def _heading_texts(text: str) -> list[str]:
+    """Gibt den Text aller Markdown-Überschriften (ohne #-Marker) zurück."""
+    headings = []
     for line in text.splitlines():
         stripped = line.strip()
         if stripped.startswith("#"):
             heading_text = stripped.lstrip("#").strip()
-            if not heading_text:
-                continue
-            heading_doc = nlp(heading_text)
-            for token in heading_doc:
-                if token.is_stop or token.is_punct or token.is_space or len(token.text) <= 1:
-                    continue
-                if token.pos_ in {"NOUN", "PROPN", "VERB", "ADJ"}:
-                    keywords.add(_token_keyword(token))
-
-    # 2. Stichwörter aus dem gesamten Text extrahieren (Markdown-Syntax bereinigt)
-    doc = nlp(_strip_markdown(text))
-    for token in doc:
+            if heading_text:
+                headings.append(heading_text)
+    return headings
+
+
+def _heading_keywords(heading_doc) -> set[str]:
+    """Alle bedeutungstragenden Wörter einer Überschrift (hohe Relevanz)."""
+    keywords = set()
+    for token in heading_doc:
+        if token.is_stop or token.is_punct or token.is_space or len(token.text) <= 1:
+            continue
+        if token.pos_ in {"NOUN", "PROPN", "VERB", "ADJ"}:
+            keywords.add(_token_keyword(token))
+    return keywords
+
+
+def _ends_sentence(token) -> bool:
+    """Satzende ohne Parser: Satzzeichen oder Zeilenumbruch."""
+    return (token.is_punct and token.text in _SENTENCE_END) or (token.is_space and "\n" in token.text)
+
+
+def _text_keywords(tokens, parsed: bool = True) -> set[str]:
+    """Nomen, Eigennamen und ROOT-Verben aus dem bereinigten Gesamttext (oder einem Teil seiner Tokens).
+    Ohne Parser (parsed=False) gilt das erste Verb jedes Satzes als ROOT-Verb.
+    """
+    keywords = set()
+    first_verb = True
+    for token in tokens:
+        if _ends_sentence(token):
+            first_verb = True
+            continue
         if token.is_stop or token.is_punct or token.is_space or len(token.text) <= 1:
             continue
         # Alle Nomen und Eigennamen (ohne Dependency-Filter)
         if token.pos_ in {"NOUN", "PROPN"}:
             keywords.add(_token_keyword(token))
         # Nur ROOT-Verben (Hauptverben)
-        elif token.pos_ == "VERB" and token.dep_ == "ROOT":
-            keywords.add(_token_keyword(token))
+        elif token.pos_ == "VERB":
+            is_root = token.dep_ == "ROOT" if parsed else first_verb
+            first_verb = False
+            if is_root:
+                keywords.add(_token_keyword(token))
+    return keywords
+
+
+def _section_starts(text: str, scanned: StrippedMarkdown) -> list[int]:
+    """Bestimmt, wo die Abschnitte des Originaltexts im bereinigten Text beginnen.
+    Für Überschriften am Zeilenanfang liefert _scan_markdown die Position direkt; eingerückte
+    Überschriften werden der Reihe nach am Zeilenanfang gesucht. Nicht gefundene Überschriften
+    beginnen an der Position des vorherigen Abschnitts (der Abschnitt bleibt dann leer).
+    """
+    known = dict(scanned.headings)
+    starts = []
+    position = 0
+    for heading, level, _, _, start_char, _ in document_layout(text)[0]:
+        if level:
+            if start_char in known:
+                position = max(position, known[start_char])
+            else:
+                target = _strip_markdown(heading).strip()
+                match = re.compile(r"^[ \t#]*" + re.escape(target), re.MULTILINE).search(scanned.text, position)
+                if match:
+                    position = match.start()
+        starts.append(position)
+    return starts
+
+
+def _section_keywords(text: str, scanned: StrippedMarkdown, doc, parsed: bool = True) -> list[set[str]]:
+    """Ordnet die Tokens des Gesamttexts den Abschnitten zu und extrahiert je Abschnitt die Stichwörter."""
+    starts = _section_starts(text, scanned)
+    tokens_per_section = [[] for _ in starts]
+    for token in doc:
+        index = bisect_right(starts, token.idx) - 1
+        if index >= 0:
+            tokens_per_section[index].append(token)
+    return [_text_keywords(tokens, parsed) for tokens in tokens_per_section]
+
+
+def extract_keywords(text: str, language: str | None = None) -> list[str]:
+    """
+    Extrahiert Stichwörter aus dem Text:
+    - Alle Nomen und Eigennamen (NOUN, PROPN) aus dem gesamten Text
+    - Alle bedeutungstragenden Wörter aus Markdown-Überschriften
+    - ROOT-Verben für Hauptaktionen
+    Wählt automatisch das passende spaCy-Modell anhand der Sprache.
+    Überschriften werden gesammelt in einem nlp.pipe-Durchlauf verarbeitet
+    statt einzeln; das Ergebnis ist identisch zum Einzelaufruf pro Überschrift.
+    """
+    return extract_keywords_batch([text], language=language, n_process=1)[0]
+
+
+def extract_keywords_batch(
+    texts: list[str],
+    language: str | None = None,
+    n_process: int = INDEX_WORKERS,
+    batch_size: int = NLP_BATCH_SIZE,
+) -> list[list[str]]:
+    """
+    Wie extract_keywords, aber für viele Texte derselben Sprache auf einmal.
+    Überschriften und Gesamttexte laufen gebündelt durch nlp.pipe; bei großen
+    Mengen verteilt spaCy die Batches auf bis zu n_process Worker-Prozesse.
+    """
+    return [
+        result.keywords
+        for result in extract_keyword_sets(texts, language=language, n_process=n_process, batch_size=batch_size)
+    ]
+
+
+def extract_keyword_sets(
+    texts: list[str],
+    language: str | None = None,
+    n_process: int = INDEX_WORKERS,
+    batch_size: int = NLP_BATCH_SIZE,
+    profile: str | None = None,
+) -> list[KeywordSets]:
+    """
+    Wie extract_keywords_batch, liefert aber je Text zusätzlich die Stichwörter,
+    die aus Überschriften stammen (für die Gewichtung bei der Suche), und die
+    Stichwörter je Abschnitt (für Treffer auf Abschnittsebene). Beides wird aus
+    demselben spaCy-Durchlauf abgeleitet und ist eine Teilmenge der Stichwörter.
+    """
+    if not texts:
+        return []
+    nlp = _get_nlp(language, profile)
+    parsed = uses_parser(profile)
+    start = time.perf_counter()
+    # Für wenige Batches lohnt sich der Start zusätzlicher Prozesse nicht
+    n_process = max(1, min(n_process, math.ceil(len(texts) / batch_size)))
+
+    headings_per_text = [_heading_texts(text) for text in texts]
+    all_headings = [heading for headings in headings_per_text for heading in headings]
+    heading_keywords = [
+        _heading_keywords(doc)
+        for doc in nlp.pipe(all_headings, batch_size=batch_size, n_process=n_process)
+    ]
 
-    return sorted(_deduplicate_keywords(keywords))
+    results = []
+    position = 0
+    scanned_texts = [_scan_markdown(text) for text in texts]
+    for text, scanned, headings, doc in zip(
+        texts,
+        scanned_texts,
+        headings_per_text,
+        nlp.pipe([scanned.text for scanned in scanned_texts], batch_size=batch_size, n_process=n_process),
+        strict=True,
+    ):
+        from_headings = set()
+        for heading_set in heading_keywords[position:position + len(headings)]:
+            from_headings |= heading_set
+        position += len(headings)
+        keywords = _deduplicate_keywords(from_headings | _text_keywords(doc, parsed))
+        sections = [sorted(section & keywords) for section in _section_keywords(text, scanned, doc, parsed)]
+        results.append(KeywordSets(sorted(keywords), sorted(from_headings & keywords), sections))
+    metrics.observe(
+        "mcp_extraction_seconds_per_file", (time.perf_counter() - start) / len(texts), count=len(texts),
+        language=language or "unknown", model=_model_name(nlp),
+    )
+    return results
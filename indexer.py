@@ -0,0 +1,106 @@
+# indexer.py
+
+import multiprocessing
+from multiprocessing.process import BaseProcess
+import os
+import sys
+import threading
+import time
+
+import metrics
+from config import INDEXER_MODE
+from db import bump_generation, report_changes, set_change_listener
+from scanner import periodic_scan
+
+# Niedrigere CPU-Priorität für den Indexer-Prozess, damit Anfragen des Servers Vorrang haben
+_INDEXER_NICENESS = 10
+# Intervall in Sekunden, in dem der Indexer seine Metriken auch ohne Änderungen an den Server meldet
+_METRICS_INTERVAL = 5
+
+# Commit-Listener und Metrik-Thread senden über dieselbe Pipe
+_send_lock = threading.Lock()
+
+
+def _notify(sender, changed: bool = True):
+    """Meldet dem Server (geändert, Metriken). Beendet den Indexer, wenn der Server weg ist."""
+    try:
+        with _send_lock:
+            sender.send((changed, metrics.snapshot()))
+    except (BrokenPipeError, EOFError, OSError):
+        print("[Indexer] Server nicht mehr erreichbar, beende Indexer-Prozess")
+        sys.exit(0)
+
+
+def _push_metrics(sender, interval: float = _METRICS_INTERVAL):
+    """Meldet die Metriken regelmäßig, damit Scan-Dauer und letzter Scan auch ohne Commit ankommen."""
+    try:
+        while True:
+            _notify(sender, changed=False)
+            time.sleep(interval)
+    except SystemExit:
+        # sys.exit beendet nur diesen Thread; der Server ist weg, also den ganzen Prozess beenden
+        os._exit(0)
+
+
+def run_indexer(sender):
+    """Einstiegspunkt des Indexer-Prozesses: periodischer Scan mit Benachrichtigung nach jedem Commit."""
+    if hasattr(os, "nice"):
+        os.nice(_INDEXER_NICENESS)
+    set_change_listener(lambda: _notify(sender))
+    threading.Thread(target=_push_metrics, args=(sender,), daemon=True, name="md-indexer-metrics").start()
+    periodic_scan()
+
+
+def listen_for_changes(receiver):
+    """Übernimmt die Metriken des Indexers und lässt den Server-Prozess die Generation neu
+    lesen, sobald der Indexer Änderungen meldet. Aufgelaufene Meldungen werden zusammengefasst.
+    """
+    pending = False
+    try:
+        while True:
+            changed, snapshot = receiver.recv()
+            metrics.set_remote(snapshot)
+            pending = pending or changed
+            # Erst erhöhen, wenn keine weiteren Meldungen anstehen
+            if pending and not receiver.poll():
+                bump_generation()
+                pending = False
+    except (EOFError, OSError):
+        # Ohne Meldungen die Generation wieder bei jedem Zugriff aus der Datenbank lesen
+        report_changes(False)
+        if pending:
+            bump_generation()
+        print("[Warnung] Indexer-Prozess beendet, Generation wird wieder aus der Datenbank gelesen")
+
+
+def start_indexer(mode: str = INDEXER_MODE):
+    """Startet den Indexer im gewählten Modus und gibt den Prozess bzw. Thread zurück (None bei "off")."""
+    if mode == "off":
+        print("[Indexer] deaktiviert (MCP_INDEXER_MODE=off)")
+        return None
+    if mode == "thread":
+        # Commits im selben Prozess erhöhen die Generation direkt (db.commit)
+        report_changes(True)
+        thread = threading.Thread(target=periodic_scan, daemon=True, name="md-scanner")
+        thread.start()
+        return thread
+    if mode != "process":
+        print(f"[Warnung] Unbekannter MCP_INDEXER_MODE '{mode}', nutze 'process'")
+    # spawn statt fork: der Indexer erbt keine Threads oder Verbindungen des Servers
+    context = multiprocessing.get_context("spawn")
+    receiver, sender = context.Pipe(duplex=False)
+    # Nicht daemon: spaCy startet mit MCP_INDEX_WORKERS > 1 eigene Worker-Prozesse
+    process = context.Process(target=run_indexer, args=(sender,), name="md-indexer")
+    process.start()
+    sender.close()
+    report_changes(True)
+    threading.Thread(target=listen_for_changes, args=(receiver,), daemon=True, name="md-indexer-listener").start()
+    print(f"[Indexer] Prozess gestartet (PID {process.pid})")
+    return process
+
+
+def stop_indexer(indexer):
+    """Beendet einen mit start_indexer gestarteten Indexer-Prozess (Threads enden mit dem Server)."""
+    if isinstance(indexer, BaseProcess) and indexer.is_alive():
+        indexer.terminate()
+        indexer.join()
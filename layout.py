@@ -0,0 +1,32 @@
+# layout.py
+
+# Abstand der Zeilenmarken (Zeichen-Offset jeder n-ten Zeile) für Zeilenbereich-Abfragen
+_LINE_MARK_INTERVAL = 256
+
+
+def document_layout(content: str) -> tuple[list[tuple], list[tuple[int, int]]]:
+    """Zerlegt ein Markdown-Dokument an seinen Überschriften (außerhalb von Codeblöcken).
+    Gibt (sections, line_marks) zurück: sections als [(heading, level, start_line, line_count,
+    start_char, length), ...] – Text vor der ersten Überschrift bildet einen Abschnitt ohne
+    Überschrift (level 0) –, line_marks als [(line, start_char), ...] für jede
+    _LINE_MARK_INTERVAL-te Zeile. Zeilen zählen ab 1, Offsets in Zeichen ab 0.
+    """
+    sections, line_marks = [], []
+    in_code = False
+    offset = 0
+    for line_no, line in enumerate(content.splitlines(keepends=True), start=1):
+        if line_no % _LINE_MARK_INTERVAL == 1:
+            line_marks.append((line_no, offset))
+        stripped = line.strip()
+        if stripped.startswith(("```", "~~~")):
+            in_code = not in_code
+        elif not in_code and stripped.startswith("#"):
+            heading = stripped.lstrip("#").strip()
+            if heading:
+                sections.append([heading, len(stripped) - len(stripped.lstrip("#")), line_no, 0, offset, 0])
+        if not sections:
+            sections.append(["", 0, 1, 0, 0, 0])
+        sections[-1][3] += 1
+        sections[-1][5] += len(line)
+        offset += len(line)
+    return [tuple(section) for section in sections], line_marks
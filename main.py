@@ -1,12 +1,20 @@
 # main.py
 
-import threading
-from fastmcp import FastMCP
+import time
 
-from config import DB_PATH
-from tools import register_tools
-from resources import register_resources, register_prompts
-from scanner import periodic_scan
+# Startzeit vor den übrigen Importen, damit der Startbericht auch die Importzeit enthält
+_START = time.perf_counter()
+
+from fastmcp import FastMCP  # noqa: E402
+from starlette.responses import PlainTextResponse  # noqa: E402
+
+from config import DB_PATH  # noqa: E402
+from tools import register_tools  # noqa: E402
+from resources import register_resources, register_prompts  # noqa: E402
+from indexer import start_indexer, stop_indexer  # noqa: E402
+from metrics import CONTENT_TYPE, InstrumentedApp, render  # noqa: E402
+
+_IMPORTED = time.perf_counter()
 
 # App erstellen
 app = FastMCP(
@@ -14,14 +22,38 @@ app = FastMCP(
     mask_error_details=True
 )
 
-# Module registrieren
-register_tools(app)
+# Module registrieren (Tools mit Aufrufzähler und Latenz-Histogramm)
+register_tools(InstrumentedApp(app))
 register_resources(app)
 register_prompts(app)
 
 
+@app.custom_route("/metrics", methods=["GET"])
+async def metrics_endpoint(request):
+    """Prometheus-Metriken von Server und Indexer."""
+    return PlainTextResponse(render(), media_type=CONTENT_TYPE)
+
+
+_REGISTERED = time.perf_counter()
+
+
+def startup_report() -> str:
+    """Gibt die Dauer von Importen und Registrierung in Millisekunden zurück.
+    spaCy und langdetect sind hier nicht enthalten: sie werden erst bei der
+    ersten Extraktion im Scanner-Thread geladen.
+    """
+    return (
+        f"[Start] Importe {(_IMPORTED - _START) * 1000:.0f} ms, "
+        f"Registrierung {(_REGISTERED - _IMPORTED) * 1000:.0f} ms, "
+        f"gesamt {(_REGISTERED - _START) * 1000:.0f} ms"
+    )
+
+
 if __name__ == "__main__":
-    thread = threading.Thread(target=periodic_scan, daemon=True, name="md-scanner")
-    thread.start()
+    indexer = start_indexer()
+    print(startup_report())
     print(f"[Server gestartet] Datenbank: {DB_PATH}")
-    app.run(transport="http", host="0.0.0.0", port=8000, path="/mcp")
+    try:
+        app.run(transport="http", host="0.0.0.0", port=8000, path="/mcp")
+    finally:
+        stop_indexer(indexer)
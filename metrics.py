@@ -0,0 +1,191 @@
+# metrics.py
+
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+# Content-Type des Prometheus-Textformats
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Obergrenzen der Histogramm-Buckets in Sekunden
+_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+# Alle Metriken: Name → (Typ, Beschreibung)
+METRICS = {
+    "mcp_scan_duration_seconds": ("histogram", "Dauer eines vollständigen Scan-Durchlaufs"),
+    "mcp_scan_last_files": ("gauge", "Dateien im letzten Scan-Durchlauf nach Ergebnis (examined/changed/failed)"),
+    "mcp_scan_last_dirs": ("gauge", "Verzeichnisse im letzten Scan-Durchlauf: gelistet oder per Snapshot übersprungen"),
+    "mcp_scan_last_completed_timestamp_seconds": ("gauge", "Unix-Zeit des letzten abgeschlossenen Scan-Durchlaufs"),
+    "mcp_files_total": ("counter", "Geprüfte, neu indexierte und fehlgeschlagene Dateien (examined/changed/failed)"),
+    "mcp_extraction_seconds_per_file": ("histogram", "Stichwort-Extraktion je Datei nach Sprache und spaCy-Modell"),
+    "mcp_sqlite_query_seconds": ("histogram", "Ausführung von SQLite-Anweisungen nach Verbindung und Anweisungstyp"),
+    "mcp_tool_requests_total": ("counter", "Tool-Aufrufe nach Tool und Ergebnis (ok/error)"),
+    "mcp_tool_duration_seconds": ("histogram", "Dauer der Tool-Aufrufe"),
+}
+
+_lock = threading.Lock()
+# (Name, Labels) → Wert bzw. [Bucket-Zähler, Summe, Anzahl]
+_counters: dict[tuple, float] = {}
+_gauges: dict[tuple, float] = {}
+_histograms: dict[tuple, list] = {}
+# Letzter Stand aus dem Indexer-Prozess (MCP_INDEXER_MODE=process)
+_remote: dict = {}
+
+
+def _key(name: str, labels: dict) -> tuple:
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name: str, value: float = 1, **labels):
+    """Erhöht einen Zähler."""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def set_gauge(name: str, value: float, **labels):
+    """Setzt einen Messwert."""
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+def observe(name: str, seconds: float, count: int = 1, **labels):
+    """Trägt `count` Beobachtungen mit jeweils `seconds` in ein Histogramm ein."""
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [[0] * len(_BUCKETS), 0.0, 0]
+        for index, bound in enumerate(_BUCKETS):
+            if seconds <= bound:
+                histogram[0][index] += count
+                break
+        histogram[1] += seconds * count
+        histogram[2] += count
+
+
+def value(name: str, **labels) -> float:
+    """Gibt den aktuellen Stand eines Zählers in diesem Prozess zurück (0, falls unbekannt)."""
+    with _lock:
+        return _counters.get(_key(name, labels), 0)
+
+
+@contextmanager
+def timed(name: str, **labels):
+    """Misst die Dauer des Blocks in ein Histogramm (auch bei Exceptions)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def snapshot() -> dict:
+    """Kopie aller Metriken dieses Prozesses (picklebar, für die Übertragung an den Server)."""
+    with _lock:
+        return {
+            "counters": dict(_counters),
+            "gauges": dict(_gauges),
+            "histograms": {key: [list(buckets), total, count] for key, (buckets, total, count) in _histograms.items()},
+        }
+
+
+def set_remote(remote: dict):
+    """Übernimmt den letzten Stand aus dem Indexer-Prozess."""
+    global _remote
+    with _lock:
+        _remote = remote
+
+
+def _merged() -> dict:
+    """Eigene Metriken plus Indexer-Stand: Zähler und Histogramme addiert, Messwerte überschrieben."""
+    local = snapshot()
+    with _lock:
+        remote = _remote
+    for key, remote_value in remote.get("counters", {}).items():
+        local["counters"][key] = local["counters"].get(key, 0) + remote_value
+    local["gauges"].update(remote.get("gauges", {}))
+    for key, (buckets, total, count) in remote.get("histograms", {}).items():
+        own = local["histograms"].setdefault(key, [[0] * len(_BUCKETS), 0.0, 0])
+        own[0] = [a + b for a, b in zip(own[0], buckets, strict=True)]
+        own[1] += total
+        own[2] += count
+    return local
+
+
+def _escape(label_value) -> str:
+    return str(label_value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: tuple, extra: tuple = ()) -> str:
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(label_value)}"' for name, label_value in pairs) + "}"
+
+
+def _number(number: float) -> str:
+    return repr(float(number)) if isinstance(number, float) else str(number)
+
+
+def render() -> str:
+    """Gibt alle Metriken im Prometheus-Textformat zurück."""
+    merged = _merged()
+    by_name: dict[str, list[str]] = {name: [] for name in METRICS}
+    for store in ("counters", "gauges"):
+        for (name, labels), number in sorted(merged[store].items()):
+            by_name.setdefault(name, []).append(f"{name}{_labels(labels)} {_number(number)}")
+    for (name, labels), (buckets, total, count) in sorted(merged["histograms"].items()):
+        lines = by_name.setdefault(name, [])
+        cumulative = 0
+        for bound, bucket in zip(_BUCKETS, buckets, strict=True):
+            cumulative += bucket
+            lines.append(f"{name}_bucket{_labels(labels, (('le', bound),))} {cumulative}")
+        lines.append(f"{name}_bucket{_labels(labels, (('le', '+Inf'),))} {count}")
+        lines.append(f"{name}_sum{_labels(labels)} {_number(total)}")
+        lines.append(f"{name}_count{_labels(labels)} {count}")
+    output = []
+    for name, lines in by_name.items():
+        kind, description = METRICS.get(name, ("untyped", ""))
+        output.append(f"# HELP {name} {description}")
+        output.append(f"# TYPE {name} {kind}")
+        output.extend(lines)
+    return "\n".join(output) + "\n"
+
+
+def timed_tool(name: str, func):
+    """Umhüllt eine Tool-Funktion mit Aufrufzähler und Latenz-Histogramm (Signatur bleibt erhalten)."""
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            result = func(*args, **kwargs)
+            outcome = "ok"
+            return result
+        finally:
+            observe("mcp_tool_duration_seconds", time.perf_counter() - start, tool=name)
+            inc("mcp_tool_requests_total", tool=name, outcome=outcome)
+
+    return wrapper
+
+
+class InstrumentedApp:
+    """Reicht Tool-Registrierungen an die App weiter und misst dabei jedes Tool."""
+
+    def __init__(self, app):
+        self._app = app
+
+    def tool(self, name: str, description: str, **kwargs):
+        register = self._app.tool(name=name, description=description, **kwargs)
+
+        def decorator(func):
+            register(timed_tool(name, func))
+            return func
+
+        return decorator
+
+    def __getattr__(self, attribute):
+        return getattr(self._app, attribute)
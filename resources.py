@@ -1,8 +1,6 @@
 # resources.py
 
-import sqlite3
-
-from config import DB_PATH
+from db import document_info, read_document, read_document_section
 
 
 def register_resources(app):
@@ -19,21 +17,16 @@ def register_resources(app):
         if not filename:
             return "Fehler: Kein Dateiname angegeben"
 
-        with sqlite3.connect(DB_PATH) as conn:
-            cur = conn.cursor()
-            cur.execute("SELECT content, path FROM files WHERE filename = ?", (filename,))
-            result = cur.fetchone()
-
-        if not result:
+        info = document_info(filename)
+        if info is None:
             return f"Fehler: Datei '{filename}' nicht gefunden"
 
-        content, path = result
-
-        # Inhalt aus DB zurückgeben (falls vorhanden)
-        if content:
-            return content
+        # Inhalt aus dem komprimierten Speicher zurückgeben (falls vorhanden)
+        if info["stored"]:
+            return read_document(filename) or ""
 
         # Fallback: Aus Dateisystem lesen (für alte Einträge ohne content)
+        path = info["path"]
         try:
             with open(path, encoding="utf-8") as f:
                 return f.read()
@@ -42,6 +35,26 @@ def register_resources(app):
         except Exception as e:
             return f"Fehler beim Lesen: {e}"
 
+    @app.resource(
+        "markdowndatei://{filename}/abschnitt/{section}",
+        description="schema:WebPageElement (schema:encodingFormat: text/markdown) – Liefert einen einzelnen Abschnitt "
+                    "(ab einer Überschrift bis zur nächsten) eines indexierten Dokuments. "
+                    "Die Abschnitts-Indizes liefert das Tool 'get-file-info'; so lassen sich große Dokumente "
+                    "stückweise abrufen, ohne den vollständigen schema:text zu übertragen."
+    )
+    def get_file_section(filename: str, section: int) -> str:
+        """Resource-Handler für einzelne Abschnitte einer Markdown-Datei."""
+        info = document_info(filename)
+        if info is None:
+            return f"Fehler: Datei '{filename}' nicht gefunden"
+        if not info["stored"]:
+            return f"Fehler: Für '{filename}' ist noch keine Gliederung gespeichert"
+
+        text = read_document_section(filename, section)
+        if text is None:
+            return f"Fehler: Abschnitt {section} existiert nicht in '{filename}'"
+        return text
+
 
 def register_prompts(app):
     """Registriert alle Prompts bei der FastMCP-App."""
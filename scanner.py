@@ -1,54 +1,413 @@
 # scanner.py
 
+import fnmatch
+import json
 import os
+import re
 import time
-import sqlite3
-from db import update_file_entry, init_db
-from extractor import ensure_models
-from config import SCAN_FOLDER, SCAN_INTERVAL, DB_PATH
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import metrics
+from db import (
+    update_file_entries, init_db, remove_file_entries, write_connection, commit, load_dir_files, load_dir_snapshot,
+    save_dir_snapshot,
+)
+from config import (
+    SCAN_ROOTS, SCAN_INCLUDE, SCAN_EXCLUDE, SCAN_INTERVAL, DEEP_SCAN_INTERVAL, WATCH_MODE, RECONCILE_INTERVAL,
+    ScanRoot,
+)
+from watcher import FileWatcher
 
+# Dateien pro Transaktion beim Entfernen gelöschter Einträge
+_DELETE_CHUNK_SIZE = 1000
+# Ergebnisse, die je Scan-Durchlauf als mcp_scan_last_files gemeldet werden
+_CYCLE_RESULTS = ("examined", "changed", "failed")
+# Verzeichnisse, deren mtime so kurz vor dem Listen lag, gelten beim nächsten Scan als geändert:
+# Änderungen im selben Zeitstempel-Takt (grobe mtime-Auflösung) blieben sonst unbemerkt
+_MTIME_SETTLE_NS = 2_000_000_000
 
-def scan_markdown_files(folder: str) -> set[str]:
-    """Scannt den Ordner nach Markdown-Dateien und gibt die gefundenen Dateinamen zurück."""
+
+def _as_roots(roots: str | list[ScanRoot]) -> list[ScanRoot]:
+    """Ein einzelner Ordner gilt als Wurzelordner mit den Standardregeln und ohne Präfix."""
+    if isinstance(roots, str):
+        return [ScanRoot(os.path.normpath(roots), "", SCAN_INCLUDE, SCAN_EXCLUDE)]
+    return roots
+
+
+@lru_cache(maxsize=64)
+def _compile_globs(globs: tuple[str, ...]) -> tuple[re.Pattern | None, re.Pattern | None]:
+    """Fasst die Globs zu je einem Regex für Namen (ohne "/") und relative Pfade (mit "/") zusammen."""
+    names = [fnmatch.translate(glob) for glob in globs if "/" not in glob]
+    paths = [fnmatch.translate(glob.strip("/")) for glob in globs if "/" in glob]
+    return (
+        re.compile("|".join(names)) if names else None,
+        re.compile("|".join(paths)) if paths else None,
+    )
+
+
+def _matches(globs: tuple[str, ...], name: str, rel_path: str) -> bool:
+    by_name, by_path = _compile_globs(globs)
+    if by_name is not None and by_name.match(name):
+        return True
+    return by_path is not None and by_path.match(rel_path.replace(os.sep, "/")) is not None
+
+
+def _filename(root: ScanRoot, rel_path: str) -> str:
+    return os.path.join(root.label, rel_path) if root.label else rel_path
+
+
+def _add_entry(path: str, filename: str, found_files: set[str], entries: list) -> float | None:
+    """Merkt eine Markdown-Datei als (Pfad, Dateiname, mtime) vor und gibt die mtime zurück."""
+    found_files.add(filename)
+    try:
+        mtime = os.path.getmtime(path)
+    except Exception as e:
+        print(f"[Fehler] Datei konnte nicht verarbeitet werden: {path}\n{e}")
+        metrics.inc("mcp_files_total", result="failed")
+        return None
+    entries.append((path, filename, mtime))
+    return mtime
+
+
+class _DirSnapshot:
+    """Verzeichnisstände eines Wurzelordners aus dem letzten Scan. Ein Verzeichnis mit
+    unveränderter mtime wird nicht gelistet und liefert keine Einträge; nur seine
+    Unterverzeichnisse werden aus dem Snapshot übernommen und weiter geprüft. Die mtime
+    eines Verzeichnisses ändert sich nur beim Anlegen, Löschen und Umbenennen von Einträgen –
+    Dateien, die an Ort und Stelle geändert werden, erkennt erst der nächste vollständige
+    Scan (oder der Watch-Modus).
+    """
+
+    def __init__(self, previous: dict, deep: bool):
+        self.previous = {} if deep else previous
+        self.deep = deep
+        self.listed: dict[str, tuple] = {}
+        self.visited: set[str] = set()
+
+    def reuse(self, directory: str, mtime_ns: int) -> list | None:
+        """Gibt die Unterverzeichnisse zurück, wenn sich das Verzeichnis nicht geändert hat."""
+        self.visited.add(directory)
+        stored = self.previous.get(directory)
+        if stored is None:
+            return None
+        stored_mtime_ns, listed_ns, subdirs = stored
+        if stored_mtime_ns != mtime_ns or listed_ns - mtime_ns < _MTIME_SETTLE_NS:
+            return None
+        return subdirs
+
+    def record(self, directory: str, mtime_ns: int, subdirs: list, files: list):
+        self.listed[directory] = (mtime_ns, time.time_ns(), subdirs, files)
+
+    def forget(self, directories: set[str]):
+        """Verwirft die Listung von Verzeichnissen, deren Dateien nicht geschrieben wurden.
+        Ihr alter Stand bleibt gespeichert, sodass der nächste Scan sie erneut listet.
+        """
+        for directory in directories:
+            self.listed.pop(directory, None)
+
+    def stale(self) -> list[str]:
+        """Verzeichnisse aus dem letzten Scan, die es nicht mehr gibt (oder die ausgeschlossen sind)."""
+        return [directory for directory in self.previous if directory not in self.visited]
+
+    def vanished(self, root: ScanRoot) -> list[str]:
+        """Dateinamen, die aus neu gelisteten oder verschwundenen Verzeichnissen weggefallen sind.
+        Muss vor save_dir_snapshot aufgerufen werden, das die alten Dateilisten überschreibt.
+        """
+        changed = [directory for directory in self.listed if directory in self.previous]
+        vanished = []
+        for directory, names in load_dir_files(root.path, changed + self.stale()).items():
+            listed = self.listed.get(directory)
+            current = set(listed[3]) if listed is not None else set()
+            rel_dir = os.path.relpath(directory, root.path)
+            for name in names:
+                if name not in current:
+                    vanished.append(_filename(root, name if rel_dir == os.curdir else os.path.join(rel_dir, name)))
+        return vanished
+
+
+def _collect_entries(
+    root: ScanRoot, start: str, found_files: set[str], entries: list, snapshot: _DirSnapshot | None = None,
+):
+    """Sammelt alle passenden Dateien unterhalb von start per os.scandir.
+    Ausgeschlossene Verzeichnisse werden nicht betreten, ihre Dateien also auch nicht geprüft.
+    Mit Snapshot kostet ein unverändertes Verzeichnis nur ein stat() und liefert keine Einträge.
+    """
+    rel_start = os.path.relpath(start, root.path)
+    stack = [(start, "" if rel_start == os.curdir else rel_start)]
+    while stack:
+        directory, rel_dir = stack.pop()
+        mtime_ns = 0
+        if snapshot is not None:
+            try:
+                mtime_ns = os.stat(directory).st_mtime_ns
+            except OSError:
+                continue
+            subdirs = snapshot.reuse(directory, mtime_ns)
+            if subdirs is not None:
+                # Pfade ohne os.path.join: bei vielen unveränderten Verzeichnissen spürbar schneller
+                base = directory if directory.endswith(os.sep) else directory + os.sep
+                prefix = rel_dir + os.sep if rel_dir else ""
+                stack.extend((base + name, prefix + name) for name in subdirs)
+                continue
+        try:
+            with os.scandir(directory) as iterator:
+                children = list(iterator)
+        except OSError:
+            # Wie os.walk: nicht lesbare oder inzwischen gelöschte Verzeichnisse überspringen
+            continue
+        subdirs, files = [], []
+        complete = True
+        for child in children:
+            rel_path = os.path.join(rel_dir, child.name) if rel_dir else child.name
+            if _matches(root.exclude, child.name, rel_path):
+                continue
+            try:
+                is_dir = child.is_dir()
+            except OSError:
+                is_dir = False
+            if is_dir:
+                # Symlinks auf Verzeichnisse werden wie bei os.walk nicht verfolgt
+                if not child.is_symlink():
+                    stack.append((child.path, rel_path))
+                    subdirs.append(child.name)
+            elif _matches(root.include, child.name, rel_path):
+                if _add_entry(child.path, _filename(root, rel_path), found_files, entries) is None:
+                    complete = False
+                files.append(child.name)
+        # Verzeichnisse mit nicht lesbaren Dateien nicht merken: der nächste Scan versucht es erneut
+        if snapshot is not None and complete:
+            snapshot.record(directory, mtime_ns, subdirs, files)
+
+
+def _walk_root(root: ScanRoot, snapshot: _DirSnapshot | None = None) -> tuple[set[str], list]:
+    if not os.path.isdir(root.path):
+        print(f"[Warnung] Ordner nicht gefunden: {root.path}")
+    found_files: set[str] = set()
+    entries: list = []
+    _collect_entries(root, root.path, found_files, entries, snapshot)
+    return found_files, entries
+
+
+def _rules_key(root: ScanRoot) -> str:
+    return json.dumps([root.include, root.exclude])
+
+
+def _load_snapshots(roots: list[ScanRoot], deep_scan_interval: int) -> list[_DirSnapshot | None]:
+    """Lädt je Wurzelordner den Verzeichnis-Snapshot. Fällig ist ein vollständiger Scan, wenn der
+    letzte länger als deep_scan_interval zurückliegt oder ein Snapshot fehlt bzw. nicht mehr passt
+    (Regeln, Extraktionsstand). Er gilt für alle Wurzelordner gemeinsam: nur dann ist die Menge
+    der gefundenen Dateien vollständig, und cleanup_deleted_files darf alle übrigen entfernen.
+    """
+    if deep_scan_interval <= 0:
+        return [None] * len(roots)
+    loaded = [load_dir_snapshot(root.path, _rules_key(root)) for root in roots]
+    now = time.time()
+    deep = any(deep_scan_at is None or now - deep_scan_at >= deep_scan_interval for _, deep_scan_at in loaded)
+    return [_DirSnapshot(previous, deep) for previous, _ in loaded]
+
+
+def _save_snapshots(roots: list[ScanRoot], snapshots: list[_DirSnapshot | None], started: float):
+    listed = skipped = 0
+    for root, snapshot in zip(roots, snapshots, strict=True):
+        if snapshot is None:
+            continue
+        listed += len(snapshot.listed)
+        skipped += len(snapshot.visited) - len(snapshot.listed)
+        try:
+            save_dir_snapshot(
+                root.path, _rules_key(root), snapshot.listed, snapshot.stale(), started if snapshot.deep else None,
+            )
+        except Exception as e:
+            print(f"[Fehler] Verzeichnis-Snapshot konnte nicht gespeichert werden: {root.path}\n{e}")
+    if any(snapshot is not None for snapshot in snapshots):
+        metrics.set_gauge("mcp_scan_last_dirs", listed, result="listed")
+        metrics.set_gauge("mcp_scan_last_dirs", skipped, result="skipped")
+
+
+def _update_entries(entries: list) -> set[str]:
+    """Übergibt gesammelte Einträge an die Datenbank, ohne bei Fehlern den Scanner zu beenden.
+    Gibt die Dateinamen zurück, die nicht geschrieben wurden (alle, wenn die Aktualisierung scheitert).
+    """
+    metrics.inc("mcp_files_total", len(entries), result="examined")
+    try:
+        return set(update_file_entries(entries))
+    except Exception as e:
+        print(f"[Fehler] Aktualisierung der Datenbank fehlgeschlagen\n{e}")
+        return {filename for _, filename, _ in entries}
+
+
+def scan_markdown_files(
+    roots: str | list[ScanRoot] = SCAN_ROOTS, deep_scan_interval: int = DEEP_SCAN_INTERVAL,
+) -> set[str] | None:
+    """Scannt die Wurzelordner (parallel, je Ordner ein Thread) nach passenden Dateien
+    und gibt die gefundenen Dateinamen zurück. Mit deep_scan_interval > 0 werden
+    unveränderte Verzeichnisse per Snapshot übersprungen (siehe _DirSnapshot); ein solcher
+    Scan entfernt verschwundene Dateien selbst und gibt None zurück (kein cleanup_deleted_files).
+    """
+    start = time.perf_counter()
+    started = time.time()
+    before = {result: metrics.value("mcp_files_total", result=result) for result in _CYCLE_RESULTS}
+    roots = _as_roots(roots)
+    snapshots = _load_snapshots(roots, deep_scan_interval)
     found_files = set()
-    for root, _, files in os.walk(folder):
-        for file in files:
-            if file.endswith(".md"):
-                path = os.path.join(root, file)
-                rel_path = os.path.relpath(path, folder)
-                found_files.add(rel_path)
-                try:
-                    mtime = os.path.getmtime(path)
-                    update_file_entry(path, rel_path, mtime)
-                except Exception as e:
-                    print(f"[Fehler] Datei konnte nicht verarbeitet werden: {path}\n{e}")
-    return found_files
+    entries = []
+    with ThreadPoolExecutor(max_workers=max(1, min(len(roots), os.cpu_count() or 1))) as pool:
+        for root_files, root_entries in pool.map(_walk_root, roots, snapshots):
+            found_files |= root_files
+            entries += root_entries
+    if entries:
+        failed = _update_entries(entries)
+        if failed:
+            failed_dirs = {os.path.dirname(path) for path, filename, _ in entries if filename in failed}
+            for snapshot in snapshots:
+                if snapshot is not None:
+                    snapshot.forget(failed_dirs)
+    shallow = bool(snapshots) and all(snapshot is not None and not snapshot.deep for snapshot in snapshots)
+    if shallow:
+        _remove_vanished_files([
+            filename
+            for root, snapshot in zip(roots, snapshots, strict=True) if snapshot is not None
+            for filename in snapshot.vanished(root)
+        ])
+    _save_snapshots(roots, snapshots, started)
+    metrics.observe("mcp_scan_duration_seconds", time.perf_counter() - start)
+    for result in _CYCLE_RESULTS:
+        metrics.set_gauge("mcp_scan_last_files", metrics.value("mcp_files_total", result=result) - before[result],
+                          result=result)
+    metrics.set_gauge("mcp_scan_last_completed_timestamp_seconds", time.time())
+    return None if shallow else found_files
+
+
+def _root_of(roots: list[ScanRoot], path: str) -> tuple[ScanRoot, str] | None:
+    """Ordnet einen Pfad seinem (innersten) Wurzelordner zu: (Wurzelordner, relativer Pfad).
+    None, wenn der Pfad außerhalb liegt oder in einem ausgeschlossenen Verzeichnis.
+    """
+    path = os.path.normpath(path)
+    candidates = [root for root in roots if path == root.path or path.startswith(root.path.rstrip(os.sep) + os.sep)]
+    if not candidates:
+        return None
+    root = max(candidates, key=lambda candidate: len(candidate.path))
+    rel_path = os.path.relpath(path, root.path)
+    if rel_path == os.curdir:
+        return root, rel_path
+    parts = rel_path.split(os.sep)
+    for index, name in enumerate(parts):
+        if _matches(root.exclude, name, os.path.join(*parts[:index + 1])):
+            return None
+    return root, rel_path
+
+
+def accepts_path(roots: str | list[ScanRoot], path: str, is_directory: bool = False) -> bool:
+    """Gibt zurück, ob ein Pfad aus einem Dateisystem-Ereignis für den Index relevant ist."""
+    located = _root_of(_as_roots(roots), path)
+    if located is None:
+        return False
+    root, rel_path = located
+    return is_directory or _matches(root.include, os.path.basename(path), rel_path)
+
+
+def index_paths(roots: str | list[ScanRoot], paths: set[str]):
+    """Indexiert gezielt die Pfade aus Dateisystem-Ereignissen (Watch-Modus).
+    Existierende Dateien und Verzeichnisse werden (neu) eingelesen, verschwundene
+    Pfade samt aller darunter liegenden Dateien aus der Datenbank entfernt.
+    """
+    roots = _as_roots(roots)
+    found_files: set[str] = set()
+    entries: list = []
+    removed = []
+    for path in paths:
+        located = _root_of(roots, path)
+        if located is None:
+            continue
+        root, rel_path = located
+        if os.path.isdir(path):
+            _collect_entries(root, path, found_files, entries)
+        elif os.path.isfile(path):
+            if _matches(root.include, os.path.basename(path), rel_path):
+                _add_entry(path, _filename(root, rel_path), found_files, entries)
+        else:
+            removed.append(_filename(root, rel_path))
+    _update_entries(entries)
+    if removed:
+        remove_deleted_paths(removed)
+
+
+def remove_deleted_paths(rel_paths: list[str]):
+    """Entfernt Dateien bzw. ganze Verzeichnisse (per Präfix) aus der Datenbank."""
+    with write_connection() as conn:
+        cur = conn.cursor()
+        deleted = []
+        for rel_path in rel_paths:
+            # Bereichsabfrage auf dem Primärschlüssel: alles unterhalb von "rel_path/"
+            # ('0' ist das Zeichen direkt nach '/')
+            cur.execute(
+                "SELECT filename FROM files WHERE filename = ? OR (filename >= ? AND filename < ?)",
+                (rel_path, f"{rel_path}/", f"{rel_path}0"),
+            )
+            deleted.extend(filename for (filename,) in cur.fetchall())
+        remove_file_entries(cur, deleted)
+        for filename in deleted:
+            print(f"[Entfernt] {filename} (Datei existiert nicht mehr)")
+
+
+def _remove_entries(conn, deleted: list[str]):
+    """Entfernt die Einträge blockweise (je Block ein Commit) und meldet jede Datei."""
+    cur = conn.cursor()
+    for start in range(0, len(deleted), _DELETE_CHUNK_SIZE):
+        remove_file_entries(cur, deleted[start:start + _DELETE_CHUNK_SIZE])
+        commit(conn)
+    for filename in deleted:
+        print(f"[Entfernt] {filename} (Datei existiert nicht mehr)")
+
+
+def _remove_vanished_files(filenames: list[str]):
+    """Entfernt verschwundene Dateien eines Scans mit Snapshot, soweit sie im Index stehen
+    (im Watch-Modus können sie schon entfernt sein).
+    """
+    if not filenames:
+        return
+    with write_connection() as conn:
+        cur = conn.cursor()
+        deleted = []
+        for start in range(0, len(filenames), _DELETE_CHUNK_SIZE):
+            chunk = filenames[start:start + _DELETE_CHUNK_SIZE]
+            cur.execute(f"SELECT filename FROM files WHERE filename IN ({','.join('?' * len(chunk))})", chunk)
+            deleted.extend(row[0] for row in cur.fetchall())
+        _remove_entries(conn, sorted(deleted))
 
 
 def cleanup_deleted_files(found_files: set[str]):
     """Entfernt Dateien aus der Datenbank, die nicht mehr im Dateisystem existieren."""
-    with sqlite3.connect(DB_PATH) as conn:
+    with write_connection() as conn:
         cur = conn.cursor()
         cur.execute("SELECT filename FROM files")
         db_files = {row[0] for row in cur.fetchall()}
-
-        deleted = db_files - found_files
-        for filename in deleted:
-            cur.execute("DELETE FROM files WHERE filename = ?", (filename,))
-            print(f"[Entfernt] {filename} (Datei existiert nicht mehr)")
-
-        if deleted:
-            conn.commit()
+        _remove_entries(conn, sorted(db_files - found_files))
 
 
-def periodic_scan():
-    print(f"[Scanner gestartet] Überwache: {SCAN_FOLDER} alle {SCAN_INTERVAL} Sekunden")
-    ensure_models()
+def periodic_scan(roots: list[ScanRoot] = SCAN_ROOTS):
+    folders = ", ".join(root.path for root in roots)
+    print(f"[Scanner gestartet] Überwache: {folders} alle {SCAN_INTERVAL} Sekunden")
     init_db()
+    # Watcher vor dem ersten Scan starten, damit keine Änderung verloren geht
+    watcher = None
+    if WATCH_MODE:
+        watcher = FileWatcher([root.path for root in roots], accept=lambda path, is_dir: accepts_path(roots, path, is_dir))
+    if watcher is not None and not watcher.start():
+        watcher = None
     while True:
-        found_files = scan_markdown_files(SCAN_FOLDER)
-        cleanup_deleted_files(found_files)
-        time.sleep(SCAN_INTERVAL)
+        found_files = scan_markdown_files(roots)
+        if found_files is not None:
+            cleanup_deleted_files(found_files)
+        if watcher is None:
+            time.sleep(SCAN_INTERVAL)
+            continue
+        # Watch-Modus: Ereignisse abarbeiten, der volle Scan dient nur noch zum Abgleich
+        deadline = time.monotonic() + RECONCILE_INTERVAL
+        while (remaining := deadline - time.monotonic()) > 0:
+            changed = watcher.wait_for_changes(remaining)
+            if changed:
+                index_paths(roots, changed)
 
 
 if __name__ == "__main__":
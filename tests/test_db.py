@@ -1,9 +1,19 @@
 # tests/test_db.py
 
 import sqlite3
+import threading
 from unittest.mock import patch
 
-from db import _migrate_columns, init_db, update_file_entry
+import numpy as np
+import pytest
+
+import metrics
+from db import (
+    _INDEX_VERSIONS, _content_hash, _migrate_columns, _write_entries, current_generation, document_info, get_read_connection,
+    init_db, load_dir_files, load_dir_snapshot, read_document, read_document_lines, read_document_section, remove_file_entry,
+    save_dir_snapshot, update_file_entries, update_file_entry, write_connection,
+)
+from extractor import NLP_PROFILES
 
 
 def _columns(db_path: str) -> list[str]:
@@ -38,6 +48,24 @@ class TestMigrateColumns:
 
         assert "language" in _columns(db_path)
 
+    def test_backfills_content_hash_from_stored_content(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        conn = sqlite3.connect(db_path)
+        conn.execute("""
+            CREATE TABLE files (
+                filename TEXT PRIMARY KEY, path TEXT, mtime REAL,
+                keywords TEXT, content TEXT, language TEXT
+            )
+        """)
+        conn.execute("INSERT INTO files VALUES ('a.md', '/p/a.md', 1.0, '', 'Text', 'en')")
+        conn.commit()
+
+        _migrate_columns(conn)
+        content_hash = conn.execute("SELECT content_hash FROM files").fetchone()[0]
+        conn.close()
+
+        assert content_hash == _content_hash("Text")
+
     def test_no_error_if_columns_already_exist(self, tmp_path):
         db_path = str(tmp_path / "test.db")
         conn = sqlite3.connect(db_path)
@@ -77,6 +105,60 @@ class TestInitDb:
             init_db()
             init_db()  # Must not raise
 
+    def test_creates_keyword_index_table(self, tmp_path):
+        db_path = str(tmp_path / "new.db")
+        with patch("db.DB_PATH", db_path):
+            init_db()
+        conn = sqlite3.connect(db_path)
+        indexes = {row[1] for row in conn.execute("PRAGMA index_list(keywords)").fetchall()}
+        conn.close()
+        assert "idx_keywords_term_language" in indexes
+
+    def test_backfills_keyword_index_from_existing_rows(self, tmp_path):
+        db_path = str(tmp_path / "legacy.db")
+        conn = sqlite3.connect(db_path)
+        conn.execute("""
+            CREATE TABLE files (
+                filename TEXT PRIMARY KEY, path TEXT, mtime REAL,
+                keywords TEXT, content TEXT, language TEXT
+            )
+        """)
+        conn.execute(
+            "INSERT INTO files VALUES (?, ?, ?, ?, ?, ?)",
+            ("legacy.md", "/p/legacy.md", 1.0, "docker,linux", "content", None),
+        )
+        conn.commit()
+        conn.close()
+
+        with patch("db.DB_PATH", db_path):
+            init_db()
+
+        assert _postings(db_path, "legacy.md") == {("docker", "unknown"), ("linux", "unknown")}
+        assert _keyword_stats(db_path) == {("docker", "unknown"): 1, ("linux", "unknown"): 1}
+        assert _language_stats(db_path) == {"unknown": 1}
+
+    def test_backfills_fulltext_index_from_existing_rows(self, tmp_path):
+        db_path = str(tmp_path / "legacy.db")
+        conn = sqlite3.connect(db_path)
+        conn.execute("""
+            CREATE TABLE files (
+                filename TEXT PRIMARY KEY, path TEXT, mtime REAL,
+                keywords TEXT, content TEXT, language TEXT
+            )
+        """)
+        conn.execute(
+            "INSERT INTO files VALUES (?, ?, ?, ?, ?, ?)",
+            ("legacy.md", "/p/legacy.md", 1.0, "docker", "Docker Compose Setup", "en"),
+        )
+        conn.commit()
+        conn.close()
+
+        with patch("db.DB_PATH", db_path):
+            init_db()
+            init_db()  # zweiter Aufruf darf keine Duplikate erzeugen
+
+        assert _fulltext_hits(db_path, "Compose") == ["legacy.md"]
+
     def test_creates_parent_directory(self, tmp_path):
         nested = tmp_path / "sub" / "nested.db"
         with patch("db.DB_PATH", str(nested)):
@@ -87,15 +169,39 @@ class TestInitDb:
 # ── update_file_entry ─────────────────────────────────────────────────────────
 
 def _setup_db(path: str):
-    conn = sqlite3.connect(path)
-    conn.execute("""
-        CREATE TABLE files (
-            filename TEXT PRIMARY KEY, path TEXT, mtime REAL,
-            keywords TEXT, content TEXT, language TEXT
-        )
-    """)
-    conn.commit()
+    with patch("db.DB_PATH", path):
+        init_db()
+
+
+def _fulltext_hits(db_path: str, query: str) -> list[str]:
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute(
+        "SELECT f.filename FROM files_fts JOIN files f ON f.fts_rowid = files_fts.rowid WHERE files_fts MATCH ?",
+        (query,),
+    ).fetchall()
+    conn.close()
+    return [row[0] for row in rows]
+
+
+def _postings(db_path: str, filename: str) -> set[tuple[str, str]]:
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("SELECT term, language FROM keywords WHERE filename = ?", (filename,)).fetchall()
+    conn.close()
+    return set(rows)
+
+
+def _keyword_stats(db_path: str) -> dict[tuple[str, str], int]:
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("SELECT term, language, doc_count FROM keyword_stats").fetchall()
     conn.close()
+    return {(term, language): doc_count for term, language, doc_count in rows}
+
+
+def _language_stats(db_path: str) -> dict[str, int]:
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("SELECT language, doc_count FROM language_stats").fetchall()
+    conn.close()
+    return dict(rows)
 
 
 class TestUpdateFileEntry:
@@ -108,7 +214,7 @@ class TestUpdateFileEntry:
 
         with patch("db.DB_PATH", db_path), \
              patch("db.detect_language", return_value="en"), \
-             patch("db.extract_keywords", return_value=["hello", "world"]):
+             patch("db.extract_keyword_sets", return_value=[(["hello", "world"], [], [])]):
             update_file_entry(str(md), "new.md", 1.0)
 
         conn = sqlite3.connect(db_path)
@@ -118,6 +224,7 @@ class TestUpdateFileEntry:
         assert row is not None
         assert row[1] == "en"
         assert "hello" in row[2]
+        assert _postings(db_path, "new.md") == {("hello", "en"), ("world", "en")}
 
     def test_updates_existing_file_on_mtime_change(self, tmp_path):
         db_path = str(tmp_path / "test.db")
@@ -125,7 +232,7 @@ class TestUpdateFileEntry:
 
         conn = sqlite3.connect(db_path)
         conn.execute(
-            "INSERT INTO files VALUES (?, ?, ?, ?, ?, ?)",
+            "INSERT INTO files (filename, path, mtime, keywords, content, language) VALUES (?, ?, ?, ?, ?, ?)",
             ("doc.md", str(tmp_path / "doc.md"), 1.0, "old", "old content", "en"),
         )
         conn.commit()
@@ -136,7 +243,7 @@ class TestUpdateFileEntry:
 
         with patch("db.DB_PATH", db_path), \
              patch("db.detect_language", return_value="en"), \
-             patch("db.extract_keywords", return_value=["updated"]):
+             patch("db.extract_keyword_sets", return_value=[(["updated"], [], [])]):
             update_file_entry(str(md), "doc.md", 2.0)  # new mtime
 
         conn = sqlite3.connect(db_path)
@@ -144,6 +251,8 @@ class TestUpdateFileEntry:
         conn.close()
 
         assert row[0] == "updated"
+        assert _postings(db_path, "doc.md") == {("updated", "en")}
+        assert _fulltext_hits(db_path, "Updated") == ["doc.md"]
 
     def test_skips_processing_when_mtime_unchanged(self, tmp_path):
         db_path = str(tmp_path / "test.db")
@@ -151,7 +260,7 @@ class TestUpdateFileEntry:
 
         conn = sqlite3.connect(db_path)
         conn.execute(
-            "INSERT INTO files VALUES (?, ?, ?, ?, ?, ?)",
+            "INSERT INTO files (filename, path, mtime, keywords, content, language) VALUES (?, ?, ?, ?, ?, ?)",
             ("stable.md", "/path/stable.md", 42.0, "old", "old content", "de"),
         )
         conn.commit()
@@ -159,12 +268,76 @@ class TestUpdateFileEntry:
 
         with patch("db.DB_PATH", db_path), \
              patch("db.detect_language") as mock_detect, \
-             patch("db.extract_keywords") as mock_extract:
+             patch("db.extract_keyword_sets") as mock_extract:
             update_file_entry("/path/stable.md", "stable.md", 42.0)  # same mtime
 
         mock_detect.assert_not_called()
         mock_extract.assert_not_called()
 
+    def test_touched_file_with_same_content_skips_extraction(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        _setup_db(db_path)
+
+        md = tmp_path / "synced.md"
+        md.write_text("Same content")
+        with patch("db.DB_PATH", db_path), \
+             patch("db.detect_language", return_value="en"), \
+             patch("db.extract_keyword_sets", return_value=[(["content"], [], [])]):
+            update_file_entry(str(md), "synced.md", 1.0)
+
+        with patch("db.DB_PATH", db_path), \
+             patch("db.detect_language") as mock_detect, \
+             patch("db.extract_keyword_sets") as mock_extract:
+            update_file_entry(str(md), "synced.md", 5.0)  # nur mtime geändert
+
+        mock_detect.assert_not_called()
+        mock_extract.assert_not_called()
+        conn = sqlite3.connect(db_path)
+        row = conn.execute("SELECT mtime, keywords FROM files WHERE filename='synced.md'").fetchone()
+        conn.close()
+        assert row == (5.0, "content")
+
+    def test_copy_reuses_language_of_identical_content(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        _setup_db(db_path)
+
+        original = tmp_path / "original.md"
+        copy = tmp_path / "copy.md"
+        original.write_text("Shared content")
+        copy.write_text("Shared content")
+        with patch("db.DB_PATH", db_path), \
+             patch("db.detect_language", return_value="de"), \
+             patch("db.extract_keyword_sets", return_value=[(["content"], [], [])]):
+            update_file_entry(str(original), "original.md", 1.0)
+
+        with patch("db.DB_PATH", db_path), \
+             patch("db.detect_language") as mock_detect, \
+             patch("db.extract_keyword_sets", return_value=[(["content"], [], [])]) as mock_extract:
+            update_file_entry(str(copy), "copy.md", 1.0)
+
+        mock_detect.assert_not_called()
+        assert mock_extract.call_args.kwargs["language"] == "de"
+
+    def test_changed_content_is_reextracted(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        _setup_db(db_path)
+
+        md = tmp_path / "edited.md"
+        md.write_text("Old text")
+        with patch("db.DB_PATH", db_path), \
+             patch("db.detect_language", return_value="en"), \
+             patch("db.extract_keyword_sets", return_value=[(["old"], [], [])]):
+            update_file_entry(str(md), "edited.md", 1.0)
+
+        md.write_text("New text")
+        with patch("db.DB_PATH", db_path), \
+             patch("db.detect_language", return_value="en"), \
+             patch("db.extract_keyword_sets", return_value=[(["new"], [], [])]) as mock_extract:
+            update_file_entry(str(md), "edited.md", 2.0)
+
+        mock_extract.assert_called_once()
+        assert _postings(db_path, "edited.md") == {("new", "en")}
+
     def test_stores_content_in_db(self, tmp_path):
         db_path = str(tmp_path / "test.db")
         _setup_db(db_path)
@@ -174,14 +347,11 @@ class TestUpdateFileEntry:
 
         with patch("db.DB_PATH", db_path), \
              patch("db.detect_language", return_value="en"), \
-             patch("db.extract_keywords", return_value=["document"]):
+             patch("db.extract_keyword_sets", return_value=[(["document"], [], [])]):
             update_file_entry(str(md), "content.md", 1.0)
+            content = read_document("content.md")
 
-        conn = sqlite3.connect(db_path)
-        content = conn.execute("SELECT content FROM files WHERE filename='content.md'").fetchone()[0]
-        conn.close()
-
-        assert "My Document" in content
+        assert content == "# My Document\nSome text here."
 
     def test_handles_file_read_error_gracefully(self, tmp_path):
         db_path = str(tmp_path / "test.db")
@@ -190,6 +360,700 @@ class TestUpdateFileEntry:
         # File does not exist → open() raises FileNotFoundError
         with patch("db.DB_PATH", db_path), \
              patch("db.detect_language"), \
-             patch("db.extract_keywords"):
+             patch("db.extract_keyword_sets"):
             # Must not raise
             update_file_entry("/nonexistent/ghost.md", "ghost.md", 1.0)
+
+
+# ── update_file_entries ───────────────────────────────────────────────────────
+
+class TestUpdateFileEntries:
+    def test_groups_pending_files_by_language(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        _setup_db(db_path)
+
+        files = {"a.md": "en", "b.md": "de", "c.md": "en"}
+        for name in files:
+            (tmp_path / name).write_text(name)
+
+        def fake_batch(texts, language):
+            return [([f"{language}-{text}"], [], []) for text in texts]
+
+        with patch("db.DB_PATH", db_path), \
+             patch("db.detect_language", side_effect=lambda text: files[text]), \
+             patch("db.extract_keyword_sets", side_effect=fake_batch) as mock_batch:
+            update_file_entries([(str(tmp_path / name), name, 1.0) for name in files])
+
+        batches = {call.kwargs["language"]: call.args[0] for call in mock_batch.call_args_list}
+        assert batches == {"en": ["a.md", "c.md"], "de": ["b.md"]}
+        assert _postings(db_path, "c.md") == {("en-c.md", "en")}
+        assert _postings(db_path, "b.md") == {("de-b.md", "de")}
+
+    def test_skips_unchanged_and_unreadable_files(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        _setup_db(db_path)
+
+        md = tmp_path / "doc.md"
+        md.write_text("Text")
+        with patch("db.DB_PATH", db_path), \
+             patch("db.detect_language", return_value="en"), \
+             patch("db.extract_keyword_sets", return_value=[(["text"], [], [])]):
+            update_file_entry(str(md), "doc.md", 1.0)
+
+        with patch("db.DB_PATH", db_path), \
+             patch("db.detect_language", return_value="en"), \
+             patch("db.extract_keyword_sets") as mock_batch:
+            update_file_entries([
+                (str(md), "doc.md", 1.0),
+                ("/nonexistent/ghost.md", "ghost.md", 1.0),
+            ])
+
+        mock_batch.assert_not_called()
+
+    def test_unchanged_corpus_skips_chunk_processing(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        _setup_db(db_path)
+        conn = sqlite3.connect(db_path)
+        _write_entries(conn.cursor(), [
+            ("a.md", "/p/a.md", 1.0, "A", "en", ["a"], [], []),
+            ("b.md", "/p/b.md", 2.0, "B", "en", ["b"], [], []),
+        ])
+        conn.commit()
+        conn.close()
+
+        with patch("db.DB_PATH", db_path), patch("db._update_chunk") as mock_chunk:
+            update_file_entries([("/p/a.md", "a.md", 1.0), ("/p/b.md", "b.md", 2.0)])
+
+        mock_chunk.assert_not_called()
+
+    def _mtime_queries(self, db_path, entries):
+        statements = []
+        with patch("db.DB_PATH", db_path):
+            with write_connection() as conn:
+                conn.set_trace_callback(statements.append)
+            try:
+                update_file_entries(entries)
+            finally:
+                with write_connection() as conn:
+                    conn.set_trace_callback(None)
+        return [sql for sql in statements if "SELECT filename, mtime FROM files" in sql]
+
+    def test_small_batch_reads_only_its_own_mtimes(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        _setup_db(db_path)
+        with patch("db.DB_PATH", db_path), write_connection() as conn:
+            _write_entries(conn.cursor(), [
+                ("a.md", "/p/a.md", 1.0, "A", "en", ["a"], [], []),
+                ("b.md", "/p/b.md", 2.0, "B", "en", ["b"], [], []),
+            ])
+
+        queries = self._mtime_queries(db_path, [("/p/a.md", "a.md", 1.0)])
+        assert len(queries) == 1 and "filename IN ('a.md')" in queries[0]
+
+        with patch("db._PRELOAD_MIN_ENTRIES", 2):
+            queries = self._mtime_queries(db_path, [("/p/a.md", "a.md", 1.0), ("/p/b.md", "b.md", 2.0)])
+        assert len(queries) == 1 and " IN (" not in queries[0]
+
+    def test_outdated_index_version_is_reextracted(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        _setup_db(db_path)
+
+        md = tmp_path / "doc.md"
+        md.write_text("Text")
+        with patch("db.DB_PATH", db_path), \
+             patch("db.detect_language", return_value="en"), \
+             patch("db.extract_keyword_sets", return_value=[(["text"], [], [["text"]])]):
+            update_file_entries([(str(md), "doc.md", 1.0)])
+        conn = sqlite3.connect(db_path)
+        conn.execute("UPDATE files SET index_version = 0")
+        conn.commit()
+        conn.close()
+
+        with patch("db.DB_PATH", db_path), \
+             patch("db.detect_language", return_value="en"), \
+             patch("db.extract_keyword_sets", return_value=[(["text"], [], [["text"]])]) as mock_extract:
+            update_file_entries([(str(md), "doc.md", 1.0)])
+
+        mock_extract.assert_called_once()
+
+    def test_every_profile_has_an_index_version(self):
+        assert set(_INDEX_VERSIONS) == set(NLP_PROFILES)
+        # Ohne gemessene Gleichheit der Stichwörter hat jedes Profil eine eigene Version
+        assert len(set(_INDEX_VERSIONS.values())) == len(_INDEX_VERSIONS)
+
+    def test_extraction_error_does_not_write_entries(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        _setup_db(db_path)
+
+        md = tmp_path / "doc.md"
+        md.write_text("Text")
+        with patch("db.DB_PATH", db_path), \
+             patch("db.detect_language", return_value="en"), \
+             patch("db.extract_keyword_sets", side_effect=RuntimeError("kein Modell")):
+            update_file_entries([(str(md), "doc.md", 1.0)])  # Must not raise
+
+        conn = sqlite3.connect(db_path)
+        count = conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+        conn.close()
+        assert count == 0
+
+
+# ── _write_entries ────────────────────────────────────────────────────────────
+
+class TestWriteEntries:
+    def test_writes_all_rows_with_distinct_fulltext_rowids(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        _setup_db(db_path)
+
+        conn = sqlite3.connect(db_path)
+        _write_entries(conn.cursor(), [
+            ("a.md", "/p/a.md", 1.0, "Alpha text", "en", ["alpha"], [], []),
+            ("b.md", "/p/b.md", 1.0, "Beta text", "de", ["beta"], [], []),
+        ])
+        conn.commit()
+        rowids = [row[0] for row in conn.execute("SELECT fts_rowid FROM files ORDER BY filename")]
+        conn.close()
+
+        assert len(set(rowids)) == 2
+        assert _fulltext_hits(db_path, "Beta") == ["b.md"]
+        assert _postings(db_path, "b.md") == {("beta", "de")}
+
+    def test_rewrite_replaces_fulltext_row(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        _setup_db(db_path)
+
+        conn = sqlite3.connect(db_path)
+        _write_entries(conn.cursor(), [("a.md", "/p/a.md", 1.0, "Old text", "en", [], [], [])])
+        _write_entries(conn.cursor(), [("a.md", "/p/a.md", 2.0, "New text", "en", [], [], [])])
+        conn.commit()
+        count = conn.execute("SELECT COUNT(*) FROM files_fts").fetchone()[0]
+        conn.close()
+
+        assert count == 1
+        assert _fulltext_hits(db_path, "Old") == []
+
+    def test_stores_section_keywords(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        _setup_db(db_path)
+
+        conn = sqlite3.connect(db_path)
+        _write_entries(conn.cursor(), [
+            ("a.md", "/p/a.md", 1.0, "# Eins\nx\n# Zwei\ny\n", "de", ["eins", "zwei"], [], [["eins"], ["zwei"]]),
+        ])
+        conn.commit()
+        rows = conn.execute("SELECT idx, term, language FROM section_keywords ORDER BY idx").fetchall()
+        conn.close()
+
+        assert rows == [(0, "eins", "de"), (1, "zwei", "de")]
+
+    def test_keyword_stats_count_documents_per_term(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        _setup_db(db_path)
+
+        conn = sqlite3.connect(db_path)
+        _write_entries(conn.cursor(), [
+            ("a.md", "/p/a.md", 1.0, "A", "en", ["docker", "linux"], [], []),
+            ("b.md", "/p/b.md", 1.0, "B", "en", ["docker", "Docker"], [], []),
+            ("c.md", "/p/c.md", 1.0, "C", "de", ["docker"], [], []),
+        ])
+        conn.commit()
+        conn.close()
+
+        assert _keyword_stats(db_path) == {("docker", "en"): 2, ("linux", "en"): 1, ("docker", "de"): 1}
+
+    def test_keyword_change_applies_only_delta(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        _setup_db(db_path)
+
+        conn = sqlite3.connect(db_path)
+        _write_entries(conn.cursor(), [
+            ("a.md", "/p/a.md", 1.0, "A", "en", ["docker", "linux"], [], []),
+            ("b.md", "/p/b.md", 1.0, "B", "en", ["linux"], [], []),
+        ])
+        _write_entries(conn.cursor(), [("a.md", "/p/a.md", 2.0, "A2", "en", ["linux", "python"], [], [])])
+        conn.commit()
+        conn.close()
+
+        assert _keyword_stats(db_path) == {("linux", "en"): 2, ("python", "en"): 1}
+        assert _postings(db_path, "a.md") == {("linux", "en"), ("python", "en")}
+
+    def test_language_change_moves_keyword_stats(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        _setup_db(db_path)
+
+        conn = sqlite3.connect(db_path)
+        _write_entries(conn.cursor(), [("a.md", "/p/a.md", 1.0, "A", "en", ["docker"], [], [])])
+        _write_entries(conn.cursor(), [("a.md", "/p/a.md", 2.0, "A", "de", ["docker"], [], [])])
+        conn.commit()
+        conn.close()
+
+        assert _keyword_stats(db_path) == {("docker", "de"): 1}
+        assert _postings(db_path, "a.md") == {("docker", "de")}
+        assert _language_stats(db_path) == {"de": 1}
+
+    def test_language_stats_count_documents_per_language(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        _setup_db(db_path)
+
+        conn = sqlite3.connect(db_path)
+        _write_entries(conn.cursor(), [
+            ("a.md", "/p/a.md", 1.0, "A", "en", [], [], []),
+            ("b.md", "/p/b.md", 1.0, "B", "en", [], [], []),
+            ("c.md", "/p/c.md", 1.0, "C", None, [], [], []),
+        ])
+        # Erneutes Schreiben derselben Datei zählt nicht doppelt
+        _write_entries(conn.cursor(), [("a.md", "/p/a.md", 2.0, "A2", "en", [], [], [])])
+        conn.commit()
+        conn.close()
+
+        assert _language_stats(db_path) == {"en": 2, "unknown": 1}
+
+
+# ── remove_file_entry ─────────────────────────────────────────────────────────
+
+class TestRemoveFileEntry:
+    def test_removes_row_and_postings(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        _setup_db(db_path)
+
+        md = tmp_path / "gone.md"
+        md.write_text("Hello world")
+        with patch("db.DB_PATH", db_path), \
+             patch("db.detect_language", return_value="en"), \
+             patch("db.extract_keyword_sets", return_value=[(["hello"], [], [])]):
+            update_file_entry(str(md), "gone.md", 1.0)
+
+        conn = sqlite3.connect(db_path)
+        remove_file_entry(conn.cursor(), "gone.md")
+        conn.commit()
+        count = conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+        conn.close()
+
+        assert count == 0
+        assert _postings(db_path, "gone.md") == set()
+        assert _fulltext_hits(db_path, "Hello") == []
+
+    def test_removal_decrements_keyword_stats(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        _setup_db(db_path)
+
+        conn = sqlite3.connect(db_path)
+        _write_entries(conn.cursor(), [
+            ("a.md", "/p/a.md", 1.0, "A", "en", ["docker", "linux"], [], []),
+            ("b.md", "/p/b.md", 1.0, "B", "en", ["docker"], [], []),
+        ])
+        remove_file_entry(conn.cursor(), "a.md")
+        conn.commit()
+        conn.close()
+
+        assert _keyword_stats(db_path) == {("docker", "en"): 1}
+        assert _language_stats(db_path) == {"en": 1}
+
+
+# ── Teilbereiche lesen ────────────────────────────────────────────────────────
+
+LAYOUT_DOC = "Intro\n# Setup\nText\n```\n# kein Heading\n```\n## Details\nMehr\n"
+
+
+class TestReadDocument:
+    @pytest.fixture
+    def db_path(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        _setup_db(db_path)
+        lines = "".join(f"Zeile {n}\n" for n in range(1, 11))
+        with patch("db.DB_PATH", db_path), patch("layout._LINE_MARK_INTERVAL", 3):
+            with write_connection() as conn:
+                _write_entries(conn.cursor(), [
+                    ("doc.md", "/p/doc.md", 1.0, LAYOUT_DOC, "de", [], [], []),
+                    ("lines.md", "/p/lines.md", 1.0, lines, "de", [], [], []),
+                ])
+            yield db_path
+
+    def test_reads_character_range(self, db_path):
+        assert read_document("doc.md", 6, 7) == "# Setup"
+        assert read_document("doc.md", 53) == "Mehr\n"
+
+    def test_reads_line_range_across_marks(self, db_path):
+        assert read_document_lines("lines.md", 2, 5) == "Zeile 2\nZeile 3\nZeile 4\nZeile 5\n"
+        assert read_document_lines("lines.md", 9) == "Zeile 9\nZeile 10\n"
+        assert read_document_lines("lines.md", 20) == ""
+
+    def test_reads_section(self, db_path):
+        assert read_document_section("doc.md", 2) == "## Details\nMehr\n"
+        assert read_document_section("doc.md", 3) is None
+
+    def test_info_reports_size_lines_and_sections(self, db_path):
+        info = document_info("doc.md")
+        assert info is not None
+        assert info["size"] == len(LAYOUT_DOC)
+        assert info["lines"] == 8
+        assert [section[1] for section in info["sections"]] == ["", "Setup", "Details"]
+        assert document_info("missing.md") is None
+
+    def test_rewrite_and_removal_replace_layout(self, db_path):
+        with write_connection() as conn:
+            _write_entries(conn.cursor(), [("doc.md", "/p/doc.md", 2.0, "# Neu\n", "de", [], [], [])])
+        assert read_document_section("doc.md", 0) == "# Neu\n"
+        assert read_document_section("doc.md", 1) is None
+        with write_connection() as conn:
+            remove_file_entry(conn.cursor(), "lines.md")
+        assert read_document_lines("lines.md", 1) is None
+
+
+# ── Komprimierter Inhaltsspeicher ─────────────────────────────────────────────
+
+def _content_rows(db_path: str) -> dict[str, int]:
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("SELECT hash, COUNT(*) FROM contents GROUP BY hash").fetchall()
+    conn.close()
+    return dict(rows)
+
+
+class TestContentStore:
+    def test_content_is_not_kept_in_files_table(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        _setup_db(db_path)
+        with patch("db.DB_PATH", db_path), write_connection() as conn:
+            _write_entries(conn.cursor(), [("a.md", "/p/a.md", 1.0, "Alpha", "en", [], [], [])])
+        conn = sqlite3.connect(db_path)
+        content = conn.execute("SELECT content FROM files").fetchone()[0]
+        conn.close()
+        assert content is None
+        assert _content_rows(db_path) == {_content_hash("Alpha"): 1}
+
+    def test_range_reads_across_chunks(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        _setup_db(db_path)
+        text = "".join(chr(ord("a") + n % 26) for n in range(100)) + "äöü"
+        with patch("db.DB_PATH", db_path), patch("db._CONTENT_CHUNK_CHARS", 16):
+            with write_connection() as conn:
+                _write_entries(conn.cursor(), [("a.md", "/p/a.md", 1.0, text, "en", [], [], [])])
+            assert _content_rows(db_path) == {_content_hash(text): 7}
+            assert read_document("a.md") == text
+            assert read_document("a.md", 10, 30) == text[10:40]
+            assert read_document("a.md", 95) == text[95:]
+            assert read_document("a.md", 200, 5) == ""
+
+    def test_identical_content_is_stored_once_and_pruned(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        _setup_db(db_path)
+        with patch("db.DB_PATH", db_path):
+            with write_connection() as conn:
+                _write_entries(conn.cursor(), [
+                    ("a.md", "/p/a.md", 1.0, "Gleich", "de", [], [], []),
+                    ("b.md", "/p/b.md", 1.0, "Gleich", "de", [], [], []),
+                ])
+            assert _content_rows(db_path) == {_content_hash("Gleich"): 1}
+            with write_connection() as conn:
+                _write_entries(conn.cursor(), [("a.md", "/p/a.md", 2.0, "Anders", "de", [], [], [])])
+                remove_file_entry(conn.cursor(), "b.md")
+        assert _content_rows(db_path) == {_content_hash("Anders"): 1}
+
+    def test_fulltext_index_keeps_no_copy_of_the_text(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        _setup_db(db_path)
+        with patch("db.DB_PATH", db_path):
+            with write_connection() as conn:
+                _write_entries(conn.cursor(), [
+                    ("a.md", "/p/a.md", 1.0, "Gleicher Text", "de", [], [], []),
+                    ("b.md", "/p/b.md", 1.0, "Gleicher Text", "de", [], [], []),
+                ])
+            # Löschen aus dem contentless-Index braucht den alten Text aus dem komprimierten Speicher
+            with write_connection() as conn:
+                _write_entries(conn.cursor(), [("a.md", "/p/a.md", 2.0, "Anderer Text", "de", [], [], [])])
+        conn = sqlite3.connect(db_path)
+        shadow = conn.execute("SELECT name FROM sqlite_master WHERE name = 'files_fts_content'").fetchall()
+        conn.close()
+        assert shadow == []
+        assert _fulltext_hits(db_path, "Gleicher") == ["b.md"]
+        assert _fulltext_hits(db_path, "Anderer") == ["a.md"]
+
+    def test_migration_replaces_fulltext_index_with_stored_text(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        _setup_db(db_path)
+        with patch("db.DB_PATH", db_path), write_connection() as conn:
+            _write_entries(conn.cursor(), [("a.md", "/p/a.md", 1.0, "Docker Compose", "en", [], [], [])])
+        conn = sqlite3.connect(db_path)
+        conn.execute("DROP TABLE files_fts")
+        conn.execute("CREATE VIRTUAL TABLE files_fts USING fts5(filename UNINDEXED, content, tokenize = 'trigram')")
+        conn.execute("INSERT INTO files_fts (rowid, filename, content) VALUES (1, 'a.md', 'Docker Compose')")
+        conn.commit()
+        conn.close()
+
+        with patch("db.DB_PATH", db_path):
+            init_db()
+
+        conn = sqlite3.connect(db_path)
+        shadow = conn.execute("SELECT name FROM sqlite_master WHERE name = 'files_fts_content'").fetchall()
+        conn.close()
+        assert shadow == []
+        assert _fulltext_hits(db_path, "Compose") == ["a.md"]
+
+    def test_migration_moves_inline_content(self, tmp_path):
+        db_path = str(tmp_path / "legacy.db")
+        conn = sqlite3.connect(db_path)
+        conn.execute("""
+            CREATE TABLE files (
+                filename TEXT PRIMARY KEY, path TEXT, mtime REAL,
+                keywords TEXT, content TEXT, language TEXT
+            )
+        """)
+        conn.execute("INSERT INTO files VALUES ('legacy.md', '/p/legacy.md', 1.0, '', '# Alt\nText', 'de')")
+        conn.commit()
+        conn.close()
+
+        with patch("db.DB_PATH", db_path):
+            init_db()
+            assert read_document("legacy.md") == "# Alt\nText"
+            assert read_document_section("legacy.md", 0) == "# Alt\nText"
+
+        conn = sqlite3.connect(db_path)
+        inline = conn.execute("SELECT content FROM files").fetchone()[0]
+        conn.close()
+        assert inline is None
+        assert _fulltext_hits(db_path, "Text") == ["legacy.md"]
+
+
+# ── Abschnittsvektoren ────────────────────────────────────────────────────────
+
+def _fake_embed(texts, language=None):
+    return np.array([[len(text), 1.0] for text in texts], dtype=np.float32)
+
+
+def _vector_rows(db_path: str) -> list[tuple[str, int, str]]:
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("SELECT filename, idx, model FROM section_vectors ORDER BY filename, idx").fetchall()
+    conn.close()
+    return rows
+
+
+class TestSectionVectors:
+    def _update(self, db_path, tmp_path, names, embed):
+        with patch("db.DB_PATH", db_path), \
+             patch("db.embeddings_enabled", return_value=True), \
+             patch("db.EMBEDDING_MODEL", "test-model"), \
+             patch("db.embed_texts", side_effect=embed) as mock_embed, \
+             patch("db.detect_language", return_value="de"), \
+             patch("db.extract_keyword_sets", side_effect=lambda texts, language: [([], [], []) for _ in texts]):
+            update_file_entries([(str(tmp_path / name), name, mtime) for name, mtime in names])
+        return mock_embed
+
+    def test_embeds_every_section(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        _setup_db(db_path)
+        (tmp_path / "a.md").write_text("# Eins\nx\n# Zwei\ny\n")
+
+        self._update(db_path, tmp_path, [("a.md", 1.0)], _fake_embed)
+
+        assert _vector_rows(db_path) == [("a.md", 0, "test-model"), ("a.md", 1, "test-model")]
+        conn = sqlite3.connect(db_path)
+        vector = conn.execute("SELECT vector FROM section_vectors WHERE idx = 1").fetchone()[0]
+        conn.close()
+        assert np.frombuffer(vector, dtype=np.float32).tolist() == [len("# Zwei\ny\n"), 1.0]
+
+    def test_only_changed_files_are_embedded_again(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        _setup_db(db_path)
+        (tmp_path / "a.md").write_text("Alpha")
+        (tmp_path / "b.md").write_text("Beta")
+        self._update(db_path, tmp_path, [("a.md", 1.0), ("b.md", 1.0)], _fake_embed)
+
+        (tmp_path / "b.md").write_text("Beta neu")
+        mock_embed = self._update(db_path, tmp_path, [("a.md", 1.0), ("b.md", 2.0)], _fake_embed)
+
+        mock_embed.assert_called_once()
+        assert mock_embed.call_args.args[0] == ["Beta neu"]
+
+    def test_change_log_names_rewritten_files_and_is_pruned(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        _setup_db(db_path)
+        (tmp_path / "a.md").write_text("Alpha")
+        (tmp_path / "b.md").write_text("Beta")
+        self._update(db_path, tmp_path, [("a.md", 1.0), ("b.md", 1.0)], _fake_embed)
+
+        (tmp_path / "b.md").write_text("Beta neu")
+        with patch("db._VECTOR_LOG_SIZE", 2):
+            self._update(db_path, tmp_path, [("a.md", 1.0), ("b.md", 2.0)], _fake_embed)
+
+        conn = sqlite3.connect(db_path)
+        logged = [row[0] for row in conn.execute("SELECT filename FROM vector_changes ORDER BY seq")]
+        conn.close()
+        # Alte Einträge sind gekürzt, die letzten nennen nur die geänderte Datei
+        assert logged == ["b.md", "b.md"]
+
+    def test_embedding_error_keeps_index_usable(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        _setup_db(db_path)
+        (tmp_path / "a.md").write_text("Alpha")
+
+        self._update(db_path, tmp_path, [("a.md", 1.0)], RuntimeError("kein Modell"))
+
+        assert _vector_rows(db_path) == []
+        with patch("db.DB_PATH", db_path):
+            assert read_document("a.md") == "Alpha"
+
+
+# ── Verbindungen ──────────────────────────────────────────────────────────────
+
+class TestConnections:
+    def test_init_db_enables_wal_mode(self, tmp_path):
+        db_path = str(tmp_path / "wal.db")
+        _setup_db(db_path)
+        conn = sqlite3.connect(db_path)
+        mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        conn.close()
+        assert mode == "wal"
+
+    def test_read_connection_is_reused_per_thread(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        _setup_db(db_path)
+        with patch("db.DB_PATH", db_path):
+            first = get_read_connection()
+            second = get_read_connection()
+            other: list = []
+            thread = threading.Thread(target=lambda: other.append(get_read_connection()))
+            thread.start()
+            thread.join()
+        assert first is second
+        assert other[0] is not first
+
+    def test_read_connection_is_read_only(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        _setup_db(db_path)
+        with patch("db.DB_PATH", db_path):
+            conn = get_read_connection()
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("DELETE FROM files")
+
+    def test_reader_not_blocked_by_open_write_transaction(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        _setup_db(db_path)
+        with patch("db.DB_PATH", db_path):
+            with write_connection() as conn:
+                _write_entries(conn.cursor(), [("a.md", "/p/a.md", 1.0, "A", "en", [], [], [])])
+                # Schreibtransaktion noch offen: Leser sieht den letzten Commit-Stand
+                count = get_read_connection().execute("SELECT COUNT(*) FROM files").fetchone()[0]
+                assert count == 0
+            count = get_read_connection().execute("SELECT COUNT(*) FROM files").fetchone()[0]
+        assert count == 1
+
+    def test_write_connection_rolls_back_on_error(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        _setup_db(db_path)
+        with patch("db.DB_PATH", db_path):
+            with pytest.raises(RuntimeError), write_connection() as conn:
+                _write_entries(conn.cursor(), [("a.md", "/p/a.md", 1.0, "A", "en", [], [], [])])
+                raise RuntimeError("Abbruch")
+            count = get_read_connection().execute("SELECT COUNT(*) FROM files").fetchone()[0]
+        assert count == 0
+
+    def test_statements_are_timed_per_connection(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        _setup_db(db_path)
+        with patch.dict("metrics._histograms", clear=True), patch("db.DB_PATH", db_path):
+            get_read_connection().execute("SELECT COUNT(*) FROM files").fetchone()
+            with write_connection() as conn:
+                conn.cursor().executemany("DELETE FROM files WHERE filename = ?", [("a.md",), ("b.md",)])
+            histograms = dict(metrics._histograms)
+        assert histograms[("mcp_sqlite_query_seconds", (("connection", "read"), ("statement", "select")))][2] == 1
+        assert histograms[("mcp_sqlite_query_seconds", (("connection", "write"), ("statement", "delete")))][2] == 1
+
+
+# ── Generation ────────────────────────────────────────────────────────────────
+
+class TestGeneration:
+    def test_commit_with_changes_bumps_generation(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        _setup_db(db_path)
+        with patch("db.DB_PATH", db_path):
+            before = current_generation()
+            assert before is not None
+            with write_connection() as conn:
+                _write_entries(conn.cursor(), [("a.md", "/p/a.md", 1.0, "A", "en", [], [], [])])
+            assert current_generation() == before + 1
+
+    def test_commit_without_changes_keeps_generation(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        _setup_db(db_path)
+        with patch("db.DB_PATH", db_path):
+            before = current_generation()
+            assert before is not None
+            with write_connection() as conn:
+                conn.execute("SELECT COUNT(*) FROM files").fetchone()
+            assert current_generation() == before
+
+    def test_removal_bumps_generation(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        _setup_db(db_path)
+        with patch("db.DB_PATH", db_path):
+            with write_connection() as conn:
+                _write_entries(conn.cursor(), [("a.md", "/p/a.md", 1.0, "A", "en", [], [], [])])
+            before = current_generation()
+            assert before is not None
+            with write_connection() as conn:
+                remove_file_entry(conn.cursor(), "a.md")
+            assert current_generation() == before + 1
+
+    def test_commit_of_another_process_is_seen_without_report(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        _setup_db(db_path)
+        with patch("db.DB_PATH", db_path):
+            before = current_generation()
+            assert before is not None
+            # Anderer Schreiber (z.B. Indexer mit MCP_INDEXER_MODE=off in einem eigenen Prozess)
+            conn = sqlite3.connect(db_path)
+            conn.execute("UPDATE index_generation SET generation = generation + 1")
+            conn.commit()
+            conn.close()
+            assert current_generation() == before + 1
+
+    def test_missing_database_has_no_generation(self, tmp_path):
+        with patch("db.DB_PATH", str(tmp_path / "fehlt.db")):
+            assert current_generation() is None
+
+
+# ── Verzeichnis-Snapshot ──────────────────────────────────────────────────────
+
+class TestDirSnapshot:
+    def test_roundtrip_and_incremental_update(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        _setup_db(db_path)
+        with patch("db.DB_PATH", db_path):
+            assert load_dir_snapshot("/r", "rules") == ({}, None)
+            save_dir_snapshot("/r", "rules", {
+                "/r": (10, 20, ["a", "b"], ["x.md"]),
+                "/r/a": (11, 21, [], []),
+                "/r/b": (12, 22, [], ["y.md"]),
+            }, [], deep_scan_at=100.0)
+            save_dir_snapshot("/r", "rules", {"/r": (13, 23, ["a"], [])}, ["/r/b"])
+
+            snapshot, deep_scan_at = load_dir_snapshot("/r", "rules")
+            files = load_dir_files("/r", ["/r", "/r/a", "/r/b"])
+
+        assert deep_scan_at == 100.0
+        # Ohne Dateilisten: die liest load_dir_files nur für geänderte Verzeichnisse
+        assert snapshot == {"/r": (13, 23, ["a"]), "/r/a": (11, 21, [])}
+        assert files == {"/r": [], "/r/a": []}
+
+    def test_changed_rules_discard_snapshot(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        _setup_db(db_path)
+        with patch("db.DB_PATH", db_path):
+            save_dir_snapshot("/r", "old", {"/r": (10, 20, [], [])}, [], deep_scan_at=100.0)
+            assert load_dir_snapshot("/r", "new") == ({}, None)
+            # Ein vollständiger Scan mit neuen Regeln ersetzt den alten Snapshot
+            save_dir_snapshot("/r", "new", {"/r/c": (1, 2, [], ["c.md"])}, [], deep_scan_at=200.0)
+            assert load_dir_snapshot("/r", "new") == ({"/r/c": (1, 2, [])}, 200.0)
+            assert load_dir_files("/r", ["/r/c"]) == {"/r/c": ["c.md"]}
+
+    def test_changed_extraction_state_discards_snapshot(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        _setup_db(db_path)
+        with patch("db.DB_PATH", db_path):
+            save_dir_snapshot("/r", "rules", {"/r": (10, 20, [], [])}, [], deep_scan_at=100.0)
+            # Übersprungene Verzeichnisse würden sonst nie neu extrahiert bzw. eingebettet
+            with patch("db._INDEX_VERSION", 99):
+                assert load_dir_snapshot("/r", "rules") == ({}, None)
+            with patch("db.EMBEDDING_MODEL", "anderes-modell"):
+                assert load_dir_snapshot("/r", "rules") == ({}, None)
+            assert load_dir_snapshot("/r", "rules") == ({"/r": (10, 20, [])}, 100.0)
@@ -0,0 +1,83 @@
+# tests/test_embeddings.py
+
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import numpy as np
+
+from embeddings import embed_texts, embeddings_enabled, shared_space, top_k
+
+
+class FakeVectorNlp:
+    """spaCy-Attrappe, deren Dokumentvektor die Wortlängen zählt."""
+
+    def __init__(self):
+        self.disabled: list = []
+
+    def pipe(self, texts, batch_size=1, disable=()):
+        self.disabled = list(disable)
+        for text in texts:
+            vector = np.zeros(4, dtype=np.float32)
+            for word in text.split():
+                vector[min(len(word), 4) - 1] += 1
+            yield SimpleNamespace(vector=vector)
+
+
+# ── Konfiguration ─────────────────────────────────────────────────────────────
+
+class TestEmbeddingsEnabled:
+    def test_disabled_without_model(self):
+        with patch("embeddings.EMBEDDING_MODEL", ""):
+            assert not embeddings_enabled()
+
+    def test_spacy_backend_needs_no_extra_package(self):
+        with patch("embeddings.EMBEDDING_MODEL", "spacy"):
+            assert embeddings_enabled()
+            assert not shared_space()
+
+    def test_sentence_transformers_backend_requires_package(self):
+        with patch("embeddings.EMBEDDING_MODEL", "some-model"), \
+             patch("embeddings.importlib.util.find_spec", return_value=None):
+            assert not embeddings_enabled()
+
+
+# ── embed_texts ───────────────────────────────────────────────────────────────
+
+class TestEmbedTexts:
+    def test_spacy_vectors_are_normalized(self):
+        nlp = FakeVectorNlp()
+        with patch("embeddings.EMBEDDING_MODEL", "spacy"), patch("embeddings._get_nlp", return_value=nlp):
+            vectors = embed_texts(["# a bb", "cccc dddd"], language="en")
+        assert vectors.dtype == np.float32
+        assert vectors.shape == (2, 4)
+        np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), [1.0, 1.0], rtol=1e-6)
+        assert nlp.disabled == ["parser", "ner"]
+
+    def test_zero_vector_stays_zero(self):
+        with patch("embeddings.EMBEDDING_MODEL", "spacy"), \
+             patch("embeddings._get_nlp", return_value=FakeVectorNlp()):
+            vectors = embed_texts([""], language="en")
+        assert not vectors.any()
+
+    def test_empty_input(self):
+        assert embed_texts([]).shape[0] == 0
+
+
+# ── top_k ─────────────────────────────────────────────────────────────────────
+
+class TestTopK:
+    def test_matches_full_sort(self):
+        rng = np.random.default_rng(0)
+        matrix = rng.standard_normal((500, 16)).astype(np.float32)
+        query = rng.standard_normal(16).astype(np.float32)
+        expected = np.argsort(-(matrix @ query), kind="stable")[:10]
+        assert [row for row, _ in top_k(matrix, query, 10)] == list(expected)
+
+    def test_k_larger_than_matrix(self):
+        matrix = np.eye(3, dtype=np.float32)
+        result = top_k(matrix, np.array([0, 1, 0], dtype=np.float32), 10)
+        assert [row for row, _ in result][0] == 1
+        assert len(result) == 3
+
+    def test_empty_matrix(self):
+        assert top_k(np.zeros((0, 4), dtype=np.float32), np.ones(4, dtype=np.float32), 5) == []
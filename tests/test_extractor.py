@@ -1,8 +1,110 @@
 # tests/test_extractor.py
 
+import os
+import random
+import re
+import subprocess
+import sys
+from types import SimpleNamespace
 from unittest.mock import patch, MagicMock
 
-from extractor import _strip_markdown, _deduplicate_keywords, _token_keyword, detect_language
+import pytest
+import spacy
+
+from extractor import (
+    _scan_markdown, _strip_markdown, _deduplicate_keywords, _token_keyword, detect_language,
+    extract_keywords, extract_keywords_batch, extract_keyword_sets, _get_nlp,
+    _load_model, _text_keywords, uses_parser, _language_sample,
+)
+from layout import document_layout
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class FakeNlp:
+    """Deterministische spaCy-Attrappe: Großgeschrieben → PROPN, '-ing' → ROOT-Verb, sonst NOUN."""
+
+    STOP_WORDS = {"the", "a", "is", "and", "for", "with", "in"}
+
+    def __init__(self):
+        self.calls = 0
+        self.pipe_calls: list[dict] = []
+
+    def _token(self, word: str, idx: int = 0):
+        text = word.strip(".,:;!?()")
+        if text[:1].isupper():
+            pos, dep = "PROPN", "nsubj"
+        elif text.endswith("ing"):
+            pos, dep = "VERB", "ROOT"
+        else:
+            pos, dep = "NOUN", "dobj"
+        return SimpleNamespace(
+            text=text, lemma_=text.lower(), pos_=pos, dep_=dep, idx=idx,
+            is_stop=text.lower() in self.STOP_WORDS, is_punct=not text, is_space=False,
+        )
+
+    def _doc(self, text: str):
+        return [self._token(match.group(), match.start()) for match in re.finditer(r"\S+", text)]
+
+    def __call__(self, text: str):
+        self.calls += 1
+        return self._doc(text)
+
+    def pipe(self, texts, batch_size=1, n_process=1):
+        self.pipe_calls.append({"batch_size": batch_size, "n_process": n_process})
+        for text in texts:
+            yield self._doc(text)
+
+
+DOCUMENTS = [
+    "# Docker Setup\nThe container is running with Compose.\n## Networking basics\nBridge networks.",
+    "Plain text without headings about Kubernetes pods.",
+    "# Title only",
+    "",
+    "#\n##   \n### Deployment with `kubectl` and **Helm**\n```bash\n# Installing charts\nhelm install\n```\n"
+    "See [the guide](https://example.com) for _details_ on Routing.",
+    "# Kubernetes\n## Kubernetes Pods\n### Pods\nKubernetes schedules pods and containers onto nodes.",
+]
+
+
+def _extract_keywords_reference(text: str, nlp) -> list[str]:
+    """Bisherige Implementierung (ein nlp()-Aufruf pro Überschrift) als Vergleichsbasis."""
+    keywords = set()
+    for line in text.splitlines():
+        stripped = line.strip()
+        if stripped.startswith("#"):
+            heading_text = stripped.lstrip("#").strip()
+            if not heading_text:
+                continue
+            for token in nlp(heading_text):
+                if token.is_stop or token.is_punct or token.is_space or len(token.text) <= 1:
+                    continue
+                if token.pos_ in {"NOUN", "PROPN", "VERB", "ADJ"}:
+                    keywords.add(_token_keyword(token))
+    for token in nlp(_strip_markdown(text)):
+        if token.is_stop or token.is_punct or token.is_space or len(token.text) <= 1:
+            continue
+        if token.pos_ in {"NOUN", "PROPN"}:
+            keywords.add(_token_keyword(token))
+        elif token.pos_ == "VERB" and token.dep_ == "ROOT":
+            keywords.add(_token_keyword(token))
+    return sorted(_deduplicate_keywords(keywords))
+
+
+def _strip_markdown_reference(text: str) -> str:
+    """Bisherige Implementierung (fünf aufeinanderfolgende re.sub) als Vergleichsbasis."""
+    text = re.sub(r"^#+\s*", "", text, flags=re.MULTILINE)
+    text = re.sub(r"```[\s\S]*?```", "", text)
+    text = re.sub(r"`[^`]+`", "", text)
+    text = re.sub(r"\[([^\]]+)\]\([^)]+\)", r"\1", text)
+    text = re.sub(r"[*_]{1,3}([^*_]+)[*_]{1,3}", r"\1", text)
+    return text
+
+
+MARKDOWN_PIECES = [
+    "#", "# ", "## ", "\n", "\n#", " ", "\t", "\r", "`", "```", "[", "]", "(", ")", "*", "_", "**", "___",
+    "a", "word", "snake_case_name", "[link](url)", "`code`", "**bold**",
+]
 
 
 class TestStripMarkdown:
@@ -55,6 +157,67 @@ class TestStripMarkdown:
     def test_empty_string(self):
         assert _strip_markdown("") == ""
 
+    def test_emphasis_spans_removed_code_and_links(self):
+        # Wie bei den früheren Einzelschritten wirkt Bold/Italic erst auf den Rest
+        assert _strip_markdown("*a `x` b*") == "a  b"
+        assert _strip_markdown("**[Docs](url)** and_more") == "Docs and_more"
+
+    def test_unclosed_fence_keeps_text(self):
+        assert _strip_markdown("```python\nprint(x)") == "```python\nprint(x)"
+
+
+class TestScanMarkdown:
+    @pytest.mark.parametrize("text", DOCUMENTS)
+    def test_matches_reference_on_documents(self, text):
+        assert _scan_markdown(text).text == _strip_markdown_reference(text)
+
+    @pytest.mark.parametrize("text", [
+        "a_b_c_d " * 50,
+        "`" * 101 + " x `" * 20,
+        "```python\ncode\n" * 10,
+        "[" * 200 + "]" + "(" * 10 + "x",
+        "[a](" * 50 + ")",
+        "***___***a" * 20,
+        "#\n##\t\n### # x\n\n#",
+        "[`]`](x)",
+        "[a``](b)",
+        "`a```b`c```",
+    ])
+    def test_matches_reference_on_edge_cases(self, text):
+        assert _scan_markdown(text).text == _strip_markdown_reference(text)
+
+    def test_matches_reference_on_random_markdown(self):
+        rng = random.Random(0)
+        for _ in range(20000):
+            text = "".join(rng.choice(MARKDOWN_PIECES) for _ in range(rng.randint(0, 30)))
+            assert _scan_markdown(text).text == _strip_markdown_reference(text), text
+
+    def test_records_heading_positions(self):
+        text = "Intro\n# **First** part\n```\n# not a heading\n```\n## Second\n"
+        scanned = _scan_markdown(text)
+        assert [start for start, _ in scanned.headings] == [text.index("# **"), text.index("## ")]
+        for _, position in scanned.headings:
+            assert scanned.text[position:].startswith(("First", "Second"))
+
+    def test_records_code_blocks(self):
+        text = "a\n```\ncode\n```\nb ```x``` c ```open"
+        first, second = text.index("```"), text.index("```x")
+        assert _scan_markdown(text).code_blocks == [(first, text.index("\nb")), (second, second + 7)]
+
+
+def _deduplicate_keywords_reference(keywords: set[str]) -> set[str]:
+    """Bisherige Implementierung (paarweiser Vergleich) als Vergleichsbasis."""
+    to_remove = set()
+    sorted_kw = sorted(keywords, key=len)
+    for i, short in enumerate(sorted_kw):
+        if len(short) < 4:
+            continue
+        for long in sorted_kw[i + 1:]:
+            if long.startswith(short) and len(long) - len(short) <= 3:
+                to_remove.add(short)
+                break
+    return keywords - to_remove
+
 
 class TestDeduplicateKeywords:
     def test_removes_short_prefix_duplicate(self):
@@ -92,6 +255,18 @@ class TestDeduplicateKeywords:
         assert "contain" not in result
         assert "container" in result
 
+    def test_removes_each_link_of_prefix_chain(self):
+        assert _deduplicate_keywords({"deploy", "deployme", "deployments"}) == {"deployments"}
+
+    def test_matches_reference_on_random_vocabularies(self):
+        rng = random.Random(0)
+        for _ in range(300):
+            keywords = {
+                "".join(rng.choice("ab") for _ in range(rng.randint(1, 9)))
+                for _ in range(rng.randint(0, 60))
+            }
+            assert _deduplicate_keywords(keywords) == _deduplicate_keywords_reference(keywords)
+
 
 class TestTokenKeyword:
     def _make_token(self, pos: str, text: str, lemma: str) -> MagicMock:
@@ -118,21 +293,207 @@ class TestTokenKeyword:
         assert _token_keyword(token) == "docker"
 
 
+def _tagged(*words: tuple[str, str]):
+    """Tokens ohne Parser-Annotation aus (Text, POS)-Paaren; SPACE/PUNCT werden entsprechend markiert."""
+    return [
+        SimpleNamespace(
+            text=text, lemma_=text.lower(), pos_=pos, dep_="", is_stop=False,
+            is_punct=pos == "PUNCT", is_space=pos == "SPACE",
+        )
+        for text, pos in words
+    ]
+
+
+class TestNlpProfiles:
+    @pytest.mark.parametrize("profile, excluded", [
+        ("full", []), ("lean", ["ner"]), ("tagger", ["ner", "parser"]),
+    ])
+    def test_load_model_excludes_profile_components(self, profile, excluded):
+        _load_model.cache_clear()
+        with patch("spacy.load") as mock_load:
+            _load_model("en_core_web_sm", profile)
+        mock_load.assert_called_once_with("en_core_web_sm", exclude=excluded)
+        _load_model.cache_clear()
+
+    def test_get_nlp_uses_configured_profile(self):
+        with patch("extractor.NLP_PROFILE", "tagger"), patch("extractor.ensure_models"), \
+             patch("extractor._load_model", return_value=FakeNlp()) as mock_load:
+            _get_nlp("en")
+        mock_load.assert_called_with("en_core_web_sm", "tagger")
+
+    def test_unknown_profile_falls_back_to_full(self):
+        assert uses_parser("fast") is True
+        with patch("extractor.NLP_PROFILE", "fast"), patch("extractor.ensure_models"), \
+             patch("extractor._load_model", return_value=FakeNlp()) as mock_load:
+            _get_nlp("en")
+        mock_load.assert_called_with("en_core_web_sm", "full")
+
+    def test_only_tagger_profile_drops_parser(self):
+        assert uses_parser("full") and uses_parser("lean")
+        assert not uses_parser("tagger")
+
+    def test_without_parser_first_verb_per_sentence_counts_as_root(self):
+        tokens = _tagged(
+            ("Server", "NOUN"), ("handles", "VERB"), ("requests", "NOUN"), ("using", "VERB"),
+            ("threads", "NOUN"), (".", "PUNCT"), ("Clients", "NOUN"), ("retry", "VERB"),
+            ("\n", "SPACE"), ("Workers", "NOUN"), ("restart", "VERB"),
+        )
+        assert _text_keywords(tokens, parsed=False) == {
+            "server", "handles", "requests", "threads", "clients", "retry", "workers", "restart",
+        }
+
+    def test_with_parser_only_root_verbs_count(self):
+        tokens = _tagged(("Server", "NOUN"), ("handles", "VERB"), ("requests", "NOUN"))
+        tokens[1].dep_ = "ROOT"
+        assert _text_keywords(tokens) == {"server", "handles", "requests"}
+        tokens[1].dep_ = "xcomp"
+        assert _text_keywords(tokens) == {"server", "requests"}
+
+    def test_extract_keyword_sets_passes_profile(self):
+        with patch("extractor._get_nlp", return_value=FakeNlp()) as mock_get_nlp:
+            extract_keyword_sets(["Some text"], language="en", profile="tagger")
+        mock_get_nlp.assert_called_once_with("en", "tagger")
+
+
 class TestDetectLanguage:
     def test_returns_language_code_on_success(self):
-        with patch("extractor.detect", return_value="en"):
+        with patch("langdetect.detect", return_value="en"):
             assert detect_language("Hello world") == "en"
 
     def test_returns_de_for_german_text(self):
-        with patch("extractor.detect", return_value="de"):
+        with patch("langdetect.detect", return_value="de"):
             assert detect_language("Hallo Welt") == "de"
 
     def test_returns_unknown_on_lang_detect_exception(self):
         from langdetect import LangDetectException
-        with patch("extractor.detect", side_effect=LangDetectException(0, "")):
+        with patch("langdetect.detect", side_effect=LangDetectException(0, "")):
             assert detect_language("!!!") == "unknown"
 
     def test_empty_string_returns_unknown(self):
         from langdetect import LangDetectException
-        with patch("extractor.detect", side_effect=LangDetectException(0, "")):
+        with patch("langdetect.detect", side_effect=LangDetectException(0, "")):
             assert detect_language("") == "unknown"
+
+    def test_detects_on_bounded_sample(self):
+        text = "# Titel\n" + "Ein Satz über Server. " * 5000
+        with patch("langdetect.detect", return_value="de") as mock_detect:
+            detect_language(text)
+        assert len(mock_detect.call_args[0][0]) <= 3000
+
+    def test_fixed_seed_gives_stable_result(self):
+        # Kurze, mehrdeutige Texte schwanken bei langdetect ohne festen Seed
+        results = {detect_language("Docker Container Service Update") for _ in range(10)}
+        assert len(results) == 1
+
+
+class TestLanguageSample:
+    def test_short_text_is_used_completely_without_markdown(self):
+        assert _language_sample("# Titel\nText mit **Fett**.") == "Titel\nText mit Fett."
+
+    def test_code_only_document_falls_back_to_raw_text(self):
+        assert _language_sample("```\nprint('x')\n```") == "```\nprint('x')\n```"
+
+    def test_long_text_samples_prefix_and_interior_at_word_boundaries(self):
+        words = [f"wort{n}" for n in range(2000)]
+        sample = _language_sample(" ".join(words))
+        parts = sample.split("\n")
+        assert len(parts) == 4
+        assert parts[0].startswith("wort0 ")
+        # Ausschnitte liegen im Inneren, in aufsteigender Reihenfolge und bestehen aus ganzen Wörtern
+        positions = [words.index(part.split()[0]) for part in parts]
+        assert positions == sorted(positions) and positions[-1] < len(words) - 1
+        assert all(word in words for part in parts for word in part.split())
+
+
+class TestExtractKeywords:
+    @pytest.mark.parametrize("text", DOCUMENTS)
+    def test_matches_reference_implementation(self, text):
+        nlp = FakeNlp()
+        expected = _extract_keywords_reference(text, nlp)
+        with patch("extractor._get_nlp", return_value=nlp):
+            assert extract_keywords(text, language="en") == expected
+
+    def test_headings_parsed_in_single_pipe_call(self):
+        nlp = FakeNlp()
+        with patch("extractor._get_nlp", return_value=nlp):
+            extract_keywords(DOCUMENTS[5], language="en")
+        # Ein pipe()-Aufruf für alle Überschriften, einer für den Gesamttext
+        assert nlp.calls == 0
+        assert len(nlp.pipe_calls) == 2
+
+    @pytest.mark.skipif(not spacy.util.is_package("en_core_web_sm"), reason="en_core_web_sm nicht installiert")
+    @pytest.mark.parametrize("text", DOCUMENTS)
+    def test_matches_reference_with_real_model(self, text):
+        with patch("extractor.ensure_models"):
+            nlp = _get_nlp("en")
+        assert extract_keywords(text, language="en") == _extract_keywords_reference(text, nlp)
+
+
+class TestExtractKeywordsBatch:
+    def test_matches_reference_implementation(self):
+        nlp = FakeNlp()
+        expected = [_extract_keywords_reference(text, nlp) for text in DOCUMENTS]
+        with patch("extractor._get_nlp", return_value=nlp):
+            result = extract_keywords_batch(DOCUMENTS, language="en", n_process=1, batch_size=2)
+        assert result == expected
+
+    def test_keyword_sets_mark_heading_keywords(self):
+        with patch("extractor._get_nlp", return_value=FakeNlp()):
+            [(keywords, heading_keywords, _)] = extract_keyword_sets(["# Docker Setup\n\nPython server"], language="en")
+        assert set(heading_keywords) <= set(keywords)
+        assert "docker" in heading_keywords
+        assert "server" in keywords and "server" not in heading_keywords
+
+    def test_section_keywords_follow_document_layout(self):
+        with patch("extractor._get_nlp", return_value=FakeNlp()):
+            [result] = extract_keyword_sets([DOCUMENTS[0]], language="en")
+        assert result.section_keywords == [
+            ["compose", "container", "docker", "running", "setup"],
+            ["basics", "bridge", "networking", "networks"],
+        ]
+
+    def test_section_keywords_are_subset_of_keywords(self):
+        with patch("extractor._get_nlp", return_value=FakeNlp()):
+            results = extract_keyword_sets(DOCUMENTS, language="en")
+        for text, result in zip(DOCUMENTS, results):
+            assert len(result.section_keywords) == len(document_layout(text)[0])
+            for section in result.section_keywords:
+                assert set(section) <= set(result.keywords)
+
+    def test_empty_input_returns_empty_list(self):
+        with patch("extractor._get_nlp") as mock_get_nlp:
+            assert extract_keywords_batch([], language="en") == []
+        mock_get_nlp.assert_not_called()
+
+    def test_limits_processes_for_small_batches(self):
+        nlp = FakeNlp()
+        with patch("extractor._get_nlp", return_value=nlp):
+            extract_keywords_batch(DOCUMENTS, language="en", n_process=8, batch_size=2)
+        # 6 Dokumente à 2 pro Batch → höchstens 3 Prozesse
+        assert {call["n_process"] for call in nlp.pipe_calls} == {3}
+
+
+class TestLazyModels:
+    def test_serving_path_does_not_import_nlp_libraries(self):
+        code = (
+            "import sys, tools, resources, scanner\n"
+            "print(sorted(m for m in ('spacy', 'langdetect') if m in sys.modules))"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True,
+        )
+        assert result.stdout.strip() == "[]"
+
+    def test_ensure_models_runs_once_on_first_model_use(self):
+        with patch("extractor._models_checked", False), \
+             patch("extractor.ensure_models") as mock_ensure, \
+             patch("extractor._load_model", return_value=FakeNlp()):
+            _get_nlp("en")
+            _get_nlp("de")
+        mock_ensure.assert_called_once()
+
+    def test_no_model_check_without_extraction(self):
+        with patch("extractor._models_checked", False), \
+             patch("extractor.ensure_models") as mock_ensure:
+            assert extract_keyword_sets([]) == []
+        mock_ensure.assert_not_called()
@@ -0,0 +1,141 @@
+# tests/test_indexer.py
+
+import multiprocessing
+import sqlite3
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+import db
+from db import current_generation, init_db, report_changes, set_change_listener, write_connection, _mark_changed
+from indexer import _notify, _push_metrics, listen_for_changes, start_indexer, stop_indexer
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "test.db")
+    with patch("db.DB_PATH", path):
+        init_db()
+        yield path
+    set_change_listener(None)
+    report_changes(False)
+
+
+# ── Änderungs-Benachrichtigung ────────────────────────────────────────────────
+
+class TestChangeListener:
+    def test_called_after_commit_with_changes(self, db_path):
+        listener = MagicMock()
+        set_change_listener(listener)
+        with patch("db.DB_PATH", db_path), write_connection():
+            _mark_changed()
+        listener.assert_called_once()
+
+    def test_not_called_without_changes(self, db_path):
+        listener = MagicMock()
+        set_change_listener(listener)
+        with patch("db.DB_PATH", db_path), write_connection():
+            pass
+        listener.assert_not_called()
+
+
+class TestNotify:
+    def test_sends_change_flag_and_metrics(self):
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        _notify(sender)
+        changed, snapshot = receiver.recv()
+        assert changed is True
+        assert set(snapshot) == {"counters", "gauges", "histograms"}
+
+    def test_metrics_push_exits_process_when_server_is_gone(self):
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        receiver.close()
+        with patch("indexer.os._exit") as mock_exit:
+            _push_metrics(sender, interval=0)
+        mock_exit.assert_called_once_with(0)
+
+    def test_exits_when_server_is_gone(self):
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        receiver.close()
+        with pytest.raises(SystemExit):
+            _notify(sender)
+
+
+# ── listen_for_changes ────────────────────────────────────────────────────────
+
+class TestListenForChanges:
+    def test_coalesces_pending_messages_into_one_bump(self):
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        for _ in range(5):
+            sender.send((True, {}))
+        sender.close()
+        # Endet, sobald der Indexer die Pipe schließt
+        with patch("indexer.bump_generation") as mock_bump:
+            listen_for_changes(receiver)
+        mock_bump.assert_called_once()
+
+    def test_metrics_only_message_keeps_generation(self):
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        sender.send((False, {"gauges": {("mcp_scan_last_completed_timestamp_seconds", ()): 42.0}}))
+        sender.close()
+        with patch("indexer.metrics.set_remote") as mock_set_remote, \
+             patch("indexer.bump_generation") as mock_bump:
+            listen_for_changes(receiver)
+        mock_bump.assert_not_called()
+        mock_set_remote.assert_called_once()
+
+    def test_reports_change_to_cached_generation(self, db_path):
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        report_changes(True)
+        with patch("db.DB_PATH", db_path):
+            before = current_generation()
+            assert before is not None
+            # Commit des Indexer-Prozesses: eigene Verbindung am Server vorbei
+            conn = sqlite3.connect(db_path)
+            conn.execute("UPDATE index_generation SET generation = generation + 1")
+            conn.commit()
+            conn.close()
+            assert current_generation() == before
+            sender.send((True, {}))
+            sender.close()
+            listen_for_changes(receiver)
+            assert current_generation() == before + 1
+
+    def test_returns_when_indexer_exits_and_reads_generation_again(self, db_path):
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        report_changes(True)
+        sender.close()
+        listen_for_changes(receiver)
+        assert db._changes_reported is False
+
+
+# ── start_indexer ─────────────────────────────────────────────────────────────
+
+class TestStartIndexer:
+    def test_off_starts_nothing(self):
+        with patch("indexer.periodic_scan") as mock_scan:
+            assert start_indexer("off") is None
+        mock_scan.assert_not_called()
+
+    def test_thread_mode_runs_scan_in_thread(self):
+        started = threading.Event()
+        with patch("indexer.periodic_scan", side_effect=started.set):
+            indexer = start_indexer("thread")
+            assert started.wait(1)
+        assert isinstance(indexer, threading.Thread)
+        assert db._changes_reported is True
+        report_changes(False)
+        stop_indexer(indexer)
+
+    def test_process_mode_spawns_process(self):
+        process = MagicMock()
+        context = MagicMock()
+        context.Pipe.return_value = (MagicMock(), MagicMock())
+        context.Process.return_value = process
+        with patch("indexer.multiprocessing.get_context", return_value=context) as mock_context, \
+             patch("indexer.listen_for_changes"):
+            assert start_indexer("process") is process
+        report_changes(False)
+        mock_context.assert_called_once_with("spawn")
+        process.start.assert_called_once()
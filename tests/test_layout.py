@@ -0,0 +1,29 @@
+# tests/test_layout.py
+
+from unittest.mock import patch
+
+from layout import document_layout
+
+LAYOUT_DOC = "Intro\n# Setup\nText\n```\n# kein Heading\n```\n## Details\nMehr\n"
+
+
+# ── document_layout ───────────────────────────────────────────────────────────
+
+class TestDocumentLayout:
+    def test_splits_at_headings_outside_code_blocks(self):
+        sections, _ = document_layout(LAYOUT_DOC)
+        assert [(heading, level, start_line, line_count) for heading, level, start_line, line_count, _, _ in sections] == [
+            ("", 0, 1, 1), ("Setup", 1, 2, 5), ("Details", 2, 7, 2),
+        ]
+
+    def test_sections_cover_whole_document(self):
+        sections, _ = document_layout(LAYOUT_DOC)
+        assert "".join(LAYOUT_DOC[start:start + length] for *_, start, length in sections) == LAYOUT_DOC
+
+    def test_line_marks_every_interval(self):
+        with patch("layout._LINE_MARK_INTERVAL", 3):
+            _, marks = document_layout("a\nbb\nccc\ndddd\neeeee\n")
+        assert marks == [(1, 0), (4, 9)]
+
+    def test_empty_document_has_no_sections(self):
+        assert document_layout("") == ([], [])
@@ -0,0 +1,121 @@
+# tests/test_metrics.py
+
+import inspect
+from typing import Annotated
+from unittest.mock import patch
+
+import pytest
+
+import metrics
+from metrics import InstrumentedApp, inc, observe, render, set_gauge, set_remote, snapshot, timed_tool
+
+
+@pytest.fixture(autouse=True)
+def clean_registry():
+    with patch.dict("metrics._counters", clear=True), patch.dict("metrics._gauges", clear=True), \
+         patch.dict("metrics._histograms", clear=True), patch("metrics._remote", {}):
+        yield
+
+
+def _lines(name: str) -> list[str]:
+    return [line for line in render().splitlines() if line.startswith(name)]
+
+
+class MockApp:
+    def __init__(self):
+        self.registered: dict = {}
+
+    def tool(self, name: str, description: str):
+        def decorator(func):
+            self.registered[name] = func
+            return func
+        return decorator
+
+
+# ── Textformat ────────────────────────────────────────────────────────────────
+
+class TestRender:
+    def test_every_metric_has_help_and_type(self):
+        text = render()
+        for name, (kind, _) in metrics.METRICS.items():
+            assert f"# TYPE {name} {kind}" in text
+            assert f"# HELP {name} " in text
+
+    def test_counter_with_labels(self):
+        inc("mcp_files_total", 3, result="changed")
+        inc("mcp_files_total", result="changed")
+        assert _lines("mcp_files_total") == ['mcp_files_total{result="changed"} 4']
+
+    def test_gauge_is_overwritten(self):
+        set_gauge("mcp_scan_last_files", 5, result="examined")
+        set_gauge("mcp_scan_last_files", 2, result="examined")
+        assert _lines("mcp_scan_last_files") == ['mcp_scan_last_files{result="examined"} 2']
+
+    def test_histogram_buckets_are_cumulative(self):
+        observe("mcp_tool_duration_seconds", 0.002, tool="t")
+        observe("mcp_tool_duration_seconds", 0.2, count=2, tool="t")
+        lines = _lines("mcp_tool_duration_seconds")
+        assert 'mcp_tool_duration_seconds_bucket{tool="t",le="0.001"} 0' in lines
+        assert 'mcp_tool_duration_seconds_bucket{tool="t",le="0.0025"} 1' in lines
+        assert 'mcp_tool_duration_seconds_bucket{tool="t",le="0.25"} 3' in lines
+        assert 'mcp_tool_duration_seconds_bucket{tool="t",le="+Inf"} 3' in lines
+        assert 'mcp_tool_duration_seconds_count{tool="t"} 3' in lines
+        assert any(line.startswith('mcp_tool_duration_seconds_sum{tool="t"} 0.402') for line in lines)
+
+    def test_label_values_are_escaped(self):
+        inc("mcp_tool_requests_total", tool='a"b\\c', outcome="ok")
+        assert _lines("mcp_tool_requests_total") == ['mcp_tool_requests_total{outcome="ok",tool="a\\"b\\\\c"} 1']
+
+
+class TestRemoteSnapshot:
+    def test_counters_and_histograms_add_up_gauges_come_from_indexer(self):
+        inc("mcp_files_total", 2, result="examined")
+        observe("mcp_sqlite_query_seconds", 0.001, connection="read", statement="select")
+        set_gauge("mcp_scan_last_completed_timestamp_seconds", 1)
+        remote = snapshot()
+        set_remote(remote)
+        set_gauge("mcp_scan_last_completed_timestamp_seconds", 0)
+
+        assert _lines("mcp_files_total") == ['mcp_files_total{result="examined"} 4']
+        assert 'mcp_sqlite_query_seconds_count{connection="read",statement="select"} 2' in render()
+        assert _lines("mcp_scan_last_completed") == ["mcp_scan_last_completed_timestamp_seconds 1"]
+
+
+# ── Tool-Instrumentierung ─────────────────────────────────────────────────────
+
+class TestTimedTool:
+    def test_counts_successful_calls(self):
+        wrapped = timed_tool("echo", lambda value: value)
+        assert wrapped(value=7) == 7
+        assert _lines("mcp_tool_requests_total") == ['mcp_tool_requests_total{outcome="ok",tool="echo"} 1']
+        assert 'mcp_tool_duration_seconds_count{tool="echo"} 1' in render()
+
+    def test_counts_errors_and_reraises(self):
+        def failing():
+            raise ValueError("kaputt")
+
+        with pytest.raises(ValueError):
+            timed_tool("failing", failing)()
+        assert _lines("mcp_tool_requests_total") == ['mcp_tool_requests_total{outcome="error",tool="failing"} 1']
+
+    def test_keeps_signature_for_schema_generation(self):
+        def search(keywords: Annotated[list[str], "Suchbegriffe"], limit: int = 20) -> list[str]:
+            """Sucht."""
+            return keywords[:limit]
+
+        wrapped = timed_tool("search", search)
+        assert inspect.signature(wrapped) == inspect.signature(search)
+        assert wrapped.__doc__ == "Sucht."
+
+
+class TestInstrumentedApp:
+    def test_registers_wrapped_tool(self):
+        app = MockApp()
+
+        @InstrumentedApp(app).tool(name="ping", description="Antwortet")
+        def ping() -> str:
+            return "pong"
+
+        assert ping() == "pong"
+        assert app.registered["ping"]() == "pong"
+        assert _lines("mcp_tool_requests_total") == ['mcp_tool_requests_total{outcome="ok",tool="ping"} 1']
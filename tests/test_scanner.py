@@ -1,16 +1,27 @@
 # tests/test_scanner.py
 
+import os
 import sqlite3
+import time
 from unittest.mock import patch
 
-from scanner import scan_markdown_files, cleanup_deleted_files
+import pytest
+
+import metrics
+from config import ScanRoot, parse_scan_roots
+from db import get_read_connection, init_db, _write_entry, write_connection
+from scanner import (
+    scan_markdown_files, cleanup_deleted_files, index_paths, remove_deleted_paths, accepts_path,
+)
 
 
 def _make_db(path: str, filenames: list[str]):
+    with patch("db.DB_PATH", path):
+        init_db()
     conn = sqlite3.connect(path)
-    conn.execute("CREATE TABLE files (filename TEXT PRIMARY KEY)")
+    cur = conn.cursor()
     for name in filenames:
-        conn.execute("INSERT INTO files VALUES (?)", (name,))
+        _write_entry(cur, name, f"/p/{name}", 1.0, "content", "en", ["topic"])
     conn.commit()
     conn.close()
 
@@ -23,9 +34,10 @@ class TestScanMarkdownFiles:
         (tmp_path / "readme.txt").write_text("ignore me")
         (tmp_path / "config.yaml").write_text("key: value")
 
-        with patch("scanner.update_file_entry"):
+        with patch("scanner.update_file_entries"):
             result = scan_markdown_files(str(tmp_path))
 
+        assert result is not None
         assert "notes.md" in result
         assert "readme.txt" not in result
         assert "config.yaml" not in result
@@ -35,42 +47,336 @@ class TestScanMarkdownFiles:
         sub.mkdir()
         (sub / "deep.md").write_text("# Deep")
 
-        with patch("scanner.update_file_entry"):
+        with patch("scanner.update_file_entries"):
             result = scan_markdown_files(str(tmp_path))
 
+        assert result is not None
         assert "sub/deep.md" in result
 
-    def test_calls_update_file_entry_for_each_md(self, tmp_path):
+    def test_updates_all_md_files_in_one_batch(self, tmp_path):
         (tmp_path / "a.md").write_text("A")
         (tmp_path / "b.md").write_text("B")
 
-        with patch("scanner.update_file_entry") as mock_update:
+        with patch("scanner.update_file_entries") as mock_update:
             scan_markdown_files(str(tmp_path))
 
-        assert mock_update.call_count == 2
+        assert mock_update.call_count == 1
+        assert sorted(entry[1] for entry in mock_update.call_args[0][0]) == ["a.md", "b.md"]
 
     def test_returns_empty_set_for_empty_folder(self, tmp_path):
-        with patch("scanner.update_file_entry"):
+        with patch("scanner.update_file_entries"):
             result = scan_markdown_files(str(tmp_path))
         assert result == set()
 
     def test_skips_file_on_error_without_crash(self, tmp_path):
         (tmp_path / "bad.md").write_text("X")
 
-        with patch("scanner.update_file_entry", side_effect=Exception("fail")):
+        with patch("scanner.update_file_entries", side_effect=Exception("fail")):
             result = scan_markdown_files(str(tmp_path))
 
-        # Still returns the rel_path even if update_file_entry raises
+        # Still returns the rel_path even if update_file_entries raises
+        assert result is not None
         assert "bad.md" in result
 
     def test_update_called_with_correct_filename(self, tmp_path):
         (tmp_path / "example.md").write_text("content")
 
-        with patch("scanner.update_file_entry") as mock_update:
+        with patch("scanner.update_file_entries") as mock_update:
             scan_markdown_files(str(tmp_path))
 
-        args = mock_update.call_args
-        assert args[0][1] == "example.md"  # root-level file: rel_path == filename
+        entries = mock_update.call_args[0][0]
+        assert entries[0][1] == "example.md"  # root-level file: rel_path == filename
+
+    def test_records_cycle_metrics(self, tmp_path):
+        (tmp_path / "a.md").write_text("A")
+        (tmp_path / "b.md").write_text("B")
+
+        def update(entries):
+            metrics.inc("mcp_files_total", 1, result="changed")
+
+        with patch.dict("metrics._counters", {("mcp_files_total", (("result", "examined"),)): 10}), \
+             patch.dict("metrics._gauges", clear=True), patch.dict("metrics._histograms", clear=True), \
+             patch("scanner.update_file_entries", side_effect=update):
+            scan_markdown_files(str(tmp_path))
+            text = metrics.render()
+
+        # Gauges zeigen nur den letzten Durchlauf, der Zähler die Summe
+        assert 'mcp_scan_last_files{result="examined"} 2' in text
+        assert 'mcp_scan_last_files{result="changed"} 1' in text
+        assert 'mcp_scan_last_files{result="failed"} 0' in text
+        assert 'mcp_files_total{result="examined"} 12' in text
+        assert "mcp_scan_duration_seconds_count 1" in text
+        assert "mcp_scan_last_completed_timestamp_seconds " in text
+
+
+# ── Mehrere Wurzelordner ──────────────────────────────────────────────────────
+
+def _root(path, label="", include=("*.md",), exclude=(".git", "node_modules")) -> ScanRoot:
+    return ScanRoot(str(path), label, include, exclude)
+
+
+class TestParseScanRoots:
+    def test_single_root_has_no_label(self):
+        assert parse_scan_roots("/markdowns", ("*.md",), (".git",)) == [
+            ScanRoot("/markdowns", "", ("*.md",), (".git",)),
+        ]
+
+    def test_several_roots_with_own_rules(self):
+        roots = parse_scan_roots(
+            f"/a/docs{os.pathsep}/srv/repos/|exclude=vendor, build|include=*.md,*.markdown|name=src",
+            ("*.md",), (".git",),
+        )
+        assert roots == [
+            ScanRoot("/a/docs", "docs", ("*.md",), (".git",)),
+            ScanRoot("/srv/repos", "src", ("*.md", "*.markdown"), ("vendor", "build")),
+        ]
+
+    def test_rejects_duplicate_names(self):
+        with pytest.raises(ValueError, match="mehrfach"):
+            parse_scan_roots(f"/a/docs{os.pathsep}/b/docs", ("*.md",), ())
+
+    def test_rejects_unknown_option(self):
+        with pytest.raises(ValueError, match="unbekannte Option"):
+            parse_scan_roots("/a|exclud=x", ("*.md",), ())
+
+
+class TestMultipleRoots:
+    def test_prefixes_filenames_with_root_label(self, tmp_path):
+        (tmp_path / "docs").mkdir()
+        (tmp_path / "docs" / "a.md").write_text("A")
+        (tmp_path / "repo" / "sub").mkdir(parents=True)
+        (tmp_path / "repo" / "sub" / "b.md").write_text("B")
+        roots = [_root(tmp_path / "docs", "docs"), _root(tmp_path / "repo", "repo")]
+
+        with patch("scanner.update_file_entries") as mock_update:
+            result = scan_markdown_files(roots)
+
+        assert result == {"docs/a.md", "repo/sub/b.md"}
+        paths = {entry[1]: entry[0] for entry in mock_update.call_args[0][0]}
+        assert paths["repo/sub/b.md"] == str(tmp_path / "repo" / "sub" / "b.md")
+
+    def test_excluded_directories_are_never_listed(self, tmp_path):
+        for folder in (".git", "node_modules/pkg", "docs/drafts", "docs/final"):
+            (tmp_path / folder).mkdir(parents=True)
+            (tmp_path / folder / "x.md").write_text("X")
+        root = _root(tmp_path, exclude=(".git", "node_modules", "docs/drafts"))
+
+        with patch("scanner.update_file_entries"), patch("scanner.os.scandir", wraps=os.scandir) as scandir:
+            result = scan_markdown_files([root])
+
+        assert result == {"docs/final/x.md"}
+        listed = {os.path.relpath(call.args[0], tmp_path) for call in scandir.call_args_list}
+        assert listed == {".", "docs", "docs/final"}
+
+    def test_include_globs_select_files(self, tmp_path):
+        (tmp_path / "a.md").write_text("A")
+        (tmp_path / "b.markdown").write_text("B")
+        (tmp_path / "c.txt").write_text("C")
+
+        with patch("scanner.update_file_entries"):
+            result = scan_markdown_files([_root(tmp_path, include=("*.md", "*.markdown"))])
+
+        assert result == {"a.md", "b.markdown"}
+
+    def test_missing_root_does_not_stop_other_roots(self, tmp_path):
+        (tmp_path / "a.md").write_text("A")
+        roots = [_root(tmp_path / "missing", "missing"), _root(tmp_path, "here")]
+
+        with patch("scanner.update_file_entries"):
+            assert scan_markdown_files(roots) == {"here/a.md"}
+
+    def test_index_paths_uses_root_label_and_rules(self, tmp_path):
+        (tmp_path / "repo" / "node_modules").mkdir(parents=True)
+        (tmp_path / "repo" / "node_modules" / "x.md").write_text("X")
+        (tmp_path / "repo" / "a.md").write_text("A")
+        roots = [_root(tmp_path / "docs", "docs"), _root(tmp_path / "repo", "repo")]
+        paths = {
+            str(tmp_path / "repo" / "a.md"),
+            str(tmp_path / "repo" / "node_modules" / "x.md"),
+            str(tmp_path / "docs" / "gone.md"),
+        }
+
+        with patch("scanner.update_file_entries") as mock_update, \
+             patch("scanner.remove_deleted_paths") as mock_remove:
+            index_paths(roots, paths)
+
+        assert [entry[1] for entry in mock_update.call_args[0][0]] == ["repo/a.md"]
+        mock_remove.assert_called_once_with(["docs/gone.md"])
+
+    def test_accepts_path_follows_rules(self, tmp_path):
+        roots = [_root(tmp_path)]
+        assert accepts_path(roots, str(tmp_path / "sub" / "a.md"))
+        assert accepts_path(roots, str(tmp_path / "sub"), is_directory=True)
+        assert not accepts_path(roots, str(tmp_path / "a.txt"))
+        assert not accepts_path(roots, str(tmp_path / "node_modules" / "a.md"))
+        assert not accepts_path(roots, "/elsewhere/a.md")
+
+
+# ── Verzeichnis-Snapshot ──────────────────────────────────────────────────────
+
+def _write_files(filenames: list[str]):
+    """Legt Indexeinträge in der aktuellen Datenbank an (db.DB_PATH)."""
+    with write_connection() as conn:
+        for name in filenames:
+            _write_entry(conn.cursor(), name, f"/p/{name}", 1.0, "content", "en", ["topic"])
+
+
+def _indexed() -> list[str]:
+    return [row[0] for row in get_read_connection().execute("SELECT filename FROM files ORDER BY filename")]
+
+
+def _age(tmp_path, seconds: float = 100):
+    """Setzt die mtime aller Verzeichnisse zurück, damit der Snapshot ihnen vertraut."""
+    past = time.time() - seconds
+    for directory, _, _ in os.walk(tmp_path):
+        os.utime(directory, (past, past))
+
+
+class TestDirSnapshot:
+    @pytest.fixture
+    def corpus(self, tmp_path):
+        (tmp_path / "docs" / "old").mkdir(parents=True)
+        (tmp_path / "docs" / "old" / "a.md").write_text("A")
+        (tmp_path / "docs" / "b.md").write_text("B")
+        (tmp_path / "c.md").write_text("C")
+        _age(tmp_path / "docs")
+        with patch("db.DB_PATH", str(tmp_path / "test.db")):
+            init_db()
+            yield tmp_path / "docs"
+
+    def _scan(self, folder, interval=3600, roots=None):
+        with patch("scanner.update_file_entries") as mock_update, \
+             patch("scanner.os.scandir", wraps=os.scandir) as scandir:
+            result = scan_markdown_files(roots or [_root(folder)], deep_scan_interval=interval)
+        listed = {os.path.relpath(call.args[0], folder) for call in scandir.call_args_list}
+        entries = [entry for call in mock_update.call_args_list for entry in call.args[0]]
+        return result, listed, entries
+
+    def test_unchanged_directories_are_not_listed(self, corpus):
+        first, listed, _ = self._scan(corpus)
+        assert first == {"b.md", "old/a.md"}
+        assert listed == {".", "old"}
+
+        second, listed, entries = self._scan(corpus)
+
+        # Nichts gelistet, keine Einträge und kein Abgleich über alle Dateien
+        assert second is None
+        assert listed == set()
+        assert entries == []
+        assert metrics._gauges[metrics._key("mcp_scan_last_dirs", {"result": "skipped"})] == 2
+
+    def test_new_file_relists_only_its_directory(self, corpus):
+        self._scan(corpus)
+        (corpus / "old" / "new.md").write_text("N")
+
+        _, listed, entries = self._scan(corpus)
+
+        assert listed == {"old"}
+        assert sorted(entry[1] for entry in entries) == ["old/a.md", "old/new.md"]
+
+    def test_recent_directory_mtime_is_not_trusted(self, corpus):
+        _age(corpus, 0)
+        self._scan(corpus)
+
+        _, listed, _ = self._scan(corpus)
+
+        assert listed == {".", "old"}
+
+    def test_removed_directory_drops_its_files(self, corpus):
+        _write_files(["b.md", "old/a.md"])
+        self._scan(corpus)
+        (corpus / "old" / "a.md").unlink()
+        (corpus / "old").rmdir()
+        _age(corpus)
+
+        result, listed, _ = self._scan(corpus)
+
+        assert result is None
+        assert listed == {"."}
+        assert _indexed() == ["b.md"]
+
+    def test_deleted_file_is_removed_from_relisted_directory(self, corpus):
+        _write_files(["b.md", "old/a.md"])
+        self._scan(corpus)
+        (corpus / "old" / "a.md").unlink()
+        _age(corpus / "old")
+
+        _, listed, _ = self._scan(corpus)
+
+        assert listed == {"old"}
+        assert _indexed() == ["b.md"]
+
+    def _index(self, folder, extract=None):
+        """Scan mit echter Aktualisierung der Datenbank (Extraktion gemockt)."""
+        extract = extract or (lambda texts, language: [(["x"], [], [["x"]]) for _ in texts])
+        with patch("db.detect_language", return_value="en"), patch("db.extract_keyword_sets", side_effect=extract):
+            return scan_markdown_files([_root(folder)], deep_scan_interval=3600)
+
+    def test_failed_write_is_retried_by_next_scan(self, corpus):
+        self._index(corpus)
+        (corpus / "old" / "new.md").write_text("N")
+        _age(corpus / "old")
+
+        with patch("scanner.update_file_entries", side_effect=sqlite3.OperationalError("database is locked")):
+            self._index(corpus)
+        assert "old/new.md" not in _indexed()
+
+        # Nächster (flacher) Scan listet das Verzeichnis erneut
+        result = self._index(corpus)
+        assert result is None
+        assert "old/new.md" in _indexed()
+
+    def test_failed_extraction_is_retried_by_next_scan(self, corpus):
+        self._index(corpus)
+        (corpus / "old" / "new.md").write_text("N")
+        _age(corpus / "old")
+
+        def failing(texts, language):
+            raise RuntimeError("Modell fehlt")
+
+        self._index(corpus, extract=failing)
+        assert "old/new.md" not in _indexed()
+
+        self._index(corpus)
+        assert "old/new.md" in _indexed()
+
+    def test_deep_scan_covers_all_roots(self, corpus, tmp_path):
+        (tmp_path / "more").mkdir()
+        (tmp_path / "more" / "d.md").write_text("D")
+        _age(tmp_path / "more")
+        roots = [_root(corpus), ScanRoot(str(tmp_path / "more"), "more", ("*.md",), ())]
+        self._scan(corpus, roots=roots)
+        # Neuer Wurzelordner ohne Snapshot: beide werden vollständig gescannt
+        (tmp_path / "new").mkdir()
+        roots.append(ScanRoot(str(tmp_path / "new"), "new", ("*.md",), ()))
+
+        result, listed, _ = self._scan(corpus, roots=roots)
+
+        assert result == {"b.md", "old/a.md", "more/d.md"}
+        assert {".", "old"} <= listed
+
+    def test_deep_scan_after_interval(self, corpus):
+        self._scan(corpus)
+
+        with patch("scanner.time.time", return_value=time.time() + 7200):
+            _, listed, _ = self._scan(corpus)
+
+        assert listed == {".", "old"}
+
+    def test_changed_rules_force_deep_scan(self, corpus):
+        self._scan(corpus)
+
+        with patch("scanner.update_file_entries"), patch("scanner.os.scandir", wraps=os.scandir) as scandir:
+            scan_markdown_files([_root(corpus, include=("*.md", "*.txt"))], deep_scan_interval=3600)
+
+        assert scandir.call_count == 2
+
+    def test_disabled_by_default(self, corpus):
+        self._scan(corpus, interval=0)
+
+        _, listed, _ = self._scan(corpus, interval=0)
+
+        assert listed == {".", "old"}
 
 
 # ── cleanup_deleted_files ─────────────────────────────────────────────────────
@@ -80,7 +386,7 @@ class TestCleanupDeletedFiles:
         db_path = str(tmp_path / "test.db")
         _make_db(db_path, ["old.md", "existing.md"])
 
-        with patch("scanner.DB_PATH", db_path):
+        with patch("db.DB_PATH", db_path):
             cleanup_deleted_files({"existing.md"})
 
         conn = sqlite3.connect(db_path)
@@ -94,7 +400,7 @@ class TestCleanupDeletedFiles:
         db_path = str(tmp_path / "test.db")
         _make_db(db_path, ["a.md", "b.md"])
 
-        with patch("scanner.DB_PATH", db_path):
+        with patch("db.DB_PATH", db_path):
             cleanup_deleted_files({"a.md", "b.md"})
 
         conn = sqlite3.connect(db_path)
@@ -107,7 +413,7 @@ class TestCleanupDeletedFiles:
         db_path = str(tmp_path / "test.db")
         _make_db(db_path, ["x.md", "y.md", "z.md"])
 
-        with patch("scanner.DB_PATH", db_path):
+        with patch("db.DB_PATH", db_path):
             cleanup_deleted_files(set())
 
         conn = sqlite3.connect(db_path)
@@ -116,14 +422,94 @@ class TestCleanupDeletedFiles:
 
         assert count == 0
 
+    def test_removes_keyword_postings_of_deleted_files(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        _make_db(db_path, ["old.md", "existing.md"])
+
+        with patch("db.DB_PATH", db_path):
+            cleanup_deleted_files({"existing.md"})
+
+        conn = sqlite3.connect(db_path)
+        rows = {r[0] for r in conn.execute("SELECT filename FROM keywords").fetchall()}
+        conn.close()
+
+        assert rows == {"existing.md"}
+
     def test_noop_on_empty_db(self, tmp_path):
         db_path = str(tmp_path / "test.db")
         _make_db(db_path, [])
 
-        with patch("scanner.DB_PATH", db_path):
+        with patch("db.DB_PATH", db_path):
             cleanup_deleted_files({"some.md"})  # should not crash
 
         conn = sqlite3.connect(db_path)
         count = conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
         conn.close()
         assert count == 0
+
+
+# ── index_paths ───────────────────────────────────────────────────────────────
+
+class TestIndexPaths:
+    def test_updates_changed_file(self, tmp_path):
+        (tmp_path / "a.md").write_text("A")
+
+        with patch("scanner.update_file_entries") as mock_update, \
+             patch("scanner.remove_deleted_paths") as mock_remove:
+            index_paths(str(tmp_path), {str(tmp_path / "a.md")})
+
+        assert [entry[1] for entry in mock_update.call_args[0][0]] == ["a.md"]
+        mock_remove.assert_not_called()
+
+    def test_walks_created_directory(self, tmp_path):
+        sub = tmp_path / "sub"
+        sub.mkdir()
+        (sub / "x.md").write_text("X")
+        (sub / "y.txt").write_text("Y")
+
+        with patch("scanner.update_file_entries") as mock_update:
+            index_paths(str(tmp_path), {str(sub)})
+
+        assert [entry[1] for entry in mock_update.call_args[0][0]] == ["sub/x.md"]
+
+    def test_directory_and_file_inside_in_one_batch(self, tmp_path):
+        # Verzeichnis angelegt und Datei darin geschrieben innerhalb des Entprellfensters
+        sub = tmp_path / "sub"
+        sub.mkdir()
+        (sub / "x.md").write_text("X")
+        db_path = str(tmp_path / "test.db")
+        _make_db(db_path, [])
+
+        with patch("db.DB_PATH", db_path), \
+             patch("db.detect_language", return_value="en"), \
+             patch("db.extract_keyword_sets", side_effect=lambda texts, language: [(["x"], [], [["x"]]) for _ in texts]):
+            index_paths(str(tmp_path), {str(sub), str(sub / "x.md")})
+
+        conn = sqlite3.connect(db_path)
+        rows = conn.execute("SELECT filename FROM files").fetchall()
+        conn.close()
+        assert rows == [("sub/x.md",)]
+
+    def test_removes_vanished_paths(self, tmp_path):
+        with patch("scanner.update_file_entries"), \
+             patch("scanner.remove_deleted_paths") as mock_remove:
+            index_paths(str(tmp_path), {str(tmp_path / "gone.md")})
+
+        mock_remove.assert_called_once_with(["gone.md"])
+
+
+# ── remove_deleted_paths ──────────────────────────────────────────────────────
+
+class TestRemoveDeletedPaths:
+    def test_removes_file_and_directory_prefix(self, tmp_path):
+        db_path = str(tmp_path / "test.db")
+        _make_db(db_path, ["a.md", "sub/x.md", "sub/deep/y.md", "sub-other.md", "subway.md"])
+
+        with patch("db.DB_PATH", db_path):
+            remove_deleted_paths(["a.md", "sub"])
+
+        conn = sqlite3.connect(db_path)
+        rows = {r[0] for r in conn.execute("SELECT filename FROM files").fetchall()}
+        conn.close()
+
+        assert rows == {"sub-other.md", "subway.md"}
@@ -1,9 +1,14 @@
 # tests/test_tools.py
 
 import sqlite3
+
+import numpy as np
 import pytest
 from unittest.mock import patch
 
+from db import init_db, _update_vectors, _write_entry, remove_file_entry, write_connection
+import tools as tools_module
+from extractor import detect_language
 from tools import register_tools, CONTENT_PREFIX
 
 
@@ -24,25 +29,16 @@ class MockApp:
 
 
 def _create_db(path: str):
+    with patch("db.DB_PATH", path):
+        init_db()
     conn = sqlite3.connect(path)
-    conn.execute("""
-        CREATE TABLE files (
-            filename TEXT PRIMARY KEY,
-            path     TEXT,
-            mtime    REAL,
-            keywords TEXT,
-            content  TEXT,
-            language TEXT
-        )
-    """)
-    conn.executemany(
-        "INSERT INTO files VALUES (?, ?, ?, ?, ?, ?)",
-        [
-            ("doc1.md", "/p/doc1.md", 1.0, "docker,container,build", "Docker is great for containers", "en"),
-            ("doc2.md", "/p/doc2.md", 2.0, "python,programming",     "Python is awesome",             "en"),
-            ("doc3.md", "/p/doc3.md", 3.0, "docker,linux",           "Docker läuft auf Linux",        "de"),
-        ],
-    )
+    cur = conn.cursor()
+    for row in [
+        ("doc1.md", "/p/doc1.md", 1.0, "Docker is great for containers", "en", ["docker", "container", "build"]),
+        ("doc2.md", "/p/doc2.md", 2.0, "Python is awesome",              "en", ["python", "programming"]),
+        ("doc3.md", "/p/doc3.md", 3.0, "Docker läuft auf Linux",         "de", ["docker", "linux"]),
+    ]:
+        _write_entry(cur, *row)
     conn.commit()
     conn.close()
 
@@ -52,7 +48,7 @@ def tools(tmp_path):
     db_path = str(tmp_path / "test.db")
     _create_db(db_path)
     app = MockApp()
-    with patch("tools.DB_PATH", db_path):
+    with patch("db.DB_PATH", db_path):
         register_tools(app)
         yield app
 
@@ -88,6 +84,48 @@ class TestSearchByKeywords:
         result = tools.get("search-by-keywords")(["DOCKER"])
         assert len(result) == 2
 
+    def test_file_matching_several_terms_returned_once(self, tools):
+        result = tools.get("search-by-keywords")(["docker", "container", "build"])
+        filenames = [r.filename for r in result]
+        assert sorted(filenames) == ["doc1.md", "doc3.md"]
+
+    def test_result_contains_full_keyword_list(self, tools):
+        result = tools.get("search-by-keywords")(["build"])
+        assert set(result[0].keywords) == {"build", "container", "docker"}
+
+    def test_more_matched_terms_rank_first(self, tools):
+        result = tools.get("search-by-keywords")(["docker", "linux"])
+        assert [r.filename for r in result] == ["doc3.md", "doc1.md"]
+        assert result[0].score > result[1].score
+
+    def test_rare_term_outweighs_common_term(self, tools):
+        # "build" kommt in einer Datei vor, "docker" in zweien
+        docker = tools.get("search-by-keywords")(["docker"])
+        build = tools.get("search-by-keywords")(["build"])
+        assert build[0].score > docker[0].score
+
+    def test_heading_keywords_rank_higher(self, tools, tmp_path):
+        with patch("db.DB_PATH", str(tmp_path / "test.db")), write_connection() as conn:
+            _write_entry(conn.cursor(), "doc4.md", "/p/doc4.md", 4.0, "# Python", "en", ["python"], ["python"])
+        result = tools.get("search-by-keywords")(["python"])
+        assert [r.filename for r in result] == ["doc4.md", "doc2.md"]
+
+    def test_limit_and_offset_page_through_results(self, tools):
+        first = tools.get("search-by-keywords")(["docker", "linux"], limit=1)
+        second = tools.get("search-by-keywords")(["docker", "linux"], limit=1, offset=1)
+        assert [r.filename for r in first] == ["doc3.md"]
+        assert [r.filename for r in second] == ["doc1.md"]
+        assert tools.get("search-by-keywords")(["docker"], offset=2) == []
+
+    def test_limit_is_capped(self, tools):
+        assert len(tools.get("search-by-keywords")(["docker"], limit=0)) == 1
+        assert len(tools.get("search-by-keywords")(["docker"], limit=10_000)) == 2
+
+    def test_keywords_can_be_omitted(self, tools):
+        result = tools.get("search-by-keywords")(["build"], include_keywords=False)
+        assert result[0].keywords == []
+        assert result[0].score is not None
+
 
 # ── list-all-files ────────────────────────────────────────────────────────────
 
@@ -130,6 +168,55 @@ class TestListAllKeywords:
         keys = list(result.keys())
         assert keys == sorted(keys)
 
+    def test_reads_precomputed_stats(self, tools, tmp_path):
+        # Die Zählung kommt aus keyword_stats, nicht aus der keywords-Spalte
+        conn = sqlite3.connect(str(tmp_path / "test.db"))
+        conn.execute("UPDATE files SET keywords = ''")
+        conn.commit()
+        conn.close()
+        assert tools.get("list-all-keywords")(language="de") == {"docker": 1, "linux": 1}
+
+
+# ── Cache für list-all-files / list-all-keywords ─────────────────────────────
+
+class TestOrientationCache:
+    def test_repeated_calls_do_not_touch_database(self, tools):
+        keywords = tools.get("list-all-keywords")()
+        files = tools.get("list-all-files")()
+        with patch("tools.get_read_connection", side_effect=AssertionError("DB-Zugriff")):
+            assert tools.get("list-all-keywords")() is keywords
+            assert tools.get("list-all-files")() is files
+
+    def test_cache_is_keyed_by_language(self, tools):
+        assert len(tools.get("list-all-files")(language="de")) == 1
+        assert len(tools.get("list-all-files")()) == 3
+
+    def test_new_generation_invalidates_cache(self, tools, tmp_path):
+        assert len(tools.get("list-all-files")()) == 3
+        with patch("db.DB_PATH", str(tmp_path / "test.db")), write_connection() as conn:
+            _write_entry(conn.cursor(), "doc4.md", "/p/doc4.md", 4.0, "Neu", "de", ["neu"])
+        assert len(tools.get("list-all-files")()) == 4
+        assert tools.get("list-all-keywords")()["neu"] == 1
+
+    def test_commit_of_indexer_process_invalidates_cache(self, tools, tmp_path):
+        # MCP_INDEXER_MODE=off: ein separat laufender Indexer meldet nichts per Pipe
+        assert len(tools.get("list-all-files")()) == 3
+        conn = sqlite3.connect(str(tmp_path / "test.db"))
+        conn.execute("DELETE FROM files WHERE filename = 'doc1.md'")
+        conn.execute("UPDATE index_generation SET generation = generation + 1")
+        conn.commit()
+        conn.close()
+        assert len(tools.get("list-all-files")()) == 2
+
+    def test_unchanged_generation_serves_stale_rows(self, tools, tmp_path):
+        assert len(tools.get("list-all-files")()) == 3
+        # Direkter Schreibzugriff am Indexer vorbei erhöht die Generation nicht
+        conn = sqlite3.connect(str(tmp_path / "test.db"))
+        conn.execute("DELETE FROM files WHERE filename = 'doc1.md'")
+        conn.commit()
+        conn.close()
+        assert len(tools.get("list-all-files")()) == 3
+
 
 # ── fulltext-search ───────────────────────────────────────────────────────────
 
@@ -166,10 +253,39 @@ class TestFulltextSearch:
         assert len(result) == 1
         assert result[0].filename == "doc3.md"
 
-    def test_sorted_by_match_count_descending(self, tools):
-        result = tools.get("fulltext-search")("Docker")
-        counts = [r.matches for r in result]
-        assert counts == sorted(counts, reverse=True)
+    def test_ranked_by_relevance(self, tmp_path):
+        db_path = str(tmp_path / "ranked.db")
+        with patch("db.DB_PATH", db_path):
+            init_db()
+        conn = sqlite3.connect(db_path)
+        cur = conn.cursor()
+        _write_entry(cur, "once.md", "/p/once.md", 1.0, "Kubernetes " + "filler text " * 50, "en", [])
+        _write_entry(cur, "often.md", "/p/often.md", 1.0, "Kubernetes and Kubernetes everywhere", "en", [])
+        conn.commit()
+        conn.close()
+
+        app = MockApp()
+        with patch("db.DB_PATH", db_path):
+            register_tools(app)
+            result = app.get("fulltext-search")("kubernetes")
+        assert [r.filename for r in result] == ["often.md", "once.md"]
+        assert result[0].matches == 2
+
+    def test_finds_substring_inside_word(self, tools):
+        result = tools.get("fulltext-search")("ontain")
+        assert [r.filename for r in result] == ["doc1.md"]
+
+    def test_two_character_query(self, tools):
+        result = tools.get("fulltext-search")("Py")
+        assert [r.filename for r in result] == ["doc2.md"]
+
+    def test_query_with_special_characters(self, tools):
+        result = tools.get("fulltext-search")('"great" for*')
+        assert result == []
+
+    def test_preview_contains_match(self, tools):
+        result = tools.get("fulltext-search")("Linux")
+        assert "Linux" in result[0].preview
 
 
 # ── get-file-by-name ──────────────────────────────────────────────────────────
@@ -206,7 +322,250 @@ class TestGetFileByName:
         conn.close()
 
         app = MockApp()
-        with patch("tools.DB_PATH", db_path):
+        with patch("db.DB_PATH", db_path):
+            init_db()
             register_tools(app)
             result = app.get("get-file-by-name")("ghost.md")
         assert "Fehler" in result
+
+    def test_reads_character_range(self, tools):
+        assert tools.get("get-file-by-name")("doc2.md", offset=7, length=2) == "is"
+
+    def test_reads_line_range(self, tools, tmp_path):
+        _add_structured_doc(tmp_path)
+        assert tools.get("get-file-by-name")("guide.md", start_line=3, end_line=4) == "Schritt eins\n## Nutzung\n"
+
+    def test_reads_section(self, tools, tmp_path):
+        _add_structured_doc(tmp_path)
+        assert tools.get("get-file-by-name")("guide.md", section=2) == "## Nutzung\nSchritt zwei\n"
+
+    def test_unknown_section_returns_error(self, tools, tmp_path):
+        _add_structured_doc(tmp_path)
+        result = tools.get("get-file-by-name")("guide.md", section=9)
+        assert "Fehler" in result
+        assert "get-file-info" in result
+
+    def test_ranges_work_for_entries_without_stored_content(self, tools, tmp_path):
+        md = tmp_path / "legacy.md"
+        md.write_text(GUIDE)
+        conn = sqlite3.connect(str(tmp_path / "test.db"))
+        conn.execute("INSERT INTO files (filename, path, mtime) VALUES ('legacy.md', ?, 1.0)", (str(md),))
+        conn.commit()
+        conn.close()
+        assert tools.get("get-file-by-name")("legacy.md", section=2) == "## Nutzung\nSchritt zwei\n"
+        assert tools.get("get-file-by-name")("legacy.md", start_line=3, end_line=3) == "Schritt eins\n"
+
+
+# ── Abschnitte ────────────────────────────────────────────────────────────────
+
+class TestSearchSections:
+    def test_returns_section_refs_ranked_by_matched_terms(self, tools, tmp_path):
+        _add_structured_doc(tmp_path)
+        result = tools.get("search-sections")(["schritt", "nutzung"])
+        assert [hit.ref for hit in result] == ["guide.md#2", "guide.md#1"]
+        assert result[0].heading == "Nutzung"
+        assert result[0].matched == ["nutzung", "schritt"]
+        assert result[0].uri == f"{CONTENT_PREFIX}guide.md/abschnitt/2"
+        assert result[0].length == len("## Nutzung\nSchritt zwei\n")
+
+    def test_ref_can_be_fetched_on_its_own(self, tools, tmp_path):
+        _add_structured_doc(tmp_path)
+        [hit] = tools.get("search-sections")(["vorwort"])
+        assert tools.get("get-file-by-name")(hit.ref) == "Vorwort\n"
+
+    def test_filters_by_language_and_pages(self, tools, tmp_path):
+        _add_structured_doc(tmp_path)
+        assert tools.get("search-sections")(["schritt"], language="en") == []
+        assert len(tools.get("search-sections")(["schritt"], limit=1, offset=1)) == 1
+
+    def test_unknown_terms_return_empty(self, tools):
+        assert tools.get("search-sections")(["nichts"]) == []
+
+
+class TestFulltextBySection:
+    def test_one_result_per_matching_section(self, tools, tmp_path):
+        _add_structured_doc(tmp_path)
+        result = tools.get("fulltext-search")("Schritt", by_section=True)
+        assert [(r.ref, r.heading, r.matches) for r in result] == [
+            ("guide.md#1", "Installation", 1), ("guide.md#2", "Nutzung", 1),
+        ]
+        assert "zwei" in result[1].preview
+
+    def test_short_query_by_section(self, tools, tmp_path):
+        _add_structured_doc(tmp_path)
+        result = tools.get("fulltext-search")("wo", by_section=True)
+        assert [r.ref for r in result] == ["guide.md#0"]
+
+    def test_file_named_with_hash_is_not_split(self, tools, tmp_path):
+        with patch("db.DB_PATH", str(tmp_path / "test.db")), write_connection() as conn:
+            _write_entry(conn.cursor(), "c#1", "/p/c#1", 1.0, "Raute", "de", [])
+        assert tools.get("get-file-by-name")("c#1") == "Raute"
+
+
+# ── semantic-search ───────────────────────────────────────────────────────────
+
+def _vector(*values: float) -> bytes:
+    vector = np.array(values, dtype=np.float32)
+    return (vector / np.linalg.norm(vector)).tobytes()
+
+
+def _index_new_doc(filename, vector):
+    """Schreibt eine Datei mit einem Abschnitt und bettet ihn wie der Indexer ein."""
+    with write_connection() as conn:
+        _write_entry(conn.cursor(), filename, f"/p/{filename}", 1.0, "Neu", "de", ["neu"], [], [["neu"]])
+    with patch("db.embeddings_enabled", return_value=True), \
+         patch("db.EMBEDDING_MODEL", "test-model"), \
+         patch("db.embed_texts", return_value=np.frombuffer(vector, dtype=np.float32)[None, :]), \
+         write_connection() as conn:
+        _update_vectors(conn, [filename])
+
+
+@pytest.fixture
+def semantic_tools(tmp_path):
+    db_path = str(tmp_path / "test.db")
+    _create_db(db_path)
+    _add_structured_doc(tmp_path)
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        "INSERT INTO section_vectors (filename, idx, language, model, vector) VALUES (?, ?, ?, ?, ?)",
+        [
+            ("guide.md", 0, "de", "test-model", _vector(1, 0, 0)),
+            ("guide.md", 1, "de", "test-model", _vector(0, 1, 0)),
+            ("guide.md", 2, "de", "test-model", _vector(0, 1, 1)),
+            ("doc1.md", 0, "en", "test-model", _vector(0, 0, 1)),
+            ("doc2.md", 0, "en", "other-model", _vector(0, 1, 0)),
+        ],
+    )
+    conn.commit()
+    conn.close()
+    app = MockApp()
+    with patch("db.DB_PATH", db_path), \
+         patch("tools.embeddings_enabled", return_value=True), \
+         patch("tools.shared_space", return_value=True), \
+         patch("tools.EMBEDDING_MODEL", "test-model"), \
+         patch("tools.embed_texts", return_value=np.array([[0, 1, 0.2]], dtype=np.float32)) as mock_embed:
+        register_tools(app)
+        yield app, mock_embed
+
+
+class TestSemanticSearch:
+    def test_not_registered_without_model(self, tools):
+        with pytest.raises(KeyError):
+            tools.get("semantic-search")
+
+    def test_returns_most_similar_sections(self, semantic_tools):
+        app, _ = semantic_tools
+        result = app.get("semantic-search")("Wie installiere ich das?", limit=2)
+        assert [hit.ref for hit in result] == ["guide.md#1", "guide.md#2"]
+        assert result[0].heading == "Installation"
+        assert result[0].uri == f"{CONTENT_PREFIX}guide.md/abschnitt/1"
+        assert result[0].score > result[1].score
+
+    def test_ignores_vectors_of_other_models(self, semantic_tools):
+        app, _ = semantic_tools
+        refs = {hit.ref for hit in app.get("semantic-search")("egal", limit=50)}
+        assert "doc2.md#0" not in refs
+        assert len(refs) == 4
+
+    def test_filters_by_language(self, semantic_tools):
+        app, _ = semantic_tools
+        result = app.get("semantic-search")("egal", language="en")
+        assert [hit.ref for hit in result] == ["doc1.md#0"]
+
+    def test_per_language_backend_searches_every_language(self, semantic_tools):
+        app, mock_embed = semantic_tools
+        # Kurze Anfragen erkennt langdetect oft falsch; die Suche darf davon nicht abhängen
+        assert detect_language("container restart") != "en"
+        vectors = {"en": _vector(0, 0, 1), "de": _vector(0, 1, 0)}
+        mock_embed.side_effect = lambda texts, language: np.frombuffer(vectors[language], dtype=np.float32)[None, :]
+        with patch("tools.shared_space", return_value=False):
+            result = app.get("semantic-search")("container restart", limit=2)
+        # Jede Sprache mit ihrem eigenen Modell, Treffer nach Score gemischt
+        assert {call.kwargs["language"] for call in mock_embed.call_args_list} == {"de", "en"}
+        assert [hit.ref for hit in result] == ["guide.md#1", "doc1.md#0"]
+        assert result[0].score == result[1].score == 1.0
+
+    def test_matrix_is_kept_without_changes(self, semantic_tools):
+        app, _ = semantic_tools
+        app.get("semantic-search")("egal")
+        with write_connection() as conn:
+            # Generation ändert sich, die Vektoren nicht
+            conn.execute("UPDATE files SET mtime = 6.0 WHERE filename = 'guide.md'")
+        with patch("tools._load_vectors", side_effect=AssertionError("neu geladen")):
+            assert app.get("semantic-search")("egal")
+
+    def test_reloads_only_changed_files(self, semantic_tools):
+        app, _ = semantic_tools
+        app.get("semantic-search")("egal")
+        _index_new_doc("new.md", _vector(0, 1, 0.2))
+        with patch("tools._load_vectors", wraps=tools_module._load_vectors) as load:
+            result = app.get("semantic-search")("egal", limit=1)
+        load.assert_called_once_with(None, ["new.md"])
+        assert [hit.ref for hit in result] == ["new.md#0"]
+
+    def test_drops_sections_of_removed_files(self, semantic_tools):
+        app, _ = semantic_tools
+        assert app.get("semantic-search")("egal", limit=1)[0].filename == "guide.md"
+        with write_connection() as conn:
+            remove_file_entry(conn.cursor(), "guide.md")
+        result = app.get("semantic-search")("egal")
+        assert [hit.ref for hit in result] == ["doc1.md#0"]
+
+    def test_reloads_everything_after_log_was_pruned(self, semantic_tools):
+        app, _ = semantic_tools
+        app.get("semantic-search")("egal")
+        _index_new_doc("new.md", _vector(0, 1, 0.2))
+        _index_new_doc("other.md", _vector(1, 0, 0))
+        with write_connection() as conn:
+            # Wie update_file_entries: nur die jüngsten Einträge bleiben
+            conn.execute("DELETE FROM vector_changes WHERE seq < (SELECT max(seq) FROM vector_changes)")
+        with patch("tools._load_vectors", wraps=tools_module._load_vectors) as load:
+            result = app.get("semantic-search")("egal", limit=1)
+        load.assert_called_once_with(None)
+        assert [hit.ref for hit in result] == ["new.md#0"]
+
+    def test_reuses_slots_of_replaced_sections(self, semantic_tools):
+        app, _ = semantic_tools
+        app.get("semantic-search")("egal")
+        _index_new_doc("new.md", _vector(1, 0, 0))
+        app.get("semantic-search")("egal")
+        _index_new_doc("new.md", _vector(0, 1, 0.2))
+        result = app.get("semantic-search")("egal")
+        assert result[0].ref == "new.md#0"
+        assert [hit.ref for hit in result].count("new.md#0") == 1
+
+
+# ── get-file-info ─────────────────────────────────────────────────────────────
+
+GUIDE = "Vorwort\n# Installation\nSchritt eins\n## Nutzung\nSchritt zwei\n"
+
+
+def _add_structured_doc(tmp_path):
+    with patch("db.DB_PATH", str(tmp_path / "test.db")), write_connection() as conn:
+        _write_entry(
+            conn.cursor(), "guide.md", "/p/guide.md", 5.0, GUIDE, "de",
+            ["installation", "nutzung", "schritt", "vorwort"], ["installation", "nutzung"],
+            [["vorwort"], ["installation", "schritt"], ["nutzung", "schritt"]],
+        )
+
+
+class TestGetFileInfo:
+    def test_reports_size_and_sections(self, tools, tmp_path):
+        _add_structured_doc(tmp_path)
+        info = tools.get("get-file-info")("guide.md")
+        assert info.size == len(GUIDE)
+        assert info.lines == 5
+        assert [(s.heading, s.level, s.start_line, s.end_line) for s in info.sections] == [
+            ("", 0, 1, 1), ("Installation", 1, 2, 3), ("Nutzung", 2, 4, 5),
+        ]
+
+    def test_section_offsets_match_content(self, tools, tmp_path):
+        _add_structured_doc(tmp_path)
+        info = tools.get("get-file-info")("guide.md")
+        section = info.sections[1]
+        assert tools.get("get-file-by-name")("guide.md", offset=section.offset, length=section.length) == \
+            "# Installation\nSchritt eins\n"
+
+    def test_returns_error_for_unknown_file(self, tools):
+        result = tools.get("get-file-info")("missing.md")
+        assert "Fehler" in result
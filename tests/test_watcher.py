@@ -0,0 +1,93 @@
+# tests/test_watcher.py
+
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from watcher import FileWatcher, watch_available
+
+
+def _event(event_type: str, src: str, dest: str = "", is_directory: bool = False):
+    return SimpleNamespace(event_type=event_type, src_path=src, dest_path=dest, is_directory=is_directory)
+
+
+# ── handle_event ──────────────────────────────────────────────────────────────
+
+class TestHandleEvent:
+    def test_queues_modified_markdown_file(self):
+        watcher = FileWatcher("/md", debounce=0)
+        watcher.handle_event(_event("modified", "/md/a.md"))
+        assert watcher.wait_for_changes(0) == {"/md/a.md"}
+
+    def test_ignores_non_markdown_files(self):
+        watcher = FileWatcher("/md", debounce=0)
+        watcher.handle_event(_event("created", "/md/image.png"))
+        assert watcher.wait_for_changes(0) == set()
+
+    def test_moved_file_queues_source_and_destination(self):
+        watcher = FileWatcher("/md", debounce=0)
+        watcher.handle_event(_event("moved", "/md/old.md", "/md/new.md"))
+        assert watcher.wait_for_changes(0) == {"/md/old.md", "/md/new.md"}
+
+    def test_queues_deleted_directory(self):
+        watcher = FileWatcher("/md", debounce=0)
+        watcher.handle_event(_event("deleted", "/md/sub", is_directory=True))
+        assert watcher.wait_for_changes(0) == {"/md/sub"}
+
+    def test_ignores_directory_modification(self):
+        watcher = FileWatcher("/md", debounce=0)
+        watcher.handle_event(_event("modified", "/md/sub", is_directory=True))
+        assert watcher.wait_for_changes(0) == set()
+
+    def test_uses_accept_predicate(self):
+        watcher = FileWatcher(["/md", "/src"], debounce=0, accept=lambda path, is_dir: path.endswith(".txt"))
+        watcher.handle_event(_event("modified", "/src/a.txt"))
+        watcher.handle_event(_event("modified", "/src/a.md"))
+        assert watcher.wait_for_changes(0) == {"/src/a.txt"}
+
+    def test_ignores_open_and_close_events(self):
+        watcher = FileWatcher("/md", debounce=0)
+        watcher.handle_event(_event("closed", "/md/a.md"))
+        watcher.handle_event(_event("opened", "/md/a.md"))
+        assert watcher.wait_for_changes(0) == set()
+
+
+# ── wait_for_changes ──────────────────────────────────────────────────────────
+
+class TestWaitForChanges:
+    def test_returns_empty_after_timeout(self):
+        watcher = FileWatcher("/md", debounce=0.01)
+        start = time.monotonic()
+        assert watcher.wait_for_changes(0.05) == set()
+        assert time.monotonic() - start >= 0.05
+
+    def test_holds_back_paths_within_debounce_window(self):
+        watcher = FileWatcher("/md", debounce=10)
+        watcher.notify("/md/a.md")
+        assert watcher.wait_for_changes(0.05) == set()
+
+    def test_releases_path_after_debounce(self):
+        watcher = FileWatcher("/md", debounce=0.05)
+        watcher.notify("/md/a.md")
+        assert watcher.wait_for_changes(1) == {"/md/a.md"}
+
+    def test_repeated_events_are_coalesced(self):
+        watcher = FileWatcher("/md", debounce=0.05)
+        for _ in range(5):
+            watcher.notify("/md/a.md")
+        assert watcher.wait_for_changes(1) == {"/md/a.md"}
+        assert watcher.wait_for_changes(0.1) == set()
+
+
+@pytest.mark.skipif(not watch_available(), reason="watchdog nicht installiert")
+class TestObserver:
+    def test_detects_new_file(self, tmp_path):
+        watcher = FileWatcher(str(tmp_path), debounce=0.05)
+        assert watcher.start()
+        try:
+            (tmp_path / "new.md").write_text("# Neu")
+            changed = watcher.wait_for_changes(5)
+        finally:
+            watcher.stop()
+        assert str(tmp_path / "new.md") in changed
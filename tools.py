@@ -2,12 +2,32 @@
 
 from dataclasses import dataclass, field
 from typing import Annotated
-import sqlite3
+import math
+import threading
 
-from config import DB_PATH
+import numpy as np
+
+from config import EMBEDDING_MODEL
+from db import (
+    current_generation, document_info, get_read_connection, read_document, read_document_lines, read_document_section,
+)
+from embeddings import embed_texts, embeddings_enabled, shared_space, top_k
+from layout import document_layout
 
 CONTENT_PREFIX = "markdowndatei://"
 
+# Der Trigramm-Tokenizer von FTS5 kann erst ab 3 Zeichen über den Index suchen
+_TRIGRAM_MIN_LENGTH = 3
+# Stichwörter aus Überschriften zählen bei der Keyword-Suche doppelt
+_HEADING_BOOST = 2.0
+# Standard- und Höchstzahl der Treffer pro Seite der Keyword-Suche
+_DEFAULT_LIMIT = 20
+_MAX_LIMIT = 200
+# Dateien pro Abfrage beim Nachladen geänderter Abschnittsvektoren
+_VECTOR_FILE_CHUNK = 500
+# Die Vektormatrix wird erst verdichtet, wenn mehr freie Zeilen als diese (und als belegte) anfallen
+_VECTOR_COMPACT_MIN = 1024
+
 
 @dataclass
 class MarkdownFile:
@@ -16,6 +36,10 @@ class MarkdownFile:
     uri: str = field(metadata={"description": "schema:url – URI zum direkten Abruf des Inhalts"})
     keywords: list[str] = field(metadata={"description": "schema:keywords – Automatisch extrahierte Stichwörter"})
     language: str = field(metadata={"description": "schema:inLanguage – Erkannte Sprache (ISO-639-1, z.B. 'en', 'de')"})
+    score: float | None = field(
+        default=None,
+        metadata={"description": "Relevanz des Treffers (Summe der IDF-Gewichte der gefundenen Stichwörter)"},
+    )
 
 
 @dataclass
@@ -23,17 +47,376 @@ class SearchResult:
     """Ergebnis einer schema:SearchAction – Volltextsuche-Treffer mit Kontext."""
     filename: str = field(metadata={"description": "schema:name – Dateiname des Treffers"})
     matches: int = field(metadata={"description": "schema:resultCount – Anzahl der Treffer in dieser Datei"})
-    preview: str = field(metadata={"description": "schema:description – Textausschnitt mit dem ersten Treffer"})
+    preview: str = field(metadata={"description": "schema:description – Textausschnitt rund um einen Treffer"})
+    ref: str | None = field(
+        default=None,
+        metadata={"description": "Verweis 'dateiname#abschnitt' (nur bei by_section), direkt mit get-file-by-name abrufbar"},
+    )
+    heading: str | None = field(
+        default=None,
+        metadata={"description": "schema:headline – Überschrift des Abschnitts (nur bei by_section)"},
+    )
+
+
+@dataclass
+class SectionHit:
+    """schema:WebPageElement – Ein Abschnitt, dessen Stichwörter zur Suche passen."""
+    ref: str = field(metadata={"description": "Verweis 'dateiname#abschnitt', direkt mit get-file-by-name abrufbar"})
+    filename: str = field(metadata={"description": "schema:name – Dateiname des Dokuments"})
+    section: int = field(metadata={"description": "Index des Abschnitts im Dokument"})
+    heading: str = field(metadata={"description": "schema:headline – Überschrift des Abschnitts (leer für den Text davor)"})
+    uri: str = field(metadata={"description": "schema:url – URI zum direkten Abruf des Abschnitts"})
+    length: int = field(metadata={"description": "Länge des Abschnitts in Zeichen"})
+    score: float = field(metadata={"description": "Relevanz des Treffers (IDF-Summe bzw. Kosinus-Ähnlichkeit)"})
+    matched: list[str] = field(
+        default_factory=list,
+        metadata={"description": "schema:keywords – Gefundene Suchbegriffe in diesem Abschnitt (nur Stichwortsuche)"},
+    )
+
+
+@dataclass
+class DocumentSection:
+    """schema:WebPageElement – Ein Abschnitt eines Dokuments (ab einer Überschrift bis zur nächsten)."""
+    index: int = field(metadata={"description": "Index des Abschnitts für get-file-by-name(section=...)"})
+    heading: str = field(metadata={"description": "schema:headline – Text der Überschrift (leer für den Text davor)"})
+    level: int = field(metadata={"description": "Überschriften-Ebene (1 für #, 2 für ##, …; 0 ohne Überschrift)"})
+    start_line: int = field(metadata={"description": "Erste Zeile des Abschnitts (ab 1)"})
+    end_line: int = field(metadata={"description": "Letzte Zeile des Abschnitts (inklusive)"})
+    offset: int = field(metadata={"description": "Zeichen-Offset des Abschnitts im Dokument (ab 0)"})
+    length: int = field(metadata={"description": "Länge des Abschnitts in Zeichen"})
+
+
+@dataclass
+class FileInfo:
+    """schema:DigitalDocument – Umfang und Gliederung eines Dokuments, ohne dessen Inhalt."""
+    filename: str = field(metadata={"description": "schema:name – Dateiname inkl. .md Endung"})
+    size: int = field(metadata={"description": "schema:contentSize – Länge des Inhalts in Zeichen"})
+    lines: int = field(metadata={"description": "Anzahl der Zeilen"})
+    sections: list[DocumentSection] = field(metadata={"description": "schema:hasPart – Abschnitte des Dokuments"})
+
+
+def _fts_phrase(query: str) -> str:
+    """Maskiert einen Suchbegriff als FTS5-Phrase, damit Sonderzeichen wörtlich gesucht werden."""
+    return '"' + query.replace('"', '""') + '"'
+
+
+def _keyword_weights(cursor, terms: list[str], lang_filter: str | None) -> list[tuple[str, float, float]]:
+    """IDF-Gewicht je Suchbegriff aus keyword_stats: [(term, gewicht, gewicht_in_überschrift), ...].
+    idf = ln((N + 1) / (df + 1)) + 1 – seltene Stichwörter zählen mehr als häufige.
+    N stammt aus language_stats, damit auch der Sprachfilter keinen Tabellenscan kostet.
+    """
+    placeholders = ",".join("?" * len(terms))
+    if lang_filter:
+        cursor.execute("SELECT coalesce(SUM(doc_count), 0) FROM language_stats WHERE language = ?", (lang_filter,))
+        total = cursor.fetchone()[0]
+        cursor.execute(
+            f"SELECT term, doc_count FROM keyword_stats WHERE language = ? AND term IN ({placeholders})",
+            [lang_filter, *terms],
+        )
+    else:
+        cursor.execute("SELECT coalesce(SUM(doc_count), 0) FROM language_stats")
+        total = cursor.fetchone()[0]
+        cursor.execute(
+            f"SELECT term, SUM(doc_count) FROM keyword_stats WHERE term IN ({placeholders}) GROUP BY term",
+            terms,
+        )
+    weights = []
+    for term, doc_count in cursor.fetchall():
+        idf = math.log((total + 1) / (doc_count + 1)) + 1
+        weights.append((term, idf, idf * _HEADING_BOOST))
+    return weights
+
+
+def _read_from_disk(filename: str, path: str) -> tuple[str | None, str | None]:
+    """Fallback für alte Einträge ohne gespeicherten Inhalt: (Text, Fehlermeldung)."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read(), None
+    except FileNotFoundError:
+        return None, f"Fehler: Die Datei '{filename}' wurde aus dem Dateisystem entfernt."
+    except Exception as e:
+        return None, f"Fehler beim Lesen der Datei: {e}"
+
+
+def _select_text(
+    text: str,
+    offset: int,
+    length: int | None,
+    start_line: int | None,
+    end_line: int | None,
+    section: int | None,
+) -> str | None:
+    """Wählt den angefragten Bereich aus einem bereits geladenen Text (wie die read_document*-Funktionen)."""
+    if section is not None:
+        sections, _ = document_layout(text)
+        if not 0 <= section < len(sections):
+            return None
+        start, size = sections[section][4:6]
+        return text[start:start + size]
+    if start_line is not None or end_line is not None:
+        return "".join(text.splitlines(keepends=True)[max(1, start_line or 1) - 1:end_line])
+    return text[offset:] if length is None else text[offset:offset + length]
+
+
+def _section_ref(filename: str, section: int) -> str:
+    """Verweis auf einen Abschnitt, den get-file-by-name direkt auflösen kann."""
+    return f"{filename}#{section}"
+
+
+def _split_ref(filename: str) -> tuple[str, int | None]:
+    """Zerlegt 'dateiname#abschnitt' in Dateiname und Abschnittsindex."""
+    base, separator, suffix = filename.rpartition("#")
+    if separator and suffix.isdigit():
+        return base, int(suffix)
+    return filename, None
+
+
+def _section_results(filename: str, content: str, query_lower: str) -> list["SearchResult"]:
+    """Verteilt die Treffer eines Dokuments auf seine Abschnitte (ein Ergebnis je Abschnitt mit Treffern)."""
+    results = []
+    for idx, (heading, _, _, _, start, length) in enumerate(document_layout(content)[0]):
+        section_text = content[start:start + length]
+        matches = section_text.lower().count(query_lower)
+        if matches:
+            results.append(SearchResult(
+                filename=filename,
+                matches=matches,
+                preview=_preview(section_text, query_lower).replace("\n", " "),
+                ref=_section_ref(filename, idx),
+                heading=heading,
+            ))
+    return results
+
+
+def _preview(content: str, query_lower: str) -> str:
+    """Erzeugt einen Textausschnitt rund um den ersten Treffer."""
+    idx = content.lower().find(query_lower)
+    if idx < 0:
+        return ""
+    start = max(0, idx - 50)
+    end = min(len(content), idx + len(query_lower) + 50)
+    preview = content[start:end]
+    if start > 0:
+        preview = "..." + preview
+    if end < len(content):
+        preview = preview + "..."
+    return preview
+
+
+class _GenerationCache:
+    """In-Process-Cache für Orientierungsabfragen (list-all-files, list-all-keywords).
+    Einträge gelten, solange sich die Index-Generation (db.current_generation) nicht
+    ändert; jeder Commit mit geänderten Dateien erhöht sie (auch aus anderen Prozessen).
+    Die gecachten Objekte werden geteilt und dürfen nicht verändert werden.
+    """
+
+    def __init__(self):
+        self._generation: int | None = None
+        self._entries: dict = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, compute):
+        generation = current_generation()
+        if generation is None:
+            return compute()
+        with self._lock:
+            if generation != self._generation:
+                self._entries.clear()
+                self._generation = generation
+            if key in self._entries:
+                return self._entries[key]
+        value = compute()
+        with self._lock:
+            # Nur speichern, wenn der Index während der Berechnung nicht geändert wurde
+            if current_generation() == generation == self._generation:
+                self._entries[key] = value
+        return value
+
+
+def _load_all_files(lang_filter: str | None) -> list[MarkdownFile]:
+    """Liest alle Dateien (optional nach Sprache gefiltert) aus der Datenbank."""
+    cursor = get_read_connection().cursor()
+    cursor.execute("SELECT filename, keywords, language FROM files")
+    rows = cursor.fetchall()
+
+    files = []
+    for filename, keyword_str, file_lang in rows:
+        if lang_filter and (file_lang or "unknown") != lang_filter:
+            continue
+        keywords = [kw.strip() for kw in keyword_str.split(",")] if keyword_str else []
+        files.append(
+            MarkdownFile(
+                filename=filename,
+                uri=f"{CONTENT_PREFIX}{filename}",
+                keywords=keywords,
+                language=file_lang or "unknown"
+            )
+        )
+
+    return files
+
+
+def _load_vectors(lang_filter: str | None, filenames: list[str] | None = None) -> list[tuple]:
+    """Liest die Abschnittsvektoren (optional nur der angegebenen Dateien):
+    [(filename, idx, heading, length, vector), ...].
+    """
+    sql = """
+        SELECT v.filename, v.idx, s.heading, s.length, v.vector
+        FROM section_vectors v JOIN sections s ON s.filename = v.filename AND s.idx = v.idx
+        WHERE v.model = ?
+    """
+    params: list = [EMBEDDING_MODEL]
+    if lang_filter:
+        sql += " AND v.language = ?"
+        params.append(lang_filter)
+    cursor = get_read_connection().cursor()
+    if filenames is None:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+    rows = []
+    for start in range(0, len(filenames), _VECTOR_FILE_CHUNK):
+        chunk = filenames[start:start + _VECTOR_FILE_CHUNK]
+        cursor.execute(f"{sql} AND v.filename IN ({','.join('?' * len(chunk))})", [*params, *chunk])
+        rows.extend(cursor.fetchall())
+    return rows
+
+
+def _indexed_languages() -> list[str]:
+    """Sprachen der indexierten Dokumente (aus language_stats)."""
+    cursor = get_read_connection().cursor()
+    cursor.execute("SELECT language FROM language_stats ORDER BY language")
+    return [row[0] for row in cursor.fetchall()]
+
+
+class _VectorIndex:
+    """Abschnittsvektoren eines Sprachfilters als Matrix im Speicher (eine Zeile je Abschnitt).
+    Geladen wird einmal vollständig; danach ersetzt refresh() nur die Dateien, die das
+    Änderungsprotokoll (vector_changes) seitdem nennt. Frei gewordene Zeilen werden genullt
+    und wiederverwendet, die Matrix wächst in Verdopplungsschritten.
+    """
+
+    def __init__(self, lang_filter: str | None):
+        self.lang_filter = lang_filter
+        self.lock = threading.Lock()
+        # Zuletzt übernommener Eintrag des Änderungsprotokolls (None = noch nicht geladen)
+        self._seq: int | None = None
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._size = 0
+        self._rows: list[tuple | None] = []
+        self._slots: dict[str, list[int]] = {}
+        self._free: list[int] = []
+
+    def __len__(self) -> int:
+        return self._size - len(self._free)
+
+    @property
+    def dimension(self) -> int:
+        return self._matrix.shape[1]
+
+    def refresh(self):
+        """Übernimmt Änderungen seit dem letzten Aufruf (Aufrufer hält self.lock)."""
+        cursor = get_read_connection().cursor()
+        cursor.execute("SELECT coalesce(min(seq), 1), coalesce(max(seq), 0) FROM vector_changes")
+        first, last = cursor.fetchone()
+        if self._seq is not None and self._seq == last:
+            return
+        if self._seq is None or self._seq < first - 1:
+            # Erster Aufruf oder Protokoll seit dem letzten Stand gekürzt → vollständig laden
+            self._reset()
+            self._add(_load_vectors(self.lang_filter))
+        else:
+            cursor.execute("SELECT DISTINCT filename FROM vector_changes WHERE seq > ? AND seq <= ?", (self._seq, last))
+            changed = [row[0] for row in cursor.fetchall()]
+            self._remove(changed)
+            self._add(_load_vectors(self.lang_filter, changed))
+        self._seq = last
+
+    def search(self, query_vector: np.ndarray, k: int) -> list[tuple[tuple, float]]:
+        """Die k ähnlichsten Abschnitte als [((filename, idx, heading, length), score), ...] (Aufrufer hält self.lock)."""
+        # Freie (genullte) Zeilen können unter den Treffern sein und werden übersprungen
+        ranked = top_k(self._matrix[:self._size], query_vector, k + len(self._free))
+        hits = []
+        for row, score in ranked:
+            section = self._rows[row]
+            if section is not None:
+                hits.append((section, score))
+        return hits[:k]
+
+    def _reset(self):
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._size = 0
+        self._rows, self._slots, self._free = [], {}, []
+
+    def _remove(self, filenames: list[str]):
+        for filename in filenames:
+            for slot in self._slots.pop(filename, ()):
+                self._matrix[slot] = 0
+                self._rows[slot] = None
+                self._free.append(slot)
+        if len(self._free) > max(_VECTOR_COMPACT_MIN, self._size // 2):
+            self._compact()
+
+    def _add(self, rows: list[tuple]):
+        if not rows:
+            return
+        vectors = np.frombuffer(b"".join(row[4] for row in rows), dtype=np.float32).reshape(len(rows), -1)
+        if self._size and vectors.shape[1] != self.dimension:
+            # Anderes Modell in der Datenbank: die alte Matrix ist nicht mehr vergleichbar
+            self._reset()
+        reused = [self._free.pop() for _ in range(min(len(self._free), len(rows)))]
+        appended = list(range(self._size, self._size + len(rows) - len(reused)))
+        self._reserve(self._size + len(appended), vectors.shape[1])
+        self._size += len(appended)
+        self._rows.extend([None] * len(appended))
+        slots = reused + appended
+        self._matrix[slots] = vectors
+        for slot, row in zip(slots, rows, strict=True):
+            self._rows[slot] = row[:4]
+            self._slots.setdefault(row[0], []).append(slot)
+
+    def _reserve(self, size: int, dimension: int):
+        if size <= self._matrix.shape[0] and dimension == self.dimension:
+            return
+        matrix = np.zeros((max(size, 2 * self._matrix.shape[0]), dimension), dtype=np.float32)
+        if self._size:
+            matrix[:self._size] = self._matrix[:self._size]
+        self._matrix = matrix
+
+    def _compact(self):
+        keep = [slot for slot in range(self._size) if self._rows[slot] is not None]
+        self._matrix = self._matrix[keep]
+        self._rows = [self._rows[slot] for slot in keep]
+        self._size = len(keep)
+        self._free = []
+        self._slots = {}
+        for slot, row in enumerate(self._rows):
+            if row is not None:
+                self._slots.setdefault(row[0], []).append(slot)
+
+
+def _load_keyword_counts(lang_filter: str | None) -> dict[str, int]:
+    """Liest, in wie vielen Dateien jedes Stichwort vorkommt (aus keyword_stats)."""
+    cursor = get_read_connection().cursor()
+    if lang_filter:
+        cursor.execute(
+            "SELECT term, doc_count FROM keyword_stats WHERE language = ? ORDER BY term",
+            (lang_filter,),
+        )
+    else:
+        cursor.execute("SELECT term, SUM(doc_count) FROM keyword_stats GROUP BY term ORDER BY term")
+    return dict(cursor.fetchall())
 
 
 def register_tools(app):
     """Registriert alle Tools bei der FastMCP-App."""
+    cache = _GenerationCache()
 
     @app.tool(
         name="search-by-keywords",
         description="schema:SearchAction – Sucht schema:DigitalDocument anhand von schema:keywords. "
-                    "Gibt Dokumente zurück, deren extrahierte Stichwörter mindestens einen der Suchbegriffe enthalten. "
-                    "Optional filterbar nach schema:inLanguage."
+                    "Gibt Dokumente zurück, deren extrahierte Stichwörter mindestens einen der Suchbegriffe enthalten, "
+                    "sortiert nach Relevanz (seltene Begriffe und Treffer in Überschriften zählen mehr). "
+                    "Seitenweise abrufbar über limit/offset. Optional filterbar nach schema:inLanguage."
     )
     def search_by_keywords(
         keywords: Annotated[
@@ -43,39 +426,142 @@ def register_tools(app):
         language: Annotated[
             str | None,
             "ISO-639-1 Sprachfilter, z.B. 'de' oder 'en'. Wenn nicht angegeben, werden alle Sprachen durchsucht."
-        ] = None
+        ] = None,
+        limit: Annotated[
+            int,
+            f"Maximale Anzahl Treffer (1–{_MAX_LIMIT})"
+        ] = _DEFAULT_LIMIT,
+        offset: Annotated[
+            int,
+            "Anzahl übersprungener Treffer für die nächste Seite"
+        ] = 0,
+        include_keywords: Annotated[
+            bool,
+            "Vollständige Stichwortliste je Treffer mitliefern (False hält die Antwort klein)"
+        ] = True,
     ) -> list[MarkdownFile]:
         if not keywords:
             return []
 
-        query_keywords = set(kw.strip().lower() for kw in keywords)
+        query_keywords = sorted({kw.strip().lower() for kw in keywords if kw.strip()})
+        if not query_keywords:
+            return []
         lang_filter = language.strip().lower() if language else None
+        limit = max(1, min(limit, _MAX_LIMIT))
+        offset = max(0, offset)
+
+        cursor = get_read_connection().cursor()
+        weights = _keyword_weights(cursor, query_keywords, lang_filter)
+        if not weights:
+            return []
 
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("SELECT filename, keywords, language FROM files")
+        # Bewertung, Sortierung und Seitenauswahl laufen in SQLite; nur die Seite wird geladen
+        values = ",".join("(?, ?, ?)" for _ in weights)
+        sql = f"""
+            WITH weights (term, weight, heading_weight) AS (VALUES {values})
+            SELECT f.filename, f.keywords, f.language,
+                   SUM(CASE WHEN k.in_heading THEN w.heading_weight ELSE w.weight END) AS score
+            FROM weights w
+            JOIN keywords k ON k.term = w.term
+            JOIN files f ON f.filename = k.filename
+        """
+        params: list = [value for weight in weights for value in weight]
+        if lang_filter:
+            sql += " WHERE k.language = ?"
+            params.append(lang_filter)
+        sql += " GROUP BY f.filename ORDER BY score DESC, f.filename LIMIT ? OFFSET ?"
+        params += [limit, offset]
+
+        cursor.execute(sql, params)
         rows = cursor.fetchall()
-        conn.close()
 
         matched = []
-        for filename, keyword_str, file_lang in rows:
-            if not keyword_str:
-                continue
-            if lang_filter and (file_lang or "unknown") != lang_filter:
-                continue
-            file_keywords = set(kw.strip().lower() for kw in keyword_str.split(","))
-            if query_keywords & file_keywords:
-                matched.append(
-                    MarkdownFile(
-                        filename=filename,
-                        uri=f"{CONTENT_PREFIX}{filename}",
-                        keywords=list(file_keywords),
-                        language=file_lang or "unknown"
-                    )
+        for filename, keyword_str, file_lang, score in rows:
+            file_keywords = []
+            if include_keywords and keyword_str:
+                file_keywords = sorted({kw.strip().lower() for kw in keyword_str.split(",")})
+            matched.append(
+                MarkdownFile(
+                    filename=filename,
+                    uri=f"{CONTENT_PREFIX}{filename}",
+                    keywords=file_keywords,
+                    language=file_lang or "unknown",
+                    score=round(score, 4),
                 )
+            )
 
         return matched
 
+    @app.tool(
+        name="search-sections",
+        description="schema:SearchAction – Sucht einzelne Abschnitte (ab einer Überschrift bis zur nächsten) "
+                    "von schema:DigitalDocument anhand von schema:keywords. "
+                    "Liefert Verweise 'dateiname#abschnitt', die mit get-file-by-name einzeln gelesen werden können, "
+                    "statt ganze Dokumente zu laden. Sortiert nach Relevanz, seitenweise über limit/offset."
+    )
+    def search_sections(
+        keywords: Annotated[
+            list[str],
+            "Suchbegriffe, z.B. ['docker', 'netzwerk']"
+        ],
+        language: Annotated[
+            str | None,
+            "ISO-639-1 Sprachfilter, z.B. 'de' oder 'en'. Wenn nicht angegeben, werden alle Sprachen durchsucht."
+        ] = None,
+        limit: Annotated[
+            int,
+            f"Maximale Anzahl Treffer (1–{_MAX_LIMIT})"
+        ] = _DEFAULT_LIMIT,
+        offset: Annotated[
+            int,
+            "Anzahl übersprungener Treffer für die nächste Seite"
+        ] = 0,
+    ) -> list[SectionHit]:
+        query_keywords = sorted({kw.strip().lower() for kw in keywords if kw.strip()})
+        if not query_keywords:
+            return []
+        lang_filter = language.strip().lower() if language else None
+        limit = max(1, min(limit, _MAX_LIMIT))
+        offset = max(0, offset)
+
+        cursor = get_read_connection().cursor()
+        weights = _keyword_weights(cursor, query_keywords, lang_filter)
+        if not weights:
+            return []
+
+        values = ",".join("(?, ?)" for _ in weights)
+        sql = f"""
+            WITH weights (term, weight) AS (VALUES {values})
+            SELECT k.filename, k.idx, s.heading, s.length, group_concat(k.term), SUM(w.weight) AS score
+            FROM weights w
+            JOIN section_keywords k ON k.term = w.term
+            JOIN sections s ON s.filename = k.filename AND s.idx = k.idx
+        """
+        params: list = [value for term, weight, _ in weights for value in (term, weight)]
+        if lang_filter:
+            sql += " WHERE k.language = ?"
+            params.append(lang_filter)
+        sql += " GROUP BY k.filename, k.idx ORDER BY score DESC, k.filename, k.idx LIMIT ? OFFSET ?"
+        params += [limit, offset]
+
+        cursor.execute(sql, params)
+        return [
+            SectionHit(
+                ref=_section_ref(filename, idx),
+                filename=filename,
+                section=idx,
+                heading=heading,
+                uri=f"{CONTENT_PREFIX}{filename}/abschnitt/{idx}",
+                length=length,
+                matched=sorted(terms.split(",")),
+                score=round(score, 4),
+            )
+            for filename, idx, heading, length, terms, score in cursor.fetchall()
+        ]
+
+    if embeddings_enabled():
+        _register_semantic_search(app)
+
     @app.tool(
         name="list-all-files",
         description="schema:DiscoverAction – Gibt eine schema:ItemList aller indexierten schema:DigitalDocument zurück, "
@@ -89,28 +575,7 @@ def register_tools(app):
         ] = None
     ) -> list[MarkdownFile]:
         lang_filter = language.strip().lower() if language else None
-
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("SELECT filename, keywords, language FROM files")
-        rows = cursor.fetchall()
-        conn.close()
-
-        files = []
-        for filename, keyword_str, file_lang in rows:
-            if lang_filter and (file_lang or "unknown") != lang_filter:
-                continue
-            keywords = [kw.strip() for kw in keyword_str.split(",")] if keyword_str else []
-            files.append(
-                MarkdownFile(
-                    filename=filename,
-                    uri=f"{CONTENT_PREFIX}{filename}",
-                    keywords=keywords,
-                    language=file_lang or "unknown"
-                )
-            )
-
-        return files
+        return cache.get(("files", lang_filter), lambda: _load_all_files(lang_filter))
 
     @app.tool(
         name="list-all-keywords",
@@ -125,30 +590,14 @@ def register_tools(app):
         ] = None
     ) -> dict[str, int]:
         lang_filter = language.strip().lower() if language else None
-
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("SELECT keywords, language FROM files")
-        rows = cursor.fetchall()
-        conn.close()
-
-        keyword_counts: dict[str, int] = {}
-        for keyword_str, file_lang in rows:
-            if not keyword_str:
-                continue
-            if lang_filter and (file_lang or "unknown") != lang_filter:
-                continue
-            for kw in keyword_str.split(","):
-                kw = kw.strip().lower()
-                if kw:
-                    keyword_counts[kw] = keyword_counts.get(kw, 0) + 1
-
-        return dict(sorted(keyword_counts.items()))
+        return cache.get(("keywords", lang_filter), lambda: _load_keyword_counts(lang_filter))
 
     @app.tool(
         name="fulltext-search",
         description="schema:SearchAction – Durchsucht schema:text aller schema:DigitalDocument nach einem Textbegriff. "
                     "Findet auch Codebeispiele, URLs und Konfigurationswerte, die nicht als schema:keywords extrahiert werden. "
+                    "Treffer sind nach Relevanz (BM25) sortiert. "
+                    "Mit by_section=True wird je Abschnitt ein Treffer mit Verweis 'dateiname#abschnitt' geliefert. "
                     "Optional filterbar nach schema:inLanguage."
     )
     def fulltext_search(
@@ -159,83 +608,238 @@ def register_tools(app):
         language: Annotated[
             str | None,
             "ISO-639-1 Sprachfilter, z.B. 'de' oder 'en'. Wenn nicht angegeben, werden alle Sprachen durchsucht."
-        ] = None
+        ] = None,
+        by_section: Annotated[
+            bool,
+            "Treffer je Abschnitt statt je Datei liefern (mit Verweis zum gezielten Lesen des Abschnitts)"
+        ] = False,
     ) -> list[SearchResult]:
         if not query or len(query.strip()) < 2:
             return []
 
-        query_lower = query.strip().lower()
+        query_text = query.strip()
+        query_lower = query_text.lower()
         lang_filter = language.strip().lower() if language else None
+        lang_clause = " AND coalesce(f.language, 'unknown') = ?" if lang_filter else ""
+        lang_params = [lang_filter] if lang_filter else []
+
+        cursor = get_read_connection().cursor()
+        if len(query_text) >= _TRIGRAM_MIN_LENGTH:
+            # Der Index speichert keinen Text (contentless); er liefert nur die Treffer in BM25-Reihenfolge
+            cursor.execute(f"""
+                SELECT f.filename
+                FROM files_fts JOIN files f ON f.fts_rowid = files_fts.rowid
+                WHERE files_fts MATCH ?{lang_clause}
+                ORDER BY bm25(files_fts)
+            """, [_fts_phrase(query_text), *lang_params])
+        else:
+            # Trigramm-Index greift erst ab 3 Zeichen → alle Dokumente durchsuchen
+            cursor.execute(
+                f"SELECT f.filename FROM files f WHERE f.content_hash IS NOT NULL{lang_clause} ORDER BY f.filename",
+                lang_params,
+            )
+        filenames = [row[0] for row in cursor.fetchall()]
 
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("SELECT filename, content, language FROM files WHERE content IS NOT NULL")
-        rows = cursor.fetchall()
-        conn.close()
-
+        # Trefferzahl und Ausschnitt entstehen aus dem entpackten Text – nur für die gefundenen Dokumente
         results = []
-        for filename, content, file_lang in rows:
+        for filename in filenames:
+            content = read_document(filename)
             if not content:
                 continue
-            if lang_filter and (file_lang or "unknown") != lang_filter:
+            if by_section:
+                results.extend(_section_results(filename, content, query_lower))
                 continue
-
-            content_lower = content.lower()
-            matches = content_lower.count(query_lower)
-
-            if matches > 0:
-                idx = content_lower.find(query_lower)
-                start = max(0, idx - 50)
-                end = min(len(content), idx + len(query) + 50)
-                preview = content[start:end]
-                if start > 0:
-                    preview = "..." + preview
-                if end < len(content):
-                    preview = preview + "..."
-
-                results.append(SearchResult(
-                    filename=filename,
-                    matches=matches,
-                    preview=preview.replace("\n", " ")
-                ))
-
-        results.sort(key=lambda x: x.matches, reverse=True)
+            matches = content.lower().count(query_lower)
+            if matches:
+                preview = _preview(content, query_lower).replace("\n", " ")
+                results.append(SearchResult(filename=filename, matches=matches, preview=preview))
+        if len(query_text) < _TRIGRAM_MIN_LENGTH and not by_section:
+            results.sort(key=lambda result: result.matches, reverse=True)
         return results
 
     @app.tool(
         name="get-file-by-name",
-        description="schema:ReadAction – Gibt den vollständigen schema:text eines schema:DigitalDocument zurück. "
-                    "Der schema:name muss exakt angegeben werden (inkl. .md) und kann über die Such-Tools ermittelt werden."
+        description="schema:ReadAction – Gibt den schema:text eines schema:DigitalDocument zurück. "
+                    "Der schema:name muss exakt angegeben werden (inkl. .md) und kann über die Such-Tools ermittelt werden. "
+                    "Große Dokumente lassen sich abschnittsweise (section), zeilenweise (start_line/end_line) "
+                    "oder per Zeichenbereich (offset/length) lesen; Umfang und Abschnitte liefert 'get-file-info'."
     )
     def get_file_by_name(
         filename: Annotated[
             str,
-            "Exakter Dateiname inkl. .md Endung, z.B. 'kubernetes-basics.md'"
-        ]
+            "Exakter Dateiname inkl. .md Endung, z.B. 'kubernetes-basics.md', "
+            "oder ein Abschnittsverweis wie 'kubernetes-basics.md#2'"
+        ],
+        offset: Annotated[
+            int,
+            "Zeichen-Offset, ab dem gelesen wird (ab 0)"
+        ] = 0,
+        length: Annotated[
+            int | None,
+            "Anzahl zu lesender Zeichen. Wenn nicht angegeben, bis zum Ende."
+        ] = None,
+        start_line: Annotated[
+            int | None,
+            "Erste zu lesende Zeile (ab 1). Hat Vorrang vor offset/length."
+        ] = None,
+        end_line: Annotated[
+            int | None,
+            "Letzte zu lesende Zeile (inklusive). Wenn nicht angegeben, bis zum Ende."
+        ] = None,
+        section: Annotated[
+            int | None,
+            "Index eines Abschnitts aus 'get-file-info'. Hat Vorrang vor Zeilen- und Zeichenbereich."
+        ] = None,
     ) -> str:
         if not filename:
             return "Fehler: Kein Dateiname angegeben. Bitte gib den exakten Dateinamen an (z.B. 'readme.md')."
 
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("SELECT content, path FROM files WHERE filename = ?", (filename,))
-        result = cursor.fetchone()
-        conn.close()
-
-        if not result:
+        info = document_info(filename)
+        if info is None and section is None:
+            # Verweis aus search-sections bzw. fulltext-search(by_section=True)
+            filename, section = _split_ref(filename)
+            info = document_info(filename) if section is not None else None
+        if info is None:
             return f"Fehler: Datei '{filename}' nicht gefunden. Nutze 'list-all-files' um verfügbare Dateien zu sehen."
 
-        content, path = result
+        offset = max(0, offset)
+        if length is not None:
+            length = max(0, length)
+
+        if not info["stored"]:
+            # Fallback: Aus Dateisystem lesen (für alte Einträge ohne content)
+            text, error = _read_from_disk(filename, info["path"])
+            if text is None:
+                return error or ""
+            result = _select_text(text, offset, length, start_line, end_line, section)
+        elif section is not None:
+            result = read_document_section(filename, section)
+        elif start_line is not None or end_line is not None:
+            result = read_document_lines(filename, start_line or 1, end_line)
+        else:
+            result = read_document(filename, offset, length)
+
+        if result is None:
+            return f"Fehler: Abschnitt {section} existiert nicht in '{filename}'. Nutze 'get-file-info' für die Abschnitte."
+        return result
+
+    @app.tool(
+        name="get-file-info",
+        description="schema:ReadAction – Gibt Umfang (Zeichen, Zeilen) und Gliederung (Abschnitte je Überschrift) "
+                    "eines schema:DigitalDocument zurück, ohne den Inhalt zu laden. "
+                    "Damit lassen sich große Dokumente gezielt mit 'get-file-by-name' seitenweise lesen."
+    )
+    def get_file_info(
+        filename: Annotated[
+            str,
+            "Exakter Dateiname inkl. .md Endung, z.B. 'kubernetes-basics.md'"
+        ]
+    ) -> FileInfo | str:
+        if not filename:
+            return "Fehler: Kein Dateiname angegeben. Bitte gib den exakten Dateinamen an (z.B. 'readme.md')."
+
+        info = document_info(filename)
+        if info is None:
+            return f"Fehler: Datei '{filename}' nicht gefunden. Nutze 'list-all-files' um verfügbare Dateien zu sehen."
 
-        # Inhalt aus DB zurückgeben (falls vorhanden)
-        if content:
-            return content
+        if info["stored"]:
+            sections = info["sections"]
+        else:
+            text, error = _read_from_disk(filename, info["path"])
+            if text is None:
+                return error or ""
+            sections = [(idx, *section) for idx, section in enumerate(document_layout(text)[0])]
+
+        return FileInfo(
+            filename=filename,
+            size=sum(section[6] for section in sections),
+            lines=sum(section[4] for section in sections),
+            sections=[
+                DocumentSection(
+                    index=idx,
+                    heading=heading,
+                    level=level,
+                    start_line=start_line,
+                    end_line=start_line + line_count - 1,
+                    offset=start_char,
+                    length=length,
+                )
+                for idx, heading, level, start_line, line_count, start_char, length in sections
+            ],
+        )
+
+
+def _register_semantic_search(app):
+    """Registriert die semantische Suche (nur wenn MCP_EMBEDDING_MODEL gesetzt ist)."""
+    indexes: dict[str | None, _VectorIndex] = {}
+    indexes_lock = threading.Lock()
+
+    def vector_index(lang_filter: str | None) -> _VectorIndex:
+        with indexes_lock:
+            if lang_filter not in indexes:
+                indexes[lang_filter] = _VectorIndex(lang_filter)
+            return indexes[lang_filter]
+
+    def search_language(lang_filter: str | None, query: str, limit: int) -> list[tuple[tuple, float]]:
+        """Die ähnlichsten Abschnitte einer Sprache (None = alle), Anfrage mit deren Modell eingebettet."""
+        index = vector_index(lang_filter)
+        with index.lock:
+            index.refresh()
+            if not len(index):
+                return []
+        query_vector = embed_texts([query], language=lang_filter)[0]
+        with index.lock:
+            if query_vector.shape[0] != index.dimension:
+                return []
+            return index.search(query_vector, limit)
 
-        # Fallback: Aus Dateisystem lesen (für alte Einträge ohne content)
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                return f.read()
-        except FileNotFoundError:
-            return f"Fehler: Die Datei '{filename}' wurde aus dem Dateisystem entfernt."
-        except Exception as e:
-            return f"Fehler beim Lesen der Datei: {e}"
+    @app.tool(
+        name="semantic-search",
+        description="schema:SearchAction – Sucht Abschnitte von schema:DigitalDocument nach inhaltlicher Ähnlichkeit "
+                    "statt nach exakten Begriffen (findet auch Synonyme und Umschreibungen). "
+                    "Liefert Verweise 'dateiname#abschnitt', die mit get-file-by-name einzeln gelesen werden können. "
+                    "Optional filterbar nach schema:inLanguage."
+    )
+    def semantic_search(
+        query: Annotated[
+            str,
+            "Frage oder Beschreibung in natürlicher Sprache, z.B. 'Wie starte ich Container neu?'"
+        ],
+        language: Annotated[
+            str | None,
+            "ISO-639-1 Sprachfilter, z.B. 'de' oder 'en'. Wenn nicht angegeben, werden alle Sprachen durchsucht."
+        ] = None,
+        limit: Annotated[
+            int,
+            f"Maximale Anzahl Treffer (1–{_MAX_LIMIT})"
+        ] = _DEFAULT_LIMIT,
+    ) -> list[SectionHit]:
+        if not query or not query.strip():
+            return []
+        lang_filter = language.strip().lower() if language else None
+        limit = max(1, min(limit, _MAX_LIMIT))
+        if lang_filter or shared_space():
+            languages = [lang_filter]
+        else:
+            # spaCy-Vektoren sind nur innerhalb eines Sprachmodells vergleichbar. Statt die Sprache
+            # der (meist kurzen) Anfrage zu raten, wird jede Sprache des Index mit ihrem eigenen
+            # Modell durchsucht; die Kosinus-Scores liegen im selben Bereich und werden gemischt.
+            languages = _indexed_languages()
+
+        ranked = []
+        for lang in languages:
+            ranked += search_language(lang, query.strip(), limit)
+        ranked.sort(key=lambda item: item[1], reverse=True)
+
+        hits = []
+        for (filename, idx, heading, length), score in ranked[:limit]:
+            hits.append(SectionHit(
+                ref=_section_ref(filename, idx),
+                filename=filename,
+                section=idx,
+                heading=heading,
+                uri=f"{CONTENT_PREFIX}{filename}/abschnitt/{idx}",
+                length=length,
+                score=round(score, 4),
+            ))
+        return hits
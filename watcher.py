@@ -0,0 +1,104 @@
+# watcher.py
+
+import importlib.util
+import os
+import threading
+import time
+
+from config import WATCH_DEBOUNCE
+
+
+def watch_available() -> bool:
+    """Gibt zurück, ob watchdog installiert ist (optional: pip install mcp-md-fileserver[watch])."""
+    return importlib.util.find_spec("watchdog") is not None
+
+
+def _event_handler(watcher: "FileWatcher"):
+    """Erzeugt einen watchdog-Handler, der alle Ereignisse an den Watcher weiterreicht."""
+    from watchdog.events import FileSystemEventHandler
+
+    class _MarkdownEventHandler(FileSystemEventHandler):
+        def on_any_event(self, event):
+            watcher.handle_event(event)
+
+    return _MarkdownEventHandler()
+
+
+def _is_markdown(path: str, is_directory: bool) -> bool:
+    return is_directory or path.endswith(".md")
+
+
+class FileWatcher:
+    """Überwacht einen oder mehrere Ordner per inotify (watchdog) und sammelt geänderte Pfade.
+    Ein Pfad wird erst freigegeben, wenn für ihn `debounce` Sekunden lang kein
+    weiteres Ereignis eingetroffen ist – so lösen Editoren und Sync-Jobs, die
+    eine Datei mehrfach schreiben, nur eine Indexierung aus.
+    """
+
+    def __init__(self, folder: str | list[str], debounce: float = WATCH_DEBOUNCE, accept=_is_markdown):
+        self.folders = [folder] if isinstance(folder, str) else list(folder)
+        self.debounce = debounce
+        # accept(path, is_directory) entscheidet, welche Pfade vorgemerkt werden
+        self.accept = accept
+        self._pending: dict[str, float] = {}
+        self._cond = threading.Condition()
+        self._observer = None
+
+    def start(self) -> bool:
+        """Startet die Überwachung. Gibt False zurück, wenn watchdog nicht installiert ist."""
+        if not watch_available():
+            print("[Warnung] watchdog nicht installiert – Watch-Modus deaktiviert, nutze periodischen Scan")
+            return False
+        from watchdog.observers import Observer
+
+        observer = Observer()
+        handler = _event_handler(self)
+        for folder in self.folders:
+            observer.schedule(handler, folder, recursive=True)
+        observer.start()
+        self._observer = observer
+        print(f"[Watch] Überwache {', '.join(self.folders)} auf Dateiänderungen")
+        return True
+
+    def stop(self):
+        """Beendet die Überwachung."""
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+
+    def handle_event(self, event):
+        """Filtert ein watchdog-Ereignis auf relevante Dateien und Verzeichnisse (siehe accept)."""
+        if event.event_type not in {"created", "modified", "deleted", "moved"}:
+            return
+        # Geänderte Verzeichnis-mtimes sagen nichts über den Inhalt aus
+        if event.is_directory and event.event_type == "modified":
+            return
+        for path in (event.src_path, getattr(event, "dest_path", "")):
+            path = os.fsdecode(path)
+            if path and self.accept(path, event.is_directory):
+                self.notify(path)
+
+    def notify(self, path: str):
+        """Merkt einen geänderten Pfad vor (setzt die Debounce-Zeit zurück)."""
+        with self._cond:
+            self._pending[path] = time.monotonic()
+            self._cond.notify()
+
+    def wait_for_changes(self, timeout: float) -> set[str]:
+        """Wartet höchstens `timeout` Sekunden auf zur Ruhe gekommene Pfade und gibt sie zurück."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                ready = {path for path, seen in self._pending.items() if now - seen >= self.debounce}
+                if ready:
+                    for path in ready:
+                        del self._pending[path]
+                    return ready
+                if now >= deadline:
+                    return set()
+                wait_time = deadline - now
+                if self._pending:
+                    wait_time = min(wait_time, min(self._pending.values()) + self.debounce - now)
+                self._cond.wait(wait_time)